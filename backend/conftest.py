@@ -1,3 +1,8 @@
+import json
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
 from django.contrib.auth.models import User
 from users.models import Customer
@@ -5,6 +10,18 @@ from products.models import Product, Category
 from invoices.models import Invoice, InvoiceItem
 
 
+@pytest.fixture(autouse=True)
+def reset_barcode_index():
+    from products.barcode_index import barcode_index
+    barcode_index.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_invoice_number_allocator():
+    from invoices.numbering import allocator
+    allocator.clear()
+
+
 @pytest.fixture
 def api_client():
     from rest_framework.test import APIClient
@@ -86,3 +103,82 @@ def invoice(db, customer):
         total_amount=120.00,
         status='pending'
     )
+
+
+class OpenFoodFactsStub:
+    """Local stand-in for the Open Food Facts product API."""
+
+    def __init__(self):
+        self.products = {}
+        self.images = {}
+        self.failing = set()
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                barcode = self.path.rstrip('/').rsplit('/', 1)[-1]
+                stub.requests.append((barcode, dict(self.headers)))
+                if barcode in stub.failing:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                if self.path in stub.images:
+                    body = stub.images[self.path]
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'image/png')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                if barcode in stub.products:
+                    payload = {'status': 1, 'product': stub.products[barcode]}
+                else:
+                    payload = {'status': 0, 'status_verbose': 'product not found'}
+                body = json.dumps(payload).encode()
+                etag = '"%x"' % zlib.crc32(body)
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def add(self, barcode, name, **extra):
+        self.products[barcode] = {
+            'id': barcode,
+            'product_name': name,
+            'brands': extra.pop('brands', ''),
+            'nutriments': extra.pop('nutriments', {}),
+            **extra,
+        }
+
+    def add_image(self, path, content):
+        """Serve ``content`` as a PNG at ``path`` and return its URL."""
+        self.images[path] = content
+        return f'{self.url}{path}'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def openfoodfacts_stub(settings):
+    stub = OpenFoodFactsStub()
+    settings.OPEN_FOOD_FACTS_API_URL = stub.url
+    settings.OPEN_FOOD_FACTS_IMAGE_HOSTS = ['127.0.0.1']
+    yield stub
+    stub.close()
@@ -0,0 +1,162 @@
+"""
+Pagination classes shared by the API viewsets.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Page-number pagination with an opt-in keyset (cursor) mode.
+
+    ``?pagination=cursor`` (or any ``?cursor=`` value) switches to keyset
+    pagination on ``(<ordering field>, primary key)``: each page is an indexed range
+    scan that costs the same at any depth, and no ``COUNT(*)`` is run. The
+    ordering field is taken from ``?ordering=`` when it is one of the
+    view's ``ordering_fields`` and defaults to ``-created_at``.
+
+    Cursor responses contain ``next``, ``previous`` and ``results`` only.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    ordering_param = 'ordering'
+    default_cursor_ordering = '-created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.use_cursor(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        model = queryset.model
+
+        field, descending = self.get_cursor_ordering(request, view, model)
+        value, last_id, reverse = self.decode_cursor(request, model, field)
+
+        # Walking backwards flips the sort and the comparison
+        backwards = descending != reverse
+        lookup = 'lt' if backwards else 'gt'
+        prefix = '-' if backwards else ''
+        queryset = queryset.order_by(f'{prefix}{field}', f'{prefix}pk')
+        if last_id is not None:
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value})
+                | Q(**{field: value, f'pk__{lookup}': last_id})
+            )
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.page_rows = rows
+        self.ordering_field = field
+        if reverse:
+            self.has_next = last_id is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = last_id is not None
+        return rows
+
+    def get_cursor_ordering(self, request, view, model):
+        allowed = set(getattr(view, 'ordering_fields', None) or []) | {'created_at'}
+        requested = request.query_params.get(self.ordering_param, '').split(',')[0].strip()
+        ordering = requested if requested.lstrip('-') in allowed else self.default_cursor_ordering
+        field = ordering.lstrip('-')
+        try:
+            if model._meta.get_field(field).null:
+                raise FieldDoesNotExist
+        except FieldDoesNotExist:
+            ordering = self.default_cursor_ordering
+            field = ordering.lstrip('-')
+        return field, ordering.startswith('-')
+
+    def encode_cursor(self, obj, reverse):
+        value = getattr(obj, self.ordering_field)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        position = {'v': str(value), 'id': obj.pk, 'r': reverse}
+        token = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        return replace_query_param(
+            remove_query_param(self.base_url, self.page_query_param),
+            self.cursor_query_param, token,
+        )
+
+    def decode_cursor(self, request, model, field):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, None, False
+        try:
+            position = json.loads(base64.urlsafe_b64decode(token.encode()))
+            value = model._meta.get_field(field).to_python(position['v'])
+            return value, int(position['id']), bool(position.get('r'))
+        except (binascii.Error, ValueError, KeyError, TypeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not getattr(self, 'cursor_mode', False):
+            return super().get_next_link()
+        if not self.has_next or not self.page_rows:
+            return None
+        return self.encode_cursor(self.page_rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not getattr(self, 'cursor_mode', False):
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_rows:
+            return None
+        return self.encode_cursor(self.page_rows[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count']['description'] = 'Omitted with ?pagination=cursor'
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Set to "cursor" for keyset pagination without a total count.',
+                'schema': {'type': 'string', 'enum': ['cursor']},
+            },
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Opaque cursor from a previous next/previous link.',
+                'schema': {'type': 'string'},
+            },
+        ]
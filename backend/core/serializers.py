@@ -0,0 +1,82 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.serializers import BaseSerializer
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Serializer mixin accepting a ``fields`` keyword argument that limits the
+    serialized fields (used for ``?fields=`` sparse fieldsets).
+
+    ``Meta.sparse_field_dependencies`` maps a serializer field to the model
+    columns it reads when they can't be derived from its ``source`` (method
+    fields, properties, ``to_representation`` overrides). Paths may span
+    relations, e.g. ``'customer__first_name'``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def get_sparse_columns(self):
+        """
+        Return ``(columns, select_related)`` needed to serialize the current
+        fields, or ``None`` when they can't be determined.
+        """
+        model = self.Meta.model
+        dependencies = getattr(self.Meta, 'sparse_field_dependencies', {})
+        columns = {model._meta.pk.name}
+        related = set()
+        whole = set()
+
+        for name, field in self.fields.items():
+            if name in dependencies:
+                paths = dependencies[name]
+            elif field.source == '*':
+                return None
+            else:
+                path, join = self._model_path(model, field.source_attrs)
+                if path is None:
+                    return None
+                if not path:
+                    continue
+                paths = [path]
+                # Nested serializers and properties of a related object need
+                # the whole related row
+                if join or isinstance(field, BaseSerializer):
+                    whole.add(path)
+            for path in paths:
+                columns.add(path)
+                parts = path.split('__')
+                if len(parts) > 1:
+                    related.add('__'.join(parts[:-1]))
+        # A relation loaded whole must not also be restricted to some columns
+        columns = {
+            column for column in columns
+            if not any(column.startswith(f'{path}__') for path in whole)
+        }
+        return sorted(columns), sorted(related | whole)
+
+    def _model_path(self, model, attrs):
+        """
+        Translate a dotted ``source`` into ``(orm_path, join)``. The path is
+        ``None`` when the source isn't a model field and ``''`` when it needs
+        no column on this table (reverse relations).
+        """
+        parts = []
+        for attr in attrs:
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                if not parts:
+                    return None, False
+                return '__'.join(parts), True
+            if model_field.many_to_many or model_field.one_to_many:
+                return ('', False) if not parts else (None, False)
+            parts.append(attr)
+            if not model_field.is_relation:
+                break
+            model = model_field.related_model
+        return '__'.join(parts), False
@@ -1,3 +1,118 @@
-from django.shortcuts import render
+import hashlib
 
-# Create your views here.
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.exceptions import ValidationError
+
+
+class SparseFieldsetMixin:
+    """
+    ViewSet mixin adding ``?fields=a,b,c`` to list and retrieve actions.
+
+    Only the requested fields are serialized, and the queryset is limited to
+    the columns those fields need via ``only()``, which cuts row width, DB
+    I/O and response size. Unknown field names are rejected with a 400.
+    The serializer must use ``core.serializers.SparseFieldsetSerializerMixin``.
+    """
+    fields_query_param = 'fields'
+    sparse_fieldset_actions = ('list', 'retrieve')
+
+    def get_sparse_fields(self):
+        if getattr(self, 'action', None) not in self.sparse_fieldset_actions:
+            return None
+        raw = self.request.query_params.get(self.fields_query_param)
+        if not raw:
+            return None
+        requested = [name.strip() for name in raw.split(',') if name.strip()]
+        available = self.get_serializer_class()().fields
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise ValidationError({
+                self.fields_query_param: f"Unknown field(s): {', '.join(unknown)}. "
+                                         f"Available: {', '.join(available)}."
+            })
+        return requested
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        return self.apply_sparse_fieldset(super().get_queryset())
+
+    def apply_sparse_fieldset(self, queryset):
+        """
+        Limit ``queryset`` to the columns of the requested fields. Views that
+        build their own queryset call this on it; joins the fields don't
+        need are dropped.
+        """
+        fields = self.get_sparse_fields()
+        if not fields:
+            return queryset
+        projection = self.get_serializer_class()(fields=fields).get_sparse_columns()
+        if projection is None:
+            return queryset
+        columns, related = projection
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin answering ``If-None-Match``/``If-Modified-Since`` on list
+    and retrieve actions with ``304 Not Modified``.
+
+    The validators come from one aggregate query over the filtered queryset
+    (``Max('updated_at')`` and the row count by default), so a 304 costs no
+    serialization at all. The ETag also covers the full request path and the
+    response format, so every page, ordering and ``?fields=`` selection gets
+    its own validator. Only use it for data that looks the same to every user.
+    """
+    def get_validator_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset
+
+    def get_validator_state(self, queryset):
+        """
+        Return a dict describing the current state of ``queryset``; its
+        ``latest`` entry is used as ``Last-Modified``.
+        """
+        return queryset.order_by().aggregate(latest=Max('updated_at'), count=Count('pk'))
+
+    def get_validators(self, request):
+        state = self.get_validator_state(self.get_validator_queryset())
+        if state['latest'] is None:
+            return None, None
+        fingerprint = '|'.join([
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            *(f'{key}={value}' for key, value in sorted(state.items())),
+        ])
+        etag = 'W/"%s"' % hashlib.md5(fingerprint.encode()).hexdigest()
+        return etag, int(state['latest'].timestamp())
+
+    def handle_conditional_get(self, request, handler, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        if etag is None:
+            return handler(request, *args, **kwargs)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.handle_conditional_get(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.handle_conditional_get(request, super().retrieve, *args, **kwargs)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Invoice, InvoiceItem
+from .models import Invoice, InvoiceItem, InvoiceNumberBlock, InvoiceSequence
 
 
 class InvoiceItemInline(admin.TabularInline):
@@ -38,3 +38,23 @@ class InvoiceItemAdmin(admin.ModelAdmin):
     list_display = ['invoice', 'product_name', 'quantity', 'unit_price', 'total_price']
     list_filter = ['created_at']
     search_fields = ['product_name', 'invoice__invoice_number']
+
+
+@admin.register(InvoiceSequence)
+class InvoiceSequenceAdmin(admin.ModelAdmin):
+    list_display = ['day', 'last_value']
+    readonly_fields = ['day', 'last_value']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(InvoiceNumberBlock)
+class InvoiceNumberBlockAdmin(admin.ModelAdmin):
+    list_display = ['day', 'first_value', 'last_value', 'terminal', 'reserved_by', 'created_at']
+    list_filter = ['day']
+    search_fields = ['terminal']
+    readonly_fields = ['day', 'first_value', 'last_value', 'terminal', 'reserved_by', 'created_at']
+
+    def has_add_permission(self, request):
+        return False
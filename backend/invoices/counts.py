@@ -0,0 +1,55 @@
+"""
+Denormalized ``Invoice.item_count`` (lines) and ``unit_count`` (units).
+
+Checkout fills both in when it creates the invoice. Later item writes
+(``InvoiceItem.save``/``delete``, admin inline edits) refresh them from
+``invoices.signals`` inside the same transaction, so invoice lists read two
+columns instead of summing every invoice's items. ``repair`` (the
+``repair_invoice_counts`` command) recomputes the invoices whose stored
+counts disagree with their items, e.g. after raw SQL edits.
+"""
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Invoice, InvoiceItem
+
+# Invoices checked per repair query
+CHUNK_SIZE = 1000
+
+
+def _actual_counts():
+    items = InvoiceItem.objects.filter(invoice=OuterRef('pk')).order_by().values('invoice')
+    return {
+        'item_count': Coalesce(Subquery(items.annotate(total=Count('pk')).values('total')), 0),
+        'unit_count': Coalesce(Subquery(items.annotate(total=Sum('quantity')).values('total')), 0),
+    }
+
+
+def refresh(invoice_ids):
+    """Recompute the counts of ``invoice_ids`` with one UPDATE; returns the rows updated."""
+    return Invoice.objects.filter(id__in=list(invoice_ids)).update(
+        **_actual_counts(), updated_at=timezone.now()
+    )
+
+
+def repair(chunk_size=CHUNK_SIZE):
+    """Fix every invoice whose stored counts are wrong; returns how many were fixed."""
+    actual = {f'actual_{name}': expression for name, expression in _actual_counts().items()}
+    repaired = 0
+    last_id = 0
+    invoices = Invoice.objects.order_by('id').values_list('id', flat=True)
+    while True:
+        ids = list(invoices.filter(id__gt=last_id)[:chunk_size])
+        if not ids:
+            break
+        last_id = ids[-1]
+        stale = list(
+            Invoice.objects.filter(id__in=ids)
+            .annotate(**actual)
+            .filter(~Q(item_count=F('actual_item_count')) | ~Q(unit_count=F('actual_unit_count')))
+            .values_list('id', flat=True)
+        )
+        if stale:
+            repaired += refresh(stale)
+    return repaired
@@ -0,0 +1,85 @@
+"""
+``Idempotency-Key`` support for invoice creation.
+
+A till that lost its connection retries ``POST /api/invoices/`` with the
+same key. The first successful response is stored in ``IdempotencyKey``
+(unique per user and key) in the same transaction as the invoice, so
+either both commit or neither does. Retries within
+``IDEMPOTENCY_KEY_TTL_SECONDS`` get the stored response back without
+running checkout again. Two retries racing each other both run checkout,
+but the second one's insert hits the unique constraint, its transaction
+(invoice and stock included) rolls back and it replays the first.
+
+Failed requests are not stored: they change nothing, so a retry simply
+runs again. ``sweep`` (the ``sweep_idempotency_keys`` command) deletes
+expired keys.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import QueryDict
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+# Expired keys deleted per statement
+CHUNK_SIZE = 1000
+
+
+class KeyReused(Exception):
+    """The key was already used for a request with a different body."""
+
+
+def fingerprint(data):
+    if isinstance(data, QueryDict):
+        data = dict(data.lists())
+    encoded = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def lookup(user, key, request_fingerprint):
+    """
+    Return the live stored response for ``key``, or ``None``. Raises
+    ``KeyReused`` when it was stored for a different request body.
+    """
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is None:
+        return None
+    if record.expires_at <= timezone.now():
+        # Free the key for this request; the sweeper may not have run yet
+        record.delete()
+        return None
+    if record.fingerprint != request_fingerprint:
+        raise KeyReused
+    return record
+
+
+def store(user, key, request_fingerprint, response):
+    """Store ``response``; raises ``IntegrityError`` if the key was stored meanwhile."""
+    now = timezone.now()
+    return IdempotencyKey.objects.create(
+        user=user,
+        key=key,
+        fingerprint=request_fingerprint,
+        status_code=response.status_code,
+        response=response.data,
+        expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+    )
+
+
+def sweep(chunk_size=CHUNK_SIZE):
+    """Delete expired keys; returns how many were deleted."""
+    expired = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('id', flat=True)
+    deleted = 0
+    while True:
+        ids = list(expired[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
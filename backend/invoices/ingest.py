@@ -0,0 +1,218 @@
+"""
+Bulk invoice ingestion for offline POS sync (``POST /api/invoices/bulk/``).
+
+A till that was offline uploads its queued sales in one request instead of
+replaying them through checkout one at a time. Every invoice is validated
+with one ``BulkInvoiceSerializer`` instance, and the batch's customers,
+products and already-known invoice numbers are loaded with one query each.
+Invoices are then applied in groups of ``INVOICE_INGEST_GROUP_SIZE``, each
+group in its own transaction. The invoices and their items are written
+with one ``bulk_create`` each, then stock for the whole group goes through
+``stock.apply_movements`` (one guarded UPDATE per chunk of products, one
+ledger movement per invoice line).
+
+If a group can't be applied as a whole (a sale would oversell, or an
+invoice number was taken meanwhile), its invoices are retried one by one in
+savepoints, so only the offending sales are rejected; any other integrity
+error of a single sale is reported as that sale's failure too, since
+earlier groups are already committed. Invoices whose
+``invoice_number`` (e.g. from a reserved block, see ``invoices.numbering``)
+already exists are reported as duplicates, so uploading the same backlog
+again is harmless.
+"""
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from products import stock
+from products.models import Product, StockMovement
+from users.models import Customer
+
+from . import numbering
+from .models import Invoice, InvoiceItem
+from .serializers import BulkInvoiceSerializer
+
+logger = logging.getLogger(__name__)
+
+CREATED = 'created'
+DUPLICATE = 'duplicate'
+FAILED = 'failed'
+
+
+def _missing(label, ids):
+    return {label: [f'Invalid pk "{pk}" - object does not exist.' for pk in sorted(ids)]}
+
+
+def _build(sale, products, now):
+    values = sale['values']
+    items = [
+        InvoiceItem(
+            product=products[item['product']],
+            quantity=item['quantity'],
+            unit_price=item['unit_price'],
+        )
+        for item in values['items']
+    ]
+    for item in items:
+        item.prepare()
+    subtotal = sum((item.total_price for item in items), Decimal('0.00'))
+    tax_amount = (subtotal * values['tax_rate']) / 100
+    invoice = Invoice(
+        customer_id=values['customer'],
+        invoice_number=values['invoice_number'],
+        payment_method=values['payment_method'],
+        tax_rate=values['tax_rate'],
+        notes=values['notes'],
+        subtotal=subtotal,
+        tax_amount=tax_amount,
+        total_amount=subtotal + tax_amount,
+        status='paid',
+        paid_at=now,
+        item_count=len(items),
+        unit_count=sum(item.quantity for item in items),
+    )
+    return invoice, items
+
+
+def _apply(sales, products):
+    """Write ``sales`` (stock, invoices, items); raises on any failure."""
+    now = timezone.now()
+    built = [_build(sale, products, now) for sale in sales]
+    invoices = Invoice.objects.bulk_create([invoice for invoice, _ in built])
+    if any(invoice.pk is None for invoice in invoices):
+        # Backends that can't return ids from a bulk insert
+        ids = dict(
+            Invoice.objects.filter(invoice_number__in=[invoice.invoice_number for invoice in invoices])
+            .values_list('invoice_number', 'id')
+        )
+        for invoice in invoices:
+            invoice.pk = ids[invoice.invoice_number]
+    items = []
+    for invoice, invoice_items in built:
+        for item in invoice_items:
+            item.invoice = invoice
+            items.append(item)
+    InvoiceItem.objects.bulk_create(items, batch_size=500)
+    # Last, so the product rows stay locked only until commit
+    stock.apply_movements(
+        [
+            (item['product'], -item['quantity'], sale['values']['invoice_number'])
+            for sale in sales for item in sale['values']['items']
+        ],
+        kind=StockMovement.SALE,
+    )
+    for sale, invoice in zip(sales, invoices):
+        sale['result'].update(status=CREATED, id=invoice.pk)
+
+
+def _apply_one(sale, products):
+    try:
+        with transaction.atomic():
+            _apply([sale], products)
+    except stock.StockError as exc:
+        product_id = next(item['product'] for item in sale['values']['items'] if item['product'] in exc.errors)
+        sale['result'].update(
+            status=FAILED, errors={'items': [f'Insufficient stock for {products[product_id].name}.']}
+        )
+    except IntegrityError:
+        existing = Invoice.objects.filter(invoice_number=sale['values']['invoice_number']).first()
+        if existing is not None:
+            sale['result'].update(status=DUPLICATE, id=existing.pk)
+            return
+        # Earlier groups are committed already: report this sale, don't abort
+        logger.exception('Could not ingest invoice %s', sale['values']['invoice_number'])
+        sale['result'].update(
+            status=FAILED, errors={api_settings.NON_FIELD_ERRORS_KEY: ['The invoice could not be saved.']}
+        )
+
+
+def _apply_group(sales, products):
+    try:
+        with transaction.atomic():
+            _apply(sales, products)
+        return
+    except (stock.StockError, IntegrityError):
+        pass
+    # Isolate the sales that can't be applied
+    with transaction.atomic():
+        for sale in sales:
+            _apply_one(sale, products)
+
+
+def ingest(entries, group_size=None):
+    """
+    Create the invoices described by ``entries`` (``BulkInvoiceSerializer``
+    dicts). Returns a report with ``invoices``, ``created``, ``duplicates``,
+    ``failed`` counts and ``results``: one ``{index, invoice_number, status}``
+    per entry, plus ``id`` (created and duplicate) or ``errors`` (failed).
+    """
+    group_size = group_size or settings.INVOICE_INGEST_GROUP_SIZE
+    validator = BulkInvoiceSerializer()
+    results = []
+    sales = []
+    for index, data in enumerate(entries):
+        result = {'index': index, 'invoice_number': data.get('invoice_number') or ''}
+        results.append(result)
+        try:
+            values = validator.run_validation(data)
+        except ValidationError as exc:
+            result.update(status=FAILED, errors=exc.detail)
+            continue
+        sales.append({'values': values, 'result': result})
+
+    # Shared lookups for the whole batch
+    customers = set(
+        Customer.objects.filter(id__in={sale['values']['customer'] for sale in sales})
+        .values_list('id', flat=True)
+    )
+    products = Product.objects.only('name', 'brand').in_bulk(
+        {item['product'] for sale in sales for item in sale['values']['items']}
+    )
+    existing = dict(
+        Invoice.objects.filter(
+            invoice_number__in=[sale['values']['invoice_number'] for sale in sales if sale['values']['invoice_number']]
+        ).values_list('invoice_number', 'id')
+    )
+
+    accepted = []
+    seen = set()
+    for sale in sales:
+        values, result = sale['values'], sale['result']
+        number = values['invoice_number']
+        missing_products = {item['product'] for item in values['items']} - set(products)
+        if values['customer'] not in customers:
+            result.update(status=FAILED, errors=_missing('customer', [values['customer']]))
+        elif missing_products:
+            result.update(status=FAILED, errors=_missing('items', missing_products))
+        elif number in existing:
+            result.update(status=DUPLICATE, id=existing[number])
+        elif number and number in seen:
+            result.update(status=FAILED, errors={'invoice_number': ['Duplicate invoice number in this batch.']})
+        else:
+            seen.add(number)
+            accepted.append(sale)
+
+    # One block of numbers for the invoices that don't bring their own
+    unnumbered = [sale for sale in accepted if not sale['values']['invoice_number']]
+    if unnumbered:
+        day, first, _ = numbering.reserve(len(unnumbered))
+        for offset, sale in enumerate(unnumbered):
+            sale['values']['invoice_number'] = numbering.format_number(day, first + offset)
+            sale['result']['invoice_number'] = sale['values']['invoice_number']
+
+    for start in range(0, len(accepted), group_size):
+        _apply_group(accepted[start:start + group_size], products)
+
+    statuses = [result['status'] for result in results]
+    return {
+        'invoices': len(results),
+        'created': statuses.count(CREATED),
+        'duplicates': statuses.count(DUPLICATE),
+        'failed': statuses.count(FAILED),
+        'results': results,
+    }
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from invoices import counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored item and unit counts of invoices that disagree with their items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=counts.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        repaired = counts.repair(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Repaired {repaired} invoices'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from invoices import idempotency
+
+
+class Command(BaseCommand):
+    help = 'Delete expired Idempotency-Key records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=idempotency.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        deleted = idempotency.sweep(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:57
+
+from datetime import datetime
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+GENERATED_NUMBER = re.compile(r'^INV-(\d{8})-(\d+)$')
+
+
+def seed_sequences(apps, schema_editor):
+    """Start each day's counter after the numbers already issued that day."""
+    Invoice = apps.get_model('invoices', 'Invoice')
+    InvoiceSequence = apps.get_model('invoices', 'InvoiceSequence')
+    last_values = {}
+    numbers = Invoice.objects.filter(invoice_number__startswith='INV-').values_list('invoice_number', flat=True)
+    for number in numbers.iterator():
+        match = GENERATED_NUMBER.match(number)
+        if not match:
+            continue
+        try:
+            day = datetime.strptime(match.group(1), '%Y%m%d').date()
+        except ValueError:
+            continue
+        last_values[day] = max(last_values.get(day, 0), int(match.group(2)))
+    InvoiceSequence.objects.bulk_create(
+        [InvoiceSequence(day=day, last_value=value) for day, value in last_values.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('invoices', '0002_created_at_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceSequence',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InvoiceNumberBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('first_value', models.PositiveIntegerField()),
+                ('last_value', models.PositiveIntegerField()),
+                ('terminal', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reserved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['terminal', 'created_at'], name='invoices_in_termina_b67741_idx')],
+            },
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,8 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.core.validators import MinValueValidator
 from decimal import Decimal
-from django.utils import timezone
 from users.models import Customer
 from products.models import Product
 
@@ -59,6 +60,10 @@ class Invoice(models.Model):
         validators=[MinValueValidator(Decimal('0.00'))]
     )
     
+    # Denormalized from the items (see invoices.counts)
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    unit_count = models.PositiveIntegerField(default=0, editable=False)
+    
     # PayPal Integration (Future)
     paypal_transaction_id = models.CharField(max_length=100, blank=True)
     paypal_payer_email = models.EmailField(blank=True)
@@ -75,6 +80,7 @@ class Invoice(models.Model):
             models.Index(fields=['invoice_number']),
             models.Index(fields=['customer', 'created_at']),
             models.Index(fields=['status']),
+            models.Index(fields=['created_at']),
         ]
     
     def __str__(self):
@@ -83,25 +89,23 @@ class Invoice(models.Model):
     def save(self, *args, **kwargs):
         # Auto-generate invoice number if not provided
         if not self.invoice_number:
-            today = timezone.now()
-            date_str = today.strftime('%Y%m%d')
-            # Count invoices created today
-            count = Invoice.objects.filter(
-                invoice_number__startswith=f'INV-{date_str}'
-            ).count() + 1
-            self.invoice_number = f'INV-{date_str}-{count:04d}'
+            from .numbering import allocator
+            self.invoice_number = allocator.next_number()
         super().save(*args, **kwargs)
     
     def calculate_totals(self):
-        """Calculate subtotal, tax, and total from invoice items"""
-        self.subtotal = sum(item.total_price for item in self.items.all())
+        """Calculate subtotal, tax, total and item counts from invoice items"""
+        items = list(self.items.all())
+        self.subtotal = sum(item.total_price for item in items)
+        self.item_count = len(items)
+        self.unit_count = sum(item.quantity for item in items)
         self.tax_amount = (self.subtotal * self.tax_rate) / 100
         self.total_amount = self.subtotal + self.tax_amount
         self.save()
     
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.unit_count
 
 
 class InvoiceItem(models.Model):
@@ -139,11 +143,15 @@ class InvoiceItem(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
     
     def __str__(self):
         return f"{self.product_name} x {self.quantity}"
     
-    def save(self, *args, **kwargs):
+    def prepare(self):
+        """Fill in the total and product snapshot (``save`` calls this; ``bulk_create`` doesn't)."""
         # Calculate total price
         self.total_price = self.unit_price * self.quantity
         
@@ -151,5 +159,81 @@ class InvoiceItem(models.Model):
         if not self.product_name:
             self.product_name = self.product.name
             self.product_brand = self.product.brand
-        
+
+    def save(self, *args, **kwargs):
+        self.prepare()
         super().save(*args, **kwargs)
+
+
+class InvoiceSequence(models.Model):
+    """
+    Per-day invoice number counter: ``last_value`` is the highest number
+    handed out for ``day`` (see ``invoices.numbering``).
+    """
+    day = models.DateField(primary_key=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day:%Y-%m-%d}: {self.last_value}"
+
+
+class InvoiceNumberBlock(models.Model):
+    """
+    A range of invoice numbers reserved up front, e.g. by an offline POS
+    terminal that numbers its own invoices until it syncs.
+    """
+    day = models.DateField()
+    first_value = models.PositiveIntegerField()
+    last_value = models.PositiveIntegerField()
+    terminal = models.CharField(max_length=100, blank=True)
+    reserved_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['terminal', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.day:%Y-%m-%d} {self.first_value}-{self.last_value} ({self.terminal})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    First successful response to an ``Idempotency-Key`` request, replayed
+    to retries of the same request until ``expires_at`` (see
+    ``invoices.idempotency``).
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # SHA-256 of the request body
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code})"
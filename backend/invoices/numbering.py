@@ -0,0 +1,94 @@
+"""
+Invoice numbers (``INV-YYYYMMDD-NNNN``) from a per-day counter.
+
+Each day has one ``InvoiceSequence`` row. Reserving numbers is a single
+``UPDATE ... SET last_value = last_value + n`` plus a primary key read, so
+it costs the same however many invoices the day already has, and the row
+lock taken by the update serializes concurrent checkouts: two of them can
+never be handed the same number. Numbers are gap-tolerant: a number whose
+invoice is rolled back is not reused.
+
+With ``INVOICE_NUMBER_BLOCK_SIZE`` above 1, each worker process reserves
+numbers in blocks and hands them out from memory, so most invoices don't
+touch the counter at all (numbers from different workers then interleave).
+Blocks are only cached when reserved in a transaction of their own: numbers
+reserved inside the caller's transaction would return to the counter if it
+rolled back while the worker still held them.
+
+``reserve_block`` hands a whole range to an offline POS terminal, which
+numbers its invoices itself and submits them with ``invoice_number`` set.
+"""
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import InvoiceNumberBlock, InvoiceSequence
+
+PREFIX = 'INV'
+
+
+def format_number(day, value):
+    return f'{PREFIX}-{day:%Y%m%d}-{value:04d}'
+
+
+def reserve(count=1, day=None):
+    """Reserve ``count`` consecutive numbers; returns ``(day, first, last)``."""
+    day = day or timezone.localdate()
+    sequences = InvoiceSequence.objects.filter(day=day)
+    with transaction.atomic(savepoint=False):
+        if not sequences.update(last_value=F('last_value') + count):
+            try:
+                with transaction.atomic():
+                    InvoiceSequence.objects.create(day=day, last_value=0)
+            except IntegrityError:
+                # Another worker opened the day first
+                pass
+            sequences.update(last_value=F('last_value') + count)
+        last = sequences.values_list('last_value', flat=True).get()
+    return day, last - count + 1, last
+
+
+def reserve_block(count, terminal='', user=None):
+    """Reserve ``count`` numbers for an offline terminal and record the block."""
+    with transaction.atomic():
+        day, first, last = reserve(count)
+        return InvoiceNumberBlock.objects.create(
+            day=day, first_value=first, last_value=last, terminal=terminal, reserved_by=user,
+        )
+
+
+class InvoiceNumberAllocator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._day = None
+            self._next = 1
+            self._last = 0
+
+    def next_number(self):
+        day = timezone.localdate()
+        with self._lock:
+            if self._day == day and self._next <= self._last:
+                value = self._next
+                self._next += 1
+                return format_number(day, value)
+
+        block_size = settings.INVOICE_NUMBER_BLOCK_SIZE
+        if block_size <= 1 or connection.in_atomic_block:
+            _, value, _ = reserve(1, day)
+            return format_number(day, value)
+
+        _, first, last = reserve(block_size, day)
+        with self._lock:
+            # Whatever was left of an older block becomes a gap
+            self._day, self._next, self._last = day, first + 1, last
+        return format_number(day, first)
+
+
+allocator = InvoiceNumberAllocator()
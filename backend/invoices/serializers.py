@@ -1,13 +1,19 @@
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from drf_spectacular.utils import extend_schema_field
+from core.serializers import SparseFieldsetSerializerMixin
 from decimal import Decimal
-from django.db import transaction
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from .models import Invoice, InvoiceItem
+from .models import Invoice, InvoiceItem, InvoiceNumberBlock
+from .numbering import allocator, format_number
 from users.serializers import CustomerSerializer
 from products.serializers import ProductListSerializer
-from products.models import Product
+from products import stock
+from products.models import Product, StockMovement
+
+DUPLICATE_NUMBER_MESSAGE = 'An invoice with this number already exists.'
 
 
 class InvoiceItemSerializer(serializers.ModelSerializer):
@@ -25,31 +31,31 @@ class InvoiceItemSerializer(serializers.ModelSerializer):
 
 class InvoiceItemCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating invoice items"""
+    # A plain id: the basket's products are loaded together in
+    # ``InvoiceCreateSerializer.validate_items`` instead of one query per line
+    product = serializers.IntegerField(min_value=1)
+
     class Meta:
         model = InvoiceItem
         fields = ['product', 'quantity', 'unit_price']
 
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class InvoiceSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for Invoice model"""
     customer_details = CustomerSerializer(source='customer', read_only=True)
     items = InvoiceItemSerializer(many=True, read_only=True)
-    total_items = serializers.SerializerMethodField()
+    total_items = serializers.IntegerField(source='unit_count', read_only=True)
     
     class Meta:
         model = Invoice
         fields = [
             'id', 'invoice_number', 'customer', 'customer_details',
             'status', 'payment_method', 'subtotal', 'tax_rate',
-            'tax_amount', 'total_amount', 'total_items',
+            'tax_amount', 'total_amount', 'item_count', 'unit_count', 'total_items',
             'paypal_transaction_id', 'paypal_payer_email',
             'notes', 'created_at', 'updated_at', 'paid_at', 'items'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
-
-    @extend_schema_field(serializers.IntegerField())
-    def get_total_items(self, obj):
-        return obj.total_items
+        read_only_fields = ['id', 'item_count', 'unit_count', 'created_at', 'updated_at']
 
 
 class InvoiceCreateSerializer(serializers.ModelSerializer):
@@ -64,6 +70,21 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
             'tax_rate', 'notes', 'items'
         ]
     
+    def validate_items(self, items):
+        products = Product.objects.only('name', 'brand').in_bulk({item['product'] for item in items})
+        missing = sorted({item['product'] for item in items} - set(products))
+        if missing:
+            raise serializers.ValidationError(
+                [f'Invalid pk "{product_id}" - object does not exist.' for product_id in missing]
+            )
+        return [{**item, 'product': products[item['product']]} for item in items]
+
+    def validate_invoice_number(self, value):
+        # Client-supplied numbers (offline blocks) may have been used already
+        if value and Invoice.objects.filter(invoice_number=value).exists():
+            raise serializers.ValidationError(DUPLICATE_NUMBER_MESSAGE)
+        return value
+
     def create(self, validated_data):
         items_data = validated_data.pop('items')
 
@@ -84,44 +105,120 @@ class InvoiceCreateSerializer(serializers.ModelSerializer):
         validated_data['total_amount'] = total_amount
         validated_data['status'] = 'paid'
         validated_data['paid_at'] = timezone.now()
-
+        validated_data['item_count'] = len(items_data)
+        validated_data['unit_count'] = sum(item_data['quantity'] for item_data in items_data)
+        # Numbered before the checkout transaction, so the counter row is
+        # only locked for the allocation itself
+        if not validated_data.get('invoice_number'):
+            validated_data['invoice_number'] = allocator.next_number()
+
+        try:
+            return self._checkout(validated_data, items_data)
+        except IntegrityError:
+            # Number taken by a concurrent checkout since validation
+            if not Invoice.objects.filter(invoice_number=validated_data['invoice_number']).exists():
+                raise
+            raise ValidationError({'invoice_number': [DUPLICATE_NUMBER_MESSAGE]})
+
+    def _checkout(self, validated_data, items_data):
         with transaction.atomic():
-            locked_products = {}
-            for item_data in items_data:
-                product = Product.objects.select_for_update().get(pk=item_data['product'].pk)
-                if product.quantity_in_stock < item_data['quantity']:
-                    raise ValidationError(
-                        {'items': f'Insufficient stock for {product.name}.'}
-                    )
-                locked_products[product.pk] = product
-
             # Create invoice
             invoice = Invoice.objects.create(**validated_data)
 
-            # Create invoice items and decrement stock
-            for item_data in items_data:
-                product = locked_products[item_data['product'].pk]
-                item_payload = item_data.copy()
-                item_payload['product'] = product
-                InvoiceItem.objects.create(invoice=invoice, **item_payload)
-                product.quantity_in_stock = product.quantity_in_stock - item_data['quantity']
-                product.save(update_fields=['quantity_in_stock'])
+            items = [InvoiceItem(invoice=invoice, **item_data) for item_data in items_data]
+            for item in items:
+                item.prepare()
+            InvoiceItem.objects.bulk_create(items, batch_size=500)
+
+            # Record the sale in the stock ledger; guarded decrements, so
+            # concurrent checkouts can't oversell. Last, so the product rows
+            # stay locked only until commit
+            try:
+                stock.apply_adjustments(
+                    [{'product': item['product'].pk, 'delta': -item['quantity']} for item in items_data],
+                    kind=StockMovement.SALE,
+                    reference=invoice.invoice_number,
+                )
+            except stock.StockError as exc:
+                product = next(item['product'] for item in items_data if item['product'].pk in exc.errors)
+                raise ValidationError({'items': f'Insufficient stock for {product.name}.'})
 
         return invoice
 
 
-class InvoiceListSerializer(serializers.ModelSerializer):
+class InvoiceListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Lightweight serializer for invoice lists"""
     customer_name = serializers.CharField(source='customer.full_name', read_only=True)
-    total_items = serializers.SerializerMethodField()
+    total_items = serializers.IntegerField(source='unit_count', read_only=True)
     
     class Meta:
         model = Invoice
         fields = [
-            'id', 'invoice_number', 'customer_name', 'status',
-            'total_amount', 'payment_method', 'total_items', 'created_at'
+            'id', 'invoice_number', 'customer_name', 'status', 'total_amount',
+            'payment_method', 'item_count', 'unit_count', 'total_items', 'created_at'
         ]
+        sparse_field_dependencies = {
+            'customer_name': ['customer__first_name', 'customer__last_name'],
+        }
+
+
+class InvoiceNumberReservationSerializer(serializers.Serializer):
+    """Request body of ``POST /api/invoices/reserve_numbers/``"""
+    count = serializers.IntegerField(min_value=1)
+    terminal = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+
+    def validate_count(self, value):
+        limit = settings.INVOICE_NUMBER_RESERVATION_LIMIT
+        if value > limit:
+            raise serializers.ValidationError(f'At most {limit} numbers can be reserved at once.')
+        return value
+
+
+class InvoiceNumberBlockSerializer(serializers.ModelSerializer):
+    """Serializer for reserved invoice number blocks"""
+    count = serializers.SerializerMethodField()
+    first_number = serializers.SerializerMethodField()
+    last_number = serializers.SerializerMethodField()
+
+    class Meta:
+        model = InvoiceNumberBlock
+        fields = ['id', 'day', 'terminal', 'count', 'first_number', 'last_number', 'created_at']
 
     @extend_schema_field(serializers.IntegerField())
-    def get_total_items(self, obj):
-        return obj.total_items
+    def get_count(self, obj):
+        return obj.last_value - obj.first_value + 1
+
+    @extend_schema_field(serializers.CharField())
+    def get_first_number(self, obj):
+        return format_number(obj.day, obj.first_value)
+
+    @extend_schema_field(serializers.CharField())
+    def get_last_number(self, obj):
+        return format_number(obj.day, obj.last_value)
+
+
+class BulkInvoiceSerializer(serializers.Serializer):
+    """
+    One invoice of ``POST /api/invoices/bulk/``. Only the shape is checked
+    here; customers and products are looked up for the whole batch at once
+    (see ``invoices.ingest``).
+    """
+    customer = serializers.IntegerField(min_value=1)
+    invoice_number = serializers.CharField(max_length=50, required=False, allow_blank=True, default='')
+    payment_method = serializers.ChoiceField(choices=Invoice.PAYMENT_METHOD_CHOICES, default='cash')
+    tax_rate = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=Decimal('0.00'), default=Decimal('20.00')
+    )
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    items = InvoiceItemCreateSerializer(many=True)
+
+
+class BulkInvoiceIngestSerializer(serializers.Serializer):
+    """Request body of ``POST /api/invoices/bulk/``"""
+    invoices = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    def validate_invoices(self, value):
+        limit = settings.INVOICE_INGEST_BATCH_LIMIT
+        if len(value) > limit:
+            raise serializers.ValidationError(f'At most {limit} invoices per request.')
+        return value
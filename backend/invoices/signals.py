@@ -0,0 +1,23 @@
+"""
+Invoice signals: keep the denormalized item counts in step with the items.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import counts
+from .models import Invoice, InvoiceItem
+
+
+@receiver(post_save, sender=InvoiceItem)
+def refresh_item_counts(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    counts.refresh([instance.invoice_id])
+
+
+@receiver(post_delete, sender=InvoiceItem)
+def refresh_item_counts_on_delete(sender, instance, origin=None, **kwargs):
+    # Items deleted along with their invoice have nothing left to count for
+    if isinstance(origin, Invoice):
+        return
+    counts.refresh([instance.invoice_id])
@@ -1,3 +1,502 @@
-from django.test import TestCase
+import io
+from decimal import Decimal
 
-# Create your tests here.
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from invoices.models import IdempotencyKey, Invoice, InvoiceItem, InvoiceNumberBlock, InvoiceSequence
+from invoices import idempotency, ingest
+from invoices.numbering import allocator
+from invoices.serializers import InvoiceCreateSerializer
+from products.models import Product, StockMovement
+
+
+@pytest.mark.django_db
+class TestInvoicePagination:
+    def test_cursor_pagination_over_invoices(self, staff_client, invoice, customer):
+        for number in range(2, 6):
+            Invoice.objects.create(
+                customer=customer,
+                invoice_number=f'INV-2024-00{number}',
+                subtotal=10, tax_amount=2, total_amount=number,
+            )
+
+        response = staff_client.get(
+            '/api/invoices/',
+            {'pagination': 'cursor', 'ordering': '-total_amount', 'page_size': 2}
+        )
+        numbers = [row['invoice_number'] for row in response.data['results']]
+        response = staff_client.get(response.data['next'])
+        numbers += [row['invoice_number'] for row in response.data['results']]
+        response = staff_client.get(response.data['next'])
+        numbers += [row['invoice_number'] for row in response.data['results']]
+
+        assert numbers == [
+            'INV-2024-001', 'INV-2024-005', 'INV-2024-004',
+            'INV-2024-003', 'INV-2024-002',
+        ]
+        assert response.data['next'] is None
+
+
+@pytest.mark.django_db
+class TestInvoiceSparseFieldsets:
+    def test_list_with_related_property(self, staff_client, invoice):
+        response = staff_client.get('/api/invoices/', {'fields': 'invoice_number,customer_name'})
+        assert response.status_code == 200
+        assert response.data['results'] == [{
+            'invoice_number': invoice.invoice_number,
+            'customer_name': invoice.customer.full_name,
+        }]
+
+    def test_queryset_loads_only_needed_columns(self, staff_client, invoice):
+        with CaptureQueriesContext(connection) as queries:
+            response = staff_client.get('/api/invoices/', {'fields': 'invoice_number,customer_name'})
+        assert response.status_code == 200
+        sql = queries.captured_queries[-1]['sql']
+        assert '"first_name"' in sql
+        assert '"notes"' not in sql
+        assert '"phone_number"' not in sql
+
+        with CaptureQueriesContext(connection) as queries:
+            staff_client.get('/api/invoices/', {'fields': 'invoice_number'})
+        sql = queries.captured_queries[-1]['sql']
+        assert 'JOIN' not in sql
+        assert '"total_amount"' not in sql
+
+    def test_retrieve_with_nested_customer(self, staff_client, invoice):
+        response = staff_client.get(
+            f'/api/invoices/{invoice.id}/', {'fields': 'id,customer_details'}
+        )
+        assert response.data['customer_details']['full_name'] == invoice.customer.full_name
+        assert set(response.data) == {'id', 'customer_details'}
+
+
+@pytest.mark.django_db
+class TestInvoiceStock:
+    def _create(self, client, customer, product, quantity):
+        return client.post('/api/invoices/', {
+            'customer': customer.id,
+            'payment_method': 'cash',
+            'items': [{'product': product.id, 'quantity': quantity, 'unit_price': '2.50'}],
+        }, format='json')
+
+    def test_checkout_records_sale_movements(self, authenticated_client, customer, product):
+        response = self._create(authenticated_client, customer, product, 3)
+
+        assert response.status_code == 201
+        product.refresh_from_db()
+        assert product.quantity_in_stock == 97
+        movement = StockMovement.objects.get(product=product)
+        invoice = Invoice.objects.get()
+        assert (movement.kind, movement.quantity, movement.reference) == ('sale', -3, invoice.invoice_number)
+
+    def test_insufficient_stock_rejects_invoice(self, authenticated_client, customer, product):
+        response = self._create(authenticated_client, customer, product, 101)
+
+        assert response.status_code == 400
+        assert 'Insufficient stock for Coca Cola.' in str(response.data)
+        assert not Invoice.objects.exists()
+        assert not StockMovement.objects.exists()
+
+
+@pytest.mark.django_db
+class TestInvoiceNumbering:
+    def _create(self, customer, **extra):
+        return Invoice.objects.create(customer=customer, subtotal=10, tax_amount=2, total_amount=12, **extra)
+
+    def test_numbers_come_from_the_daily_counter(self, customer, django_assert_num_queries):
+        today = timezone.localdate()
+        InvoiceSequence.objects.create(day=today, last_value=41)
+
+        first = self._create(customer)
+        # Counter bump + read, whatever the number of invoices today
+        with django_assert_num_queries(3):
+            second = self._create(customer)
+
+        assert first.invoice_number == f'INV-{today:%Y%m%d}-0042'
+        assert second.invoice_number == f'INV-{today:%Y%m%d}-0043'
+        assert InvoiceSequence.objects.get(day=today).last_value == 43
+
+    def test_first_invoice_of_the_day_opens_the_counter(self, customer):
+        invoice = self._create(customer)
+
+        assert invoice.invoice_number.endswith('-0001')
+        assert InvoiceSequence.objects.get().last_value == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_worker_blocks_are_handed_out_from_memory(self, customer, settings, django_assert_num_queries):
+        settings.INVOICE_NUMBER_BLOCK_SIZE = 10
+
+        numbers = [allocator.next_number() for _ in range(3)]
+        with django_assert_num_queries(0):
+            numbers.append(allocator.next_number())
+
+        assert [number[-4:] for number in numbers] == ['0001', '0002', '0003', '0004']
+        assert InvoiceSequence.objects.get().last_value == 10
+        # Inside a transaction a new block is never cached
+        allocator.clear()
+        with transaction.atomic():
+            assert allocator.next_number().endswith('-0011')
+            assert allocator.next_number().endswith('-0012')
+
+    def test_reserve_block_for_offline_terminal(self, staff_client, customer):
+        today = timezone.localdate()
+        InvoiceSequence.objects.create(day=today, last_value=5)
+
+        response = staff_client.post(
+            '/api/invoices/reserve_numbers/', {'count': 50, 'terminal': 'POS-3'}, format='json'
+        )
+
+        assert response.status_code == 201
+        assert response.data['first_number'] == f'INV-{today:%Y%m%d}-0006'
+        assert response.data['last_number'] == f'INV-{today:%Y%m%d}-0055'
+        assert response.data['count'] == 50
+        assert InvoiceNumberBlock.objects.get().terminal == 'POS-3'
+        assert self._create(customer).invoice_number.endswith('-0056')
+
+    def test_duplicate_client_number_is_rejected(self, authenticated_client, customer, product, monkeypatch):
+        self._create(customer, invoice_number='INV-POS3-0001')
+        body = {
+            'customer': customer.id, 'invoice_number': 'INV-POS3-0001', 'payment_method': 'cash',
+            'items': [{'product': product.id, 'quantity': 1, 'unit_price': '2.50'}],
+        }
+
+        response = authenticated_client.post('/api/invoices/', body, format='json')
+        assert response.status_code == 400
+        assert response.data['invoice_number'] == ['An invoice with this number already exists.']
+
+        # Taken by a concurrent checkout after validation
+        monkeypatch.setattr(InvoiceCreateSerializer, 'validate_invoice_number', lambda self, value: value)
+        response = authenticated_client.post('/api/invoices/', body, format='json')
+        assert response.status_code == 400
+        assert response.data['invoice_number'] == ['An invoice with this number already exists.']
+        assert Invoice.objects.count() == 1
+        assert Product.objects.get(pk=product.pk).quantity_in_stock == 100
+
+    def test_reserve_block_is_staff_only_and_bounded(self, authenticated_client, staff_user, settings):
+        response = authenticated_client.post('/api/invoices/reserve_numbers/', {'count': 5}, format='json')
+        assert response.status_code == 403
+
+        settings.INVOICE_NUMBER_RESERVATION_LIMIT = 100
+        authenticated_client.force_authenticate(user=staff_user)
+        response = authenticated_client.post('/api/invoices/reserve_numbers/', {'count': 101}, format='json')
+        assert response.status_code == 400
+        assert not InvoiceSequence.objects.exists()
+
+
+@pytest.mark.django_db
+class TestBatchedCheckout:
+    def _basket(self, products, quantity=1):
+        return [{'product': product.id, 'quantity': quantity, 'unit_price': '1.00'} for product in products]
+
+    def _checkout(self, client, customer, items):
+        return client.post('/api/invoices/', {
+            'customer': customer.id, 'payment_method': 'cash', 'items': items,
+        }, format='json')
+
+    def test_statement_count_is_constant_in_basket_size(self, authenticated_client, customer, category):
+        products = [
+            Product.objects.create(name=f'Item {n}', price=1, category=category, quantity_in_stock=10)
+            for n in range(40)
+        ]
+        # Warm up: auth lookups and the day's invoice counter
+        self._checkout(authenticated_client, customer, self._basket(products[:1]))
+
+        counts = []
+        for size in (2, 40):
+            with CaptureQueriesContext(connection) as queries:
+                response = self._checkout(authenticated_client, customer, self._basket(products[:size]))
+            assert response.status_code == 201
+            counts.append(len(queries))
+
+        assert counts[0] == counts[1]
+        invoice = Invoice.objects.get(invoice_number=response.data['invoice_number'])
+        assert invoice.items.count() == 40
+        item = invoice.items.get(product=products[39])
+        assert (item.product_name, item.total_price) == ('Item 39', 1)
+        # In both baskets
+        assert Product.objects.get(pk=products[1].pk).quantity_in_stock == 8
+
+    def test_oversold_line_rejects_the_whole_basket(self, authenticated_client, customer, product, category):
+        other = Product.objects.create(name='Water', price=1, category=category, quantity_in_stock=3)
+        # Another till sells the last units after this basket was built
+        Product.objects.filter(pk=other.pk).update(quantity_in_stock=1)
+
+        response = self._checkout(authenticated_client, customer, self._basket([product, other], quantity=2))
+
+        assert response.status_code == 400
+        assert 'Insufficient stock for Water.' in str(response.data)
+        assert not InvoiceItem.objects.exists()
+        assert Product.objects.get(pk=product.pk).quantity_in_stock == 100
+
+    def test_unknown_product_is_rejected(self, authenticated_client, customer, product):
+        items = self._basket([product]) + [{'product': 999999, 'quantity': 1, 'unit_price': '1.00'}]
+
+        response = self._checkout(authenticated_client, customer, items)
+
+        assert response.status_code == 400
+        assert 'Invalid pk "999999" - object does not exist.' in str(response.data['items'])
+        assert not Invoice.objects.exists()
+
+
+@pytest.mark.django_db
+class TestInvoiceItemCounts:
+    def _invoice(self, customer, product, quantities):
+        invoice = Invoice.objects.create(customer=customer, subtotal=0, tax_amount=0, total_amount=0)
+        for quantity in quantities:
+            InvoiceItem.objects.create(invoice=invoice, product=product, quantity=quantity, unit_price=1)
+        return invoice
+
+    def test_checkout_stores_counts(self, authenticated_client, customer, product):
+        response = authenticated_client.post('/api/invoices/', {
+            'customer': customer.id,
+            'payment_method': 'cash',
+            'items': [
+                {'product': product.id, 'quantity': 3, 'unit_price': '2.50'},
+                {'product': product.id, 'quantity': 2, 'unit_price': '2.50'},
+            ],
+        }, format='json')
+
+        assert response.status_code == 201
+        invoice = Invoice.objects.get()
+        assert (invoice.item_count, invoice.unit_count, invoice.total_items) == (2, 5, 5)
+
+    def test_item_writes_keep_counts_in_step(self, customer, product):
+        invoice = self._invoice(customer, product, [1, 4])
+        item = invoice.items.first()
+
+        item.quantity = 6
+        item.save()
+        invoice.refresh_from_db()
+        assert (invoice.item_count, invoice.unit_count) == (2, 10)
+
+        item.delete()
+        invoice.refresh_from_db()
+        assert (invoice.item_count, invoice.unit_count) == (1, 4)
+
+    def test_list_page_is_a_fixed_number_of_queries(self, staff_client, customer, product):
+        for _ in range(2):
+            self._invoice(customer, product, [1, 2])
+        with CaptureQueriesContext(connection) as small:
+            staff_client.get('/api/invoices/')
+        for _ in range(18):
+            self._invoice(customer, product, [1, 2])
+
+        with CaptureQueriesContext(connection) as large:
+            response = staff_client.get('/api/invoices/')
+
+        assert len(response.data['results']) == 20
+        assert len(large) == len(small)
+        row = response.data['results'][0]
+        assert (row['item_count'], row['unit_count'], row['total_items']) == (2, 3, 3)
+        assert row['customer_name'] == customer.full_name
+
+    def test_repair_command_fixes_stale_counts(self, customer, product):
+        stale = self._invoice(customer, product, [2, 3])
+        fresh = self._invoice(customer, product, [1])
+        Invoice.objects.filter(pk=stale.pk).update(item_count=0, unit_count=0)
+
+        out = io.StringIO()
+        call_command('repair_invoice_counts', '--chunk-size', '1', stdout=out)
+
+        assert 'Repaired 1 invoices' in out.getvalue()
+        assert list(Invoice.objects.values_list('id', 'item_count', 'unit_count').order_by('id')) == [
+            (stale.id, 2, 5), (fresh.id, 1, 1),
+        ]
+
+
+@pytest.mark.django_db
+class TestInvoiceIdempotency:
+    def _checkout(self, client, customer, product, key, quantity=3):
+        return client.post('/api/invoices/', {
+            'customer': customer.id,
+            'payment_method': 'cash',
+            'items': [{'product': product.id, 'quantity': quantity, 'unit_price': '2.50'}],
+        }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self, authenticated_client, customer, product):
+        first = self._checkout(authenticated_client, customer, product, 'till-7-0001')
+        retry = self._checkout(authenticated_client, customer, product, 'till-7-0001')
+
+        assert first.status_code == retry.status_code == 201
+        assert retry.json() == first.json()
+        assert retry['Idempotent-Replayed'] == 'true'
+        assert Invoice.objects.count() == 1
+        assert StockMovement.objects.count() == 1
+        product.refresh_from_db()
+        assert product.quantity_in_stock == 97
+
+    def test_new_key_creates_a_new_invoice(self, authenticated_client, customer, product):
+        self._checkout(authenticated_client, customer, product, 'till-7-0001')
+        response = self._checkout(authenticated_client, customer, product, 'till-7-0002')
+
+        assert response.status_code == 201
+        assert 'Idempotent-Replayed' not in response
+        assert Invoice.objects.count() == 2
+
+    def test_key_reused_with_a_different_body_is_rejected(self, authenticated_client, customer, product):
+        self._checkout(authenticated_client, customer, product, 'till-7-0001')
+        response = self._checkout(authenticated_client, customer, product, 'till-7-0001', quantity=4)
+
+        assert response.status_code == 422
+        assert Invoice.objects.count() == 1
+
+    def test_failed_request_is_not_stored(self, authenticated_client, customer, product):
+        response = self._checkout(authenticated_client, customer, product, 'till-7-0001', quantity=101)
+        assert response.status_code == 400
+        assert not IdempotencyKey.objects.exists()
+
+        Product.objects.filter(pk=product.pk).update(quantity_in_stock=200)
+        response = self._checkout(authenticated_client, customer, product, 'till-7-0001', quantity=101)
+        assert response.status_code == 201
+
+    def test_expired_keys_run_again_and_are_swept(self, authenticated_client, customer, product, settings):
+        settings.IDEMPOTENCY_KEY_TTL_SECONDS = 0
+        self._checkout(authenticated_client, customer, product, 'till-7-0001')
+        self._checkout(authenticated_client, customer, product, 'till-7-0002')
+
+        response = self._checkout(authenticated_client, customer, product, 'till-7-0001')
+        assert response.status_code == 201
+        assert 'Idempotent-Replayed' not in response
+        assert Invoice.objects.count() == 3
+
+        out = io.StringIO()
+        call_command('sweep_idempotency_keys', '--chunk-size', '1', stdout=out)
+        assert 'Deleted 2 expired idempotency keys' in out.getvalue()
+        assert not IdempotencyKey.objects.exists()
+
+    def test_concurrent_retry_rolls_back_and_replays(self, authenticated_client, customer, product, monkeypatch):
+        first = self._checkout(authenticated_client, customer, product, 'till-7-0001')
+        lookup = idempotency.lookup
+        calls = []
+
+        def racing_lookup(*args):
+            # The first lookup runs before the other request has committed
+            calls.append(args)
+            return None if len(calls) == 1 else lookup(*args)
+
+        monkeypatch.setattr(idempotency, 'lookup', racing_lookup)
+        retry = self._checkout(authenticated_client, customer, product, 'till-7-0001')
+
+        assert retry.status_code == 201
+        assert retry['Idempotent-Replayed'] == 'true'
+        assert retry.json() == first.json()
+        assert Invoice.objects.count() == 1
+        product.refresh_from_db()
+        assert product.quantity_in_stock == 97
+
+
+@pytest.mark.django_db
+class TestBulkInvoiceIngest:
+    def _sale(self, customer, product, quantity=1, **extra):
+        return {
+            'customer': customer.id,
+            'payment_method': 'cash',
+            'items': [{'product': product.id, 'quantity': quantity, 'unit_price': '2.50'}],
+            **extra,
+        }
+
+    def test_backlog_is_ingested_with_per_invoice_results(self, staff_client, customer, product):
+        sales = [self._sale(customer, product, invoice_number=f'POS3-{n:04d}') for n in range(30)]
+        sales.append(self._sale(customer, product))
+
+        response = staff_client.post('/api/invoices/bulk/', {'invoices': sales}, format='json')
+
+        assert response.status_code == 200
+        body = response.json()
+        assert (body['invoices'], body['created'], body['duplicates'], body['failed']) == (31, 31, 0, 0)
+        assert [result['index'] for result in body['results']] == list(range(31))
+        assert body['results'][0]['invoice_number'] == 'POS3-0000'
+        assert body['results'][30]['invoice_number'].startswith('INV-')
+        invoice = Invoice.objects.get(invoice_number='POS3-0007')
+        assert body['results'][7]['id'] == invoice.id
+        assert (invoice.item_count, invoice.unit_count, invoice.total_amount) == (1, 1, Decimal('3.00'))
+        assert invoice.items.get().product_name == 'Coca Cola'
+        product.refresh_from_db()
+        assert product.quantity_in_stock == 69
+        assert StockMovement.objects.filter(reference='POS3-0007', quantity=-1).exists()
+
+    def test_statement_count_is_constant_in_batch_size(self, staff_client, customer, product):
+        counts = []
+        for size, prefix in ((5, 'A'), (50, 'B')):
+            sales = [self._sale(customer, product, invoice_number=f'{prefix}-{n}') for n in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                response = staff_client.post('/api/invoices/bulk/', {'invoices': sales}, format='json')
+            assert response.json()['created'] == size
+            counts.append(len(queries))
+
+        assert counts[0] == counts[1]
+
+    def test_resync_reports_duplicates(self, staff_client, customer, product):
+        sales = [self._sale(customer, product, invoice_number=f'POS3-{n}') for n in range(3)]
+        staff_client.post('/api/invoices/bulk/', {'invoices': sales}, format='json')
+
+        response = staff_client.post('/api/invoices/bulk/', {'invoices': sales}, format='json')
+
+        body = response.json()
+        assert (body['created'], body['duplicates']) == (0, 3)
+        assert Invoice.objects.count() == 3
+        product.refresh_from_db()
+        assert product.quantity_in_stock == 97
+
+    def test_rejected_invoices_do_not_affect_the_rest(self, staff_client, customer, product, settings):
+        settings.INVOICE_INGEST_GROUP_SIZE = 3
+        sales = [
+            self._sale(customer, product, quantity=40, invoice_number='S-1'),
+            self._sale(customer, product, quantity=70, invoice_number='S-2'),  # oversells
+            self._sale(customer, product, quantity=50, invoice_number='S-3'),
+            {'customer': 999999, 'items': [{'product': product.id, 'quantity': 1, 'unit_price': '1.00'}]},
+            {'customer': customer.id, 'items': [{'product': 999999, 'quantity': 1, 'unit_price': '1.00'}]},
+            self._sale(customer, product, quantity=0, invoice_number='S-4'),
+            self._sale(customer, product, invoice_number='S-1'),
+        ]
+
+        body = staff_client.post('/api/invoices/bulk/', {'invoices': sales}, format='json').json()
+
+        assert [result['status'] for result in body['results']] == [
+            'created', 'failed', 'created', 'failed', 'failed', 'failed', 'failed',
+        ]
+        assert body['results'][1]['errors'] == {'items': ['Insufficient stock for Coca Cola.']}
+        assert 'customer' in body['results'][3]['errors']
+        assert body['results'][4]['errors'] == {'items': ['Invalid pk "999999" - object does not exist.']}
+        assert 'items' in body['results'][5]['errors']
+        assert 'invoice_number' in body['results'][6]['errors']
+        assert set(Invoice.objects.values_list('invoice_number', flat=True)) == {'S-1', 'S-3'}
+        product.refresh_from_db()
+        assert product.quantity_in_stock == 10
+
+    def test_integrity_error_fails_only_that_invoice(self, staff_client, customer, product, settings, monkeypatch):
+        settings.INVOICE_INGEST_GROUP_SIZE = 2
+        build = ingest._build
+
+        def build_broken_row(sale, products, now):
+            invoice, items = build(sale, products, now)
+            if invoice.invoice_number == 'S-3':
+                invoice.subtotal = None  # NOT NULL violation
+            return invoice, items
+
+        monkeypatch.setattr(ingest, '_build', build_broken_row)
+        sales = [self._sale(customer, product, invoice_number=f'S-{n}') for n in range(1, 5)]
+
+        response = staff_client.post('/api/invoices/bulk/', {'invoices': sales}, format='json')
+
+        assert response.status_code == 200
+        body = response.json()
+        assert [result['status'] for result in body['results']] == ['created', 'created', 'failed', 'created']
+        assert body['results'][2]['errors'] == {'non_field_errors': ['The invoice could not be saved.']}
+        assert set(Invoice.objects.values_list('invoice_number', flat=True)) == {'S-1', 'S-2', 'S-4'}
+        product.refresh_from_db()
+        assert product.quantity_in_stock == 97
+
+    def test_bulk_ingest_is_staff_only_and_bounded(self, authenticated_client, staff_user, customer, product, settings):
+        sale = self._sale(customer, product)
+        response = authenticated_client.post('/api/invoices/bulk/', {'invoices': [sale]}, format='json')
+        assert response.status_code == 403
+
+        settings.INVOICE_INGEST_BATCH_LIMIT = 2
+        authenticated_client.force_authenticate(user=staff_user)
+        response = authenticated_client.post('/api/invoices/bulk/', {'invoices': [sale] * 3}, format='json')
+        assert response.status_code == 400
+        assert not Invoice.objects.exists()
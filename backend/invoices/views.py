@@ -1,18 +1,26 @@
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from django.db import IntegrityError, transaction
 from django.utils import timezone
+from core.pagination import OptionalCursorPagination
+from core.views import SparseFieldsetMixin
 from users.models import Customer
+from . import idempotency, ingest, numbering
 from .models import Invoice, InvoiceItem
 from .serializers import (
+    BulkInvoiceIngestSerializer,
     InvoiceSerializer,
     InvoiceCreateSerializer,
     InvoiceListSerializer,
-    InvoiceItemSerializer
+    InvoiceItemSerializer,
+    InvoiceNumberBlockSerializer,
+    InvoiceNumberReservationSerializer,
 )
 
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Invoice management.
     
@@ -27,6 +35,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     - Filter by status, payment method, and customer
     - Search by invoice number or customer name
     - Sort by creation date or total amount
+    - Sparse fieldsets with ?fields=id,name,...
     
     **Status Options:** pending, paid, cancelled, refunded
     **Payment Methods:** cash, card, paypal, other
@@ -36,21 +45,77 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     filterset_fields = ['status', 'payment_method', 'customer']
     search_fields = ['invoice_number', 'customer__first_name', 'customer__last_name']
     ordering_fields = ['created_at', 'total_amount']
+    pagination_class = OptionalCursorPagination
 
     def get_queryset(self):
         if self.request.user.is_staff:
-            return Invoice.objects.all()
-        customer = Customer.objects.filter(user=self.request.user).first()
-        if not customer:
-            return Invoice.objects.none()
-        return Invoice.objects.filter(customer=customer)
+            queryset = Invoice.objects.all()
+        else:
+            customer = Customer.objects.filter(user=self.request.user).first()
+            if not customer:
+                return Invoice.objects.none()
+            queryset = Invoice.objects.filter(customer=customer)
+        # Item counts are stored on the invoice, so a list page needs no
+        # per-row queries beyond the customer join
+        if self.action == 'list':
+            queryset = queryset.select_related('customer')
+        elif self.action == 'retrieve':
+            queryset = queryset.select_related('customer').prefetch_related('items__product__category')
+        return self.apply_sparse_fieldset(queryset)
 
     def get_permissions(self):
-        if self.action in ['update', 'partial_update', 'destroy']:
+        if self.action in ['update', 'partial_update', 'destroy', 'reserve_numbers', 'bulk_ingest']:
             return [IsAdminUser()]
         return [IsAuthenticated()]
 
     def create(self, request, *args, **kwargs):
+        """
+        Create an invoice (checkout).
+
+        Send an `Idempotency-Key` header to make retries safe: a repeated
+        request with the same key and body gets the first response back
+        (with `Idempotent-Replayed: true`) instead of a second invoice.
+        """
+        key = request.headers.get(idempotency.HEADER)
+        if not key:
+            return self._create(request)
+        if len(key) > idempotency.MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{idempotency.HEADER} must be at most {idempotency.MAX_KEY_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        request_fingerprint = idempotency.fingerprint(request.data)
+        try:
+            record = idempotency.lookup(request.user, key, request_fingerprint)
+            if record is None:
+                # Numbered up front, so the counter isn't locked for the
+                # whole checkout (see invoices.numbering)
+                invoice_number = None
+                if not (isinstance(request.data, dict) and request.data.get('invoice_number')):
+                    invoice_number = numbering.allocator.next_number()
+                try:
+                    with transaction.atomic():
+                        response = self._create(request, invoice_number)
+                        if status.is_success(response.status_code):
+                            idempotency.store(request.user, key, request_fingerprint, response)
+                    return response
+                except IntegrityError:
+                    # A concurrent retry with the same key committed first;
+                    # this checkout was rolled back
+                    record = idempotency.lookup(request.user, key, request_fingerprint)
+                    if record is None:
+                        raise
+        except idempotency.KeyReused:
+            return Response(
+                {'error': f'{idempotency.HEADER} was already used for a different request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(
+            record.response, status=record.status_code, headers={idempotency.REPLAYED_HEADER: 'true'}
+        )
+
+    def _create(self, request, invoice_number=None):
         if not request.user.is_staff:
             customer = Customer.objects.filter(user=request.user).first()
             if not customer:
@@ -65,7 +130,8 @@ class InvoiceViewSet(viewsets.ModelViewSet):
 
         serializer = self.get_serializer(data=payload)
         serializer.is_valid(raise_exception=True)
-        invoice = serializer.save()
+        extra = {'invoice_number': invoice_number} if invoice_number else {}
+        invoice = serializer.save(**extra)
         if not request.user.is_staff and invoice.payment_method == 'card':
             invoice.status = 'paid'
             invoice.paid_at = timezone.now()
@@ -82,6 +148,62 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             invoice.paid_at = None
             invoice.save(update_fields=['paid_at'])
     
+    @action(detail=False, methods=['post'])
+    def reserve_numbers(self, request):
+        """
+        Reserve a block of invoice numbers for an offline POS terminal (staff only).
+
+        The terminal numbers its invoices from the block and submits them
+        with `invoice_number` set once it is back online.
+
+        **Request Body:**
+        - count: how many numbers to reserve (up to INVOICE_NUMBER_RESERVATION_LIMIT)
+        - terminal: optional terminal identifier, kept for auditing
+
+        **Returns:** The reserved block (day, first_number, last_number, count)
+        """
+        serializer = InvoiceNumberReservationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        block = numbering.reserve_block(
+            serializer.validated_data['count'],
+            terminal=serializer.validated_data['terminal'],
+            user=request.user,
+        )
+        return Response(InvoiceNumberBlockSerializer(block).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_ingest(self, request):
+        """
+        Create many invoices at once, e.g. the queued sales of a POS terminal
+        that was offline (staff only).
+
+        **Request Body:**
+        ```json
+        {
+            "invoices": [
+                {
+                    "customer": 1,
+                    "invoice_number": "INV-20240102-0042",
+                    "payment_method": "cash",
+                    "items": [{"product": 1, "quantity": 2, "unit_price": "2.50"}]
+                }
+            ]
+        }
+        ```
+        Invoices take the same fields as `POST /api/invoices/`; those without
+        an `invoice_number` are numbered here. They are applied in groups, each
+        group in its own transaction; a rejected invoice doesn't affect the
+        others, and an `invoice_number` that already exists is reported as a
+        duplicate instead of being created twice.
+
+        **Returns:**
+        - invoices, created, duplicates, failed: counts
+        - results: `{index, invoice_number, status, id | errors}` for each invoice, in order
+        """
+        serializer = BulkInvoiceIngestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(ingest.ingest(serializer.validated_data['invoices']))
+
     def get_serializer_class(self):
         if self.action == 'list':
             return InvoiceListSerializer
@@ -106,6 +228,7 @@ class InvoiceItemViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = InvoiceItem.objects.all()
     serializer_class = InvoiceItemSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OptionalCursorPagination
 
     def get_queryset(self):
         if self.request.user.is_staff:
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product
+from .models import Category, Product, StockMovement
 
 
 @admin.register(Category)
@@ -13,7 +13,8 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'brand', 'category', 'price', 'quantity_in_stock', 'stock_status', 'is_active']
     list_filter = ['category', 'is_active', 'created_at']
     search_fields = ['name', 'brand', 'barcode', 'openfoodfacts_id']
-    readonly_fields = ['created_at', 'updated_at', 'last_synced']
+    # Stock changes go through the ledger (bulk_stock / update_stock)
+    readonly_fields = ['quantity_in_stock', 'created_at', 'updated_at', 'last_synced']
     fieldsets = [
         ('Basic Information', {
             'fields': ['name', 'brand', 'category', 'price', 'description']
@@ -38,3 +39,21 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ['is_active', 'created_at', 'updated_at', 'last_synced']
         }),
     ]
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ['product', 'kind', 'quantity', 'reference', 'created_at']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['product__name', 'reference']
+    raw_id_fields = ['product']
+
+    # The ledger is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,173 @@
+"""
+Per-process barcode -> product index for POS scanning.
+
+Entries are pre-rendered in the shape of ``ProductListSerializer`` (plus the
+barcode), so a scan is a dict lookup with no query and no serializer pass.
+
+The index is kept fresh three ways:
+
+- ``post_save``/``post_delete``/``products_bulk_changed`` update this
+  process immediately (see ``products.signals``);
+- at most every ``BARCODE_INDEX_REFRESH_SECONDS`` a lookup pulls rows whose
+  ``updated_at`` moved since the last poll (one indexed range query), which
+  picks up writes made by other worker processes, and the change feed's
+  tombstones since the last poll (``products.changes``) drop products they
+  deleted;
+- a barcode that is not in the index falls back to the database.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import Max
+
+from . import changes
+from .models import Product, ProductChange
+
+ENTRY_FIELDS = [
+    'id', 'name', 'brand', 'price', 'category__name', 'picture', 'picture_url',
+    'picture_variants', 'quantity_in_stock', 'is_active', 'barcode', 'updated_at',
+]
+
+
+def build_entry(row):
+    """Render a ``values()`` row the way ``ProductListSerializer`` would."""
+    picture_url = row['picture_url']
+    if row['picture']:
+        # Same rendition as the list serializer (``images.LIST_VARIANT``)
+        path = (row['picture_variants'] or {}).get('card', row['picture'])
+        picture_url = default_storage.url(path)
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'brand': row['brand'],
+        'price': f"{row['price']:.2f}",
+        'category_name': row['category__name'],
+        'picture_url': picture_url,
+        'quantity_in_stock': row['quantity_in_stock'],
+        'stock_status': Product(quantity_in_stock=row['quantity_in_stock']).stock_status,
+        'is_active': row['is_active'],
+        'barcode': row['barcode'],
+    }
+
+
+class BarcodeIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._barcodes = {}  # product id -> barcode, to drop renamed barcodes
+        self._loaded = False
+        self._watermark = None
+        self._change_id = 0
+        self._polled_at = 0.0
+
+    def _rows(self, queryset):
+        return queryset.exclude(barcode__isnull=True).exclude(barcode='').values(*ENTRY_FIELDS)
+
+    def _put(self, row):
+        old_barcode = self._barcodes.get(row['id'])
+        if old_barcode and old_barcode != row['barcode']:
+            self._entries.pop(old_barcode, None)
+        self._entries[row['barcode']] = build_entry(row)
+        self._barcodes[row['id']] = row['barcode']
+        if self._watermark is None or row['updated_at'] > self._watermark:
+            self._watermark = row['updated_at']
+
+    def warm(self):
+        """(Re)load every product with a barcode."""
+        with self._lock:
+            self._entries = {}
+            self._barcodes = {}
+            self._watermark = Product.objects.aggregate(latest=Max('updated_at'))['latest']
+            self._change_id = ProductChange.objects.aggregate(latest=Max('id'))['latest'] or 0
+            for row in self._rows(Product.objects.all()).iterator(chunk_size=2000):
+                self._put(row)
+            self._loaded = True
+            self._polled_at = time.monotonic()
+
+    def warm_in_background(self):
+        def run():
+            try:
+                self.warm()
+            finally:
+                connection.close()
+
+        threading.Thread(target=run, name='barcode-index-warm', daemon=True).start()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._barcodes = {}
+            self._loaded = False
+            self._watermark = None
+            self._change_id = 0
+
+    def refresh(self, product_ids):
+        """Reload the given products (called from signal handlers)."""
+        if not self._loaded:
+            return
+        with self._lock:
+            found = set()
+            for row in self._rows(Product.objects.filter(id__in=list(product_ids))):
+                self._put(row)
+                found.add(row['id'])
+            for product_id in set(product_ids) - found:
+                self.discard(product_id)
+
+    def discard(self, product_id):
+        with self._lock:
+            barcode = self._barcodes.pop(product_id, None)
+            if barcode:
+                self._entries.pop(barcode, None)
+
+    def _poll(self):
+        now = time.monotonic()
+        if now - self._polled_at < settings.BARCODE_INDEX_REFRESH_SECONDS:
+            return
+        with self._lock:
+            self._polled_at = now
+            queryset = Product.objects.all()
+            if self._watermark is not None:
+                # Overlap the window so rows committed late with an older
+                # updated_at are not skipped; re-applying a row is harmless.
+                since = self._watermark - timedelta(seconds=settings.BARCODE_INDEX_OVERLAP_SECONDS)
+                queryset = queryset.filter(updated_at__gte=since)
+            for row in self._rows(queryset):
+                self._put(row)
+            # Deleted rows can't show up above; their tombstones can
+            has_more = True
+            while has_more:
+                _, deleted, self._change_id, has_more = changes.feed(self._change_id)
+                for product_id in deleted:
+                    self.discard(product_id)
+
+    def lookup(self, barcode):
+        """
+        Return ``(entry, hit)`` for a barcode; ``entry`` is None when the
+        product does not exist.
+        """
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.warm()
+        self._poll()
+
+        entry = self._entries.get(barcode)
+        if entry is not None:
+            return entry, True
+
+        row = self._rows(Product.objects.filter(barcode=barcode)).first()
+        if row is None:
+            return None, False
+        with self._lock:
+            self._put(row)
+        return self._entries[barcode], False
+
+    def __len__(self):
+        return len(self._entries)
+
+
+barcode_index = BarcodeIndex()
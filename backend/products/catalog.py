@@ -0,0 +1,80 @@
+"""
+Denormalized customer catalog (``CatalogEntry``).
+
+Each product's list payload is rendered once, when the product changes,
+with ``barcode_index.build_entry`` (the ``ProductListSerializer`` shape),
+and stored as JSON text next to the columns catalog reads filter and sort
+on. The catalog endpoint then reads one indexed table and joins the stored
+payloads into the response body: no category join, no serializer pass and
+no per-row URL resolution at read time (local media URLs are made absolute
+with one string replace over the joined payloads).
+
+Entries are refreshed from the same signals as the other derived data
+(``post_save`` and ``products_bulk_changed``, which category renames and
+stock changes also send) inside the writing transaction, and deleted with
+their product by the cascade.
+"""
+import json
+
+from django.db import transaction
+from django.utils import timezone
+
+from .barcode_index import ENTRY_FIELDS, build_entry
+from .models import CatalogEntry, Product
+
+FIELDS = ENTRY_FIELDS + ['category_id', 'created_at']
+COLUMNS = [
+    'name', 'brand', 'category_id', 'price', 'in_stock', 'is_active',
+    'created_at', 'updated_at', 'payload',
+]
+
+# Products per refresh statement
+CHUNK_SIZE = 500
+
+
+def render(row, now):
+    """Column values of the catalog entry for a ``values(*FIELDS)`` row."""
+    payload = build_entry(row)
+    del payload['barcode']
+    return {
+        'product_id': row['id'],
+        'name': row['name'],
+        'brand': row['brand'],
+        'category_id': row['category_id'],
+        'price': row['price'],
+        'in_stock': row['quantity_in_stock'] > 0,
+        'is_active': row['is_active'],
+        'created_at': row['created_at'],
+        'updated_at': now,
+        'payload': json.dumps(payload, separators=(',', ':')),
+    }
+
+
+def refresh(product_ids):
+    """Re-render the catalog entries of ``product_ids``."""
+    product_ids = list(product_ids)
+    now = timezone.now()
+    with transaction.atomic(savepoint=False):
+        for start in range(0, len(product_ids), CHUNK_SIZE):
+            rows = Product.objects.filter(id__in=product_ids[start:start + CHUNK_SIZE]).values(*FIELDS)
+            CatalogEntry.objects.bulk_create(
+                [CatalogEntry(**render(row, now)) for row in rows],
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=COLUMNS,
+            )
+
+
+def rebuild(chunk_size=2000):
+    """Re-render every entry; returns the number of products."""
+    count = 0
+    last_id = 0
+    products = Product.objects.order_by('id').values_list('id', flat=True)
+    while True:
+        ids = list(products.filter(id__gt=last_id)[:chunk_size])
+        if not ids:
+            break
+        refresh(ids)
+        count += len(ids)
+        last_id = ids[-1]
+    return count
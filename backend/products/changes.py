@@ -0,0 +1,68 @@
+"""
+Catalog change feed for POS and offline clients.
+
+Every product write (``post_save``, ``post_delete`` and
+``products_bulk_changed``, see ``products.signals``) replaces the product's
+``ProductChange`` row inside the writing transaction. The new row gets a
+fresh AUTOINCREMENT id, so the table is ordered by change and holds at
+most one row per product: a client that last saw sequence N asks for rows
+with ``id > N`` (a primary key range scan) and gets each changed product
+once, however often it was written, plus tombstones for deletions. A poll
+with nothing new is one indexed lookup that returns no rows.
+
+Sequence numbers are allocated at insert time, so on databases with
+concurrent writers a transaction can commit a lower number after a higher
+one was read. ``PRODUCT_CHANGES_SETTLE_SECONDS`` holds the returned
+watermark back by that long; SQLite serializes writers, hence the default
+of 0.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ProductChange
+
+
+def record(product_ids, deleted=False):
+    """Move ``product_ids`` to the head of the change feed."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    now = timezone.now()
+    # Part of the caller's write; only needs a transaction of its own outside one
+    with transaction.atomic(savepoint=False):
+        ProductChange.objects.filter(product_id__in=product_ids).delete()
+        ProductChange.objects.bulk_create([
+            ProductChange(product_id=product_id, deleted=deleted, changed_at=now)
+            for product_id in product_ids
+        ])
+
+
+def feed(since=0, limit=None):
+    """
+    Return ``(changed ids, deleted ids, watermark, has_more)`` for changes
+    after sequence ``since``, oldest first, at most ``limit`` of them.
+    """
+    limit = limit or settings.PRODUCT_CHANGES_PAGE_SIZE
+    rows = list(
+        ProductChange.objects.filter(id__gt=since)
+        .order_by('id')
+        .values_list('id', 'product_id', 'deleted', 'changed_at')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    changed = [product_id for _, product_id, deleted, _ in rows if not deleted]
+    deleted = [product_id for _, product_id, deleted, _ in rows if deleted]
+    watermark = since
+    settle = settings.PRODUCT_CHANGES_SETTLE_SECONDS
+    settled_before = timezone.now() - timedelta(seconds=settle)
+    for sequence, _, _, changed_at in rows:
+        if settle and changed_at > settled_before:
+            # Later rows are re-sent on the next poll; applying them twice is harmless
+            has_more = False
+            break
+        watermark = sequence
+    return changed, deleted, watermark, has_more
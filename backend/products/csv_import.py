@@ -0,0 +1,131 @@
+"""
+Bulk product import from supplier CSV files.
+
+The upload is read as a stream (``csv.DictReader`` over the uploaded file)
+and handled in chunks: rows are validated with
+``ProductImportRowSerializer`` using one serializer instance and a
+preloaded category map, so validation issues no queries, then each chunk
+is upserted by barcode with ``bulk_create``/``bulk_update`` in its own
+transaction, with quantities applied as stock ledger adjustments. A bad row never aborts the import; it is reported with its
+line number instead, and so is a file that stops decoding part-way.
+"""
+import csv
+import io
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from . import stock
+from .bulk import CREATED, upsert_products_by_barcode
+from .models import Category, Product
+from .serializers import ProductImportRowSerializer
+
+# Report at most this many row errors
+MAX_ERRORS = 1000
+
+
+class ImportFileError(Exception):
+    pass
+
+
+def category_map():
+    """Lower-cased category name and str(id) -> category id."""
+    categories = {}
+    for category_id, name in Category.objects.values_list('id', 'name'):
+        categories[name.lower()] = category_id
+        categories[str(category_id)] = category_id
+    return categories
+
+
+def _clean(row):
+    # Empty cells mean "not provided"; text fields may still be blanked
+    return {
+        key.strip(): value.strip()
+        for key, value in row.items()
+        if key and value is not None and value.strip() != ''
+    }
+
+
+def _write(chunk, batch_size):
+    """
+    Upsert a chunk of (barcode -> values), one statement set per column set.
+    Quantities are set through the stock ledger rather than written directly.
+    """
+    quantities = {
+        barcode: values.pop('quantity_in_stock')
+        for barcode, values in chunk.items() if 'quantity_in_stock' in values
+    }
+    groups = {}
+    for barcode, values in chunk.items():
+        groups.setdefault(frozenset(values), {})[barcode] = values
+    outcomes = {}
+    with transaction.atomic():
+        for rows in groups.values():
+            outcomes.update(upsert_products_by_barcode(rows, batch_size=batch_size))
+        if quantities:
+            ids = Product.objects.filter(barcode__in=list(quantities)).values_list('barcode', 'id')
+            stock.apply_adjustments(
+                [{'product': product_id, 'quantity': quantities[barcode]} for barcode, product_id in ids],
+                reference='csv-import',
+            )
+    return outcomes
+
+
+def import_products(file, batch_size=None):
+    """
+    Import products from a binary CSV file object.
+
+    The header row names ``ProductImportRowSerializer`` fields; ``barcode``,
+    ``name`` and ``price`` are required. Returns a report dict with
+    ``rows``, ``created``, ``updated``, ``failed`` and ``errors``
+    (``{'line': n, 'barcode': ..., 'errors': {...}}``).
+    """
+    batch_size = batch_size or settings.PRODUCT_IMPORT_BATCH_SIZE
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    try:
+        header = [name.strip() for name in reader.fieldnames or []]
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise ImportFileError(f'Could not read the CSV file: {exc}')
+    if 'barcode' not in header:
+        raise ImportFileError('The CSV file needs a header row with a "barcode" column')
+
+    validator = ProductImportRowSerializer(context={'categories': category_map()})
+    report = {'rows': 0, 'created': 0, 'updated': 0, 'failed': 0, 'errors': []}
+    chunk = {}
+
+    def flush():
+        for outcome in _write(chunk, batch_size).values():
+            report['created' if outcome == CREATED else 'updated'] += 1
+        chunk.clear()
+
+    try:
+        for row in reader:
+            report['rows'] += 1
+            data = _clean(row)
+            try:
+                values = validator.run_validation(data)
+            except ValidationError as exc:
+                report['failed'] += 1
+                if len(report['errors']) < MAX_ERRORS:
+                    report['errors'].append({
+                        'line': reader.line_num,
+                        'barcode': data.get('barcode', ''),
+                        'errors': exc.detail,
+                    })
+                continue
+            if 'category' in values:
+                values['category_id'] = values.pop('category')
+            chunk[values.pop('barcode')] = values
+            if len(chunk) >= batch_size:
+                flush()
+    except (UnicodeDecodeError, csv.Error) as exc:
+        # Keep what was read so far and report where the file broke
+        report['errors'].append({
+            'line': reader.line_num,
+            'barcode': '',
+            'errors': {'file': [f'Could not read the rest of the file: {exc}']},
+        })
+    if chunk:
+        flush()
+    return report
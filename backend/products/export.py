@@ -0,0 +1,96 @@
+"""
+Streaming catalog export (CSV or NDJSON).
+
+The filtered queryset is read as plain ``values_list`` tuples with
+``QuerySet.iterator()``, so rows are fetched from the database cursor in
+chunks and never materialized as model instances or held in full. Each
+chunk is rendered to one string and handed to a ``StreamingHttpResponse``,
+which keeps memory flat however many products match and finishes the
+export in a single query.
+
+CSV columns use the ``POST /api/products/import/`` names, so an export can
+be edited and imported back.
+"""
+import csv
+import io
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# (column name, queryset field)
+COLUMNS = [
+    ('id', 'id'),
+    ('barcode', 'barcode'),
+    ('name', 'name'),
+    ('brand', 'brand'),
+    ('price', 'price'),
+    ('category', 'category__name'),
+    ('quantity_in_stock', 'quantity_in_stock'),
+    ('energy_kcal', 'energy_kcal'),
+    ('fat', 'fat'),
+    ('saturated_fat', 'saturated_fat'),
+    ('carbohydrates', 'carbohydrates'),
+    ('sugars', 'sugars'),
+    ('proteins', 'proteins'),
+    ('salt', 'salt'),
+    ('fiber', 'fiber'),
+    ('nutrition_score', 'nutrition_score'),
+    ('nutrition_grade', 'nutrition_grade'),
+    ('description', 'description'),
+    ('picture_url', 'picture_url'),
+    ('is_active', 'is_active'),
+    ('updated_at', 'updated_at'),
+]
+HEADER = [name for name, _ in COLUMNS]
+
+
+def _chunks(queryset, chunk_size):
+    rows = queryset.values_list(*[field for _, field in COLUMNS]).iterator(chunk_size=chunk_size)
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(queryset, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for chunk in _chunks(queryset, chunk_size):
+        writer.writerows([_csv_value(value) for value in row] for row in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(queryset, chunk_size):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for chunk in _chunks(queryset, chunk_size):
+        yield ''.join(encoder.encode(dict(zip(HEADER, row))) + '\n' for row in chunk)
+
+
+def stream(queryset, export_format, chunk_size=None):
+    """Return an iterator of text chunks rendering ``queryset`` as ``export_format``."""
+    chunk_size = chunk_size or settings.PRODUCT_EXPORT_CHUNK_SIZE
+    if export_format == 'ndjson':
+        return stream_ndjson(queryset, chunk_size)
+    return stream_csv(queryset, chunk_size)
@@ -0,0 +1,156 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, SearchFilter
+from . import fuzzy, search
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    ``?search=`` backed by the FTS5 index when available.
+
+    Matches name, brand, barcode, description and category name with
+    prefix matching, ordered by relevance unless ``?ordering=`` is given.
+    Falls back to the regular ``LIKE`` based ``SearchFilter`` otherwise.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not search.is_available():
+            return super().filter_queryset(request, queryset, view)
+        return search.filter_queryset(queryset, terms)
+
+
+class ProductFuzzySearchFilter(BaseFilterBackend):
+    """
+    ``?fuzzy=`` typo-tolerant search over product name and brand.
+
+    Backed by the trigram index in ``products.fuzzy``; results are ordered
+    by similarity unless ``?ordering=`` is given.
+    """
+    fuzzy_param = 'fuzzy'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.fuzzy_param, '').strip()
+        if not term:
+            return queryset
+        return fuzzy.filter_queryset(queryset, term)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.fuzzy_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Typo-tolerant search on name and brand, ranked by similarity.',
+            'schema': {'type': 'string'},
+        }]
+
+
+class ProductNutrientFilter(BaseFilterBackend):
+    """
+    Range filters on the nutrition columns and the nutrition score, e.g.
+    ``?sugars__lte=5&proteins__gte=10&nutrition_score__lt=3``, plus
+    ``?nutrition_grade=A,B``. Products without the value never match a
+    range.
+    """
+    range_fields = [
+        'energy_kcal', 'fat', 'saturated_fat', 'carbohydrates',
+        'sugars', 'proteins', 'salt', 'fiber', 'nutrition_score',
+    ]
+    lookups = ['gt', 'gte', 'lt', 'lte']
+    grade_param = 'nutrition_grade'
+
+    def filter_queryset(self, request, queryset, view):
+        filters = {}
+        errors = {}
+        for field in self.range_fields:
+            for lookup in self.lookups:
+                param = f'{field}__{lookup}'
+                value = request.query_params.get(param)
+                if value is None:
+                    continue
+                try:
+                    filters[param] = Decimal(value)
+                except InvalidOperation:
+                    errors[param] = ['A number is required.']
+                    continue
+                if not filters[param].is_finite():
+                    errors[param] = ['A number is required.']
+        if errors:
+            raise ValidationError(errors)
+
+        grades = request.query_params.get(self.grade_param)
+        if grades:
+            filters['nutrition_grade__in'] = [grade.strip().upper() for grade in grades.split(',')]
+        return queryset.filter(**filters) if filters else queryset
+
+    def get_schema_operation_parameters(self, view):
+        parameters = [
+            {
+                'name': f'{field}__{lookup}',
+                'required': False,
+                'in': 'query',
+                'description': f'{field} {lookup} value (per 100 g).',
+                'schema': {'type': 'number'},
+            }
+            for field in self.range_fields for lookup in self.lookups
+        ]
+        parameters.append({
+            'name': self.grade_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Comma-separated nutrition grades (A-E).',
+            'schema': {'type': 'string'},
+        })
+        return parameters
+
+
+class CatalogFilter(BaseFilterBackend):
+    """
+    Filters of the customer catalog read model: ``?category=<id>``,
+    ``?in_stock=true`` and ``?search=`` (full-text, ranked by relevance
+    unless ``?ordering=`` is given).
+    """
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        if params.get('category'):
+            try:
+                queryset = queryset.filter(category_id=int(params['category']))
+            except ValueError:
+                raise ValidationError({'category': ['A category ID is required.']})
+        if params.get('in_stock', '').lower() in ('true', '1'):
+            queryset = queryset.filter(in_stock=True)
+
+        term = params.get('search', '').strip()
+        if term:
+            if search.is_available():
+                queryset = search.filter_queryset(queryset, term.split())
+            else:
+                queryset = queryset.filter(Q(name__icontains=term) | Q(brand__icontains=term))
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': 'category',
+                'required': False,
+                'in': 'query',
+                'description': 'Category ID.',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': 'in_stock',
+                'required': False,
+                'in': 'query',
+                'description': 'Only products in stock.',
+                'schema': {'type': 'boolean'},
+            },
+            {
+                'name': 'search',
+                'required': False,
+                'in': 'query',
+                'description': 'Full-text search on name, brand, barcode, description and category.',
+                'schema': {'type': 'string'},
+            },
+        ]
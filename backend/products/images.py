@@ -0,0 +1,116 @@
+"""
+Resized WebP renditions of uploaded product pictures.
+
+Uploads are stored as-is; ``schedule`` then renders a ``thumbnail``,
+``card`` and ``full`` variant with Pillow on a small thread pool once the
+upload's transaction has committed, so requests never wait on image work.
+The storage paths land in ``Product.picture_variants`` and list endpoints
+serve the ``card`` variant instead of the original.
+"""
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Product
+from .signals import products_bulk_changed
+
+logger = logging.getLogger(__name__)
+
+# name -> bounding box; images are only ever scaled down
+VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1200, 1200),
+}
+LIST_VARIANT = 'card'
+
+_executor = None
+
+
+def render(source, size, quality=None):
+    """Return ``source`` (an open PIL image) resized into ``size`` as WebP bytes."""
+    image = source.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, 'WEBP', quality=quality or settings.PRODUCT_IMAGE_WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def generate_variants(product_id):
+    """
+    Render and store the variants of a product's current picture.
+
+    Returns the new ``picture_variants`` dict, or ``None`` if the product
+    is gone or its picture changed while rendering.
+    """
+    product = Product.objects.only('id', 'picture', 'picture_variants').filter(pk=product_id).first()
+    if product is None:
+        return None
+    storage = product.picture.storage
+    old_paths = set(product.picture_variants.values())
+
+    variants = {}
+    if product.picture:
+        with product.picture.open('rb') as handle:
+            source = ImageOps.exif_transpose(Image.open(handle))
+            source.load()
+        # Paths change with the source, so variant URLs can be cached forever
+        stem = hashlib.sha1(product.picture.name.encode()).hexdigest()[:12]
+        for name, size in VARIANTS.items():
+            path = f'products/variants/{product.pk}/{stem}-{name}.webp'
+            if storage.exists(path):
+                storage.delete(path)
+            variants[name] = storage.save(path, ContentFile(render(source, size)))
+
+    if product.picture:
+        unchanged = Q(picture=product.picture.name)
+    else:
+        unchanged = Q(picture__isnull=True) | Q(picture='')
+    updated = Product.objects.filter(unchanged, pk=product.pk).update(
+        picture_variants=variants, updated_at=timezone.now()
+    )
+    if not updated:
+        for path in set(variants.values()) - old_paths:
+            storage.delete(path)
+        return None
+    for path in old_paths - set(variants.values()):
+        storage.delete(path)
+    products_bulk_changed.send(sender=Product, product_ids=[product.pk], fields=['picture_variants'])
+    return variants
+
+
+def _run(product_id):
+    try:
+        generate_variants(product_id)
+    except Exception:
+        logger.exception('Could not render image variants for product %s', product_id)
+    finally:
+        connection.close()
+
+
+def schedule(product_id):
+    """Render variants for ``product_id`` after the current transaction commits."""
+    global _executor
+    if not settings.PRODUCT_IMAGE_ASYNC:
+        transaction.on_commit(lambda: generate_variants(product_id))
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PRODUCT_IMAGE_WORKERS, thread_name_prefix='product-images'
+        )
+    transaction.on_commit(lambda: _executor.submit(_run, product_id))
+
+
+def variant_url(product, name=LIST_VARIANT):
+    path = (product.picture_variants or {}).get(name)
+    return product.picture.storage.url(path) if path else None
@@ -0,0 +1,40 @@
+"""
+Snapshot stock levels so point-in-time lookups don't replay the ledger.
+
+Products with movements since their last snapshot get a new snapshot as of
+``now - --lag-seconds``; the lag keeps the snapshot clear of sales that are
+still committing. With ``--prune-days`` movements older than that (and
+already covered by a snapshot) are deleted.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from products import stock
+
+
+class Command(BaseCommand):
+    help = 'Snapshot stock levels and optionally prune old stock movements'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lag-seconds', type=int, default=300,
+            help='Snapshot the levels as of this many seconds ago'
+        )
+        parser.add_argument(
+            '--prune-days', type=int, default=None,
+            help='Delete movements older than this many days'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        at = now - timedelta(seconds=options['lag_seconds'])
+        prune_before = None
+        if options['prune_days'] is not None:
+            prune_before = now - timedelta(days=options['prune_days'])
+
+        snapshots, deleted = stock.compact(at, prune_before)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {snapshots} stock snapshots, pruned {deleted} movements'
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from products import images
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Backfill thumbnail/card/full WebP variants for uploaded product pictures'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Re-render products that already have variants',
+        )
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(Q(picture__isnull=True) | Q(picture='')).order_by('id')
+        if not options['force']:
+            products = products.filter(picture_variants={})
+
+        done = failed = 0
+        last_id = 0
+        while True:
+            ids = list(products.filter(id__gt=last_id).values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            last_id = ids[-1]
+            for product_id in ids:
+                try:
+                    images.generate_variants(product_id)
+                    done += 1
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'Product {product_id}: {exc}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated variants for {done} products ({failed} failed)'
+        ))
@@ -0,0 +1,168 @@
+"""
+Seed products from an Open Food Facts data dump.
+
+The dump (JSONL or the tab-separated CSV export, optionally gzipped) is read
+one line at a time and written in fixed-size batches, so memory stays flat
+regardless of the dump size. Progress lines report the byte offset reached
+after each committed batch; pass it back with ``--offset`` to resume.
+"""
+import csv
+import gzip
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products import mirror
+from products.bulk import upsert_products_by_barcode
+from products.models import Product
+from products.openfoodfacts import NUTRIMENT_FIELDS, SYNC_CREATE_DEFAULTS, map_product
+
+# CSV columns copied as-is onto the product payload
+CSV_PRODUCT_COLUMNS = [
+    'product_name', 'brands', 'image_url', 'ingredients_text',
+    'countries_tags', 'categories_tags',
+]
+
+
+def _open(path):
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _tags(value):
+    if isinstance(value, str):
+        return {tag.strip() for tag in value.split(',') if tag.strip()}
+    return set(value or [])
+
+
+class Command(BaseCommand):
+    help = 'Stream-import products from an Open Food Facts JSONL or CSV dump'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the dump (.jsonl, .csv, optionally .gz)')
+        parser.add_argument(
+            '--format', choices=['jsonl', 'csv'],
+            help='Dump format (guessed from the file name by default)'
+        )
+        parser.add_argument('--barcodes', help='File with the barcodes to import, one per line')
+        parser.add_argument(
+            '--existing-only', action='store_true',
+            help='Only refresh products that already exist in the catalog'
+        )
+        parser.add_argument('--country', help='Country tag to keep, e.g. en:france')
+        parser.add_argument('--category', help='Category tag to keep, e.g. en:beverages')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--offset', type=int, default=0,
+            help='Byte offset to resume from (as printed by a previous run)'
+        )
+        parser.add_argument('--limit', type=int, help='Stop after importing this many products')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'Dump not found: {path}')
+
+        dump_format = options['format'] or ('csv' if '.csv' in path.suffixes else 'jsonl')
+        wanted = self._wanted_barcodes(options)
+        country = options['country']
+        category = options['category']
+        batch_size = options['batch_size']
+        limit = options['limit']
+
+        scanned = imported = 0
+        batch = {}
+        started = time.monotonic()
+
+        with _open(path) as dump:
+            header = None
+            if dump_format == 'csv':
+                header_line = dump.readline()
+                header = next(csv.reader([header_line.decode('utf-8')], delimiter='\t'))
+            offset = max(options['offset'], dump.tell())
+            dump.seek(offset)
+
+            for line in dump:
+                offset += len(line)
+                scanned += 1
+                product = self._parse(line, dump_format, header)
+                if not isinstance(product, dict):
+                    continue
+
+                barcode = str(product.get('code') or '').strip()
+                if not barcode or len(barcode) > 50:
+                    continue
+                if wanted is not None and barcode not in wanted:
+                    continue
+                if country and country not in _tags(product.get('countries_tags')):
+                    continue
+                if category and category not in _tags(product.get('categories_tags')):
+                    continue
+
+                product.setdefault('id', product.get('_id') or barcode)
+                batch[barcode] = map_product(product)
+
+                reached_limit = limit and imported + len(batch) >= limit
+                if len(batch) >= batch_size or reached_limit:
+                    imported += self._flush(batch)
+                    self._report(scanned, imported, offset, started)
+                    if reached_limit:
+                        break
+
+            if batch:
+                imported += self._flush(batch)
+            self._report(scanned, imported, offset, started)
+
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} products'))
+
+    def _wanted_barcodes(self, options):
+        wanted = None
+        if options['barcodes']:
+            with open(options['barcodes']) as barcodes_file:
+                wanted = {line.strip() for line in barcodes_file if line.strip()}
+        if options['existing_only']:
+            existing = set(
+                Product.objects.exclude(barcode__isnull=True).values_list('barcode', flat=True)
+            )
+            wanted = existing if wanted is None else wanted & existing
+        return wanted
+
+    def _parse(self, line, dump_format, header):
+        try:
+            text = line.decode('utf-8').rstrip('\r\n')
+        except UnicodeDecodeError:
+            return None
+        if not text:
+            return None
+
+        if dump_format == 'jsonl':
+            try:
+                return json.loads(text)
+            except ValueError:
+                return None
+
+        values = dict(zip(header, next(csv.reader([text], delimiter='\t', quoting=csv.QUOTE_NONE))))
+        product = {column: values.get(column, '') for column in CSV_PRODUCT_COLUMNS}
+        product['code'] = values.get('code', '')
+        product['nutriments'] = {
+            key: values[key] for key in NUTRIMENT_FIELDS.values() if values.get(key)
+        }
+        return product
+
+    def _flush(self, batch):
+        # Keep products on images we already mirrored, mirror the new ones
+        mirror.substitute_known(list(batch.values()))
+        written = upsert_products_by_barcode(batch, create_defaults=SYNC_CREATE_DEFAULTS)
+        mirror.schedule(Product.objects.filter(barcode__in=list(batch)))
+        batch.clear()
+        return len(written)
+
+    def _report(self, scanned, imported, offset, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'offset={offset} scanned={scanned} imported={imported} '
+            f'rows/sec={scanned / elapsed:.0f}'
+        )
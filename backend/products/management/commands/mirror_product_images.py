@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from products import mirror
+
+
+class Command(BaseCommand):
+    help = 'Copy upstream (Open Food Facts) product images into our storage'
+
+    def handle(self, *args, **options):
+        pending = mirror.pending().count()
+        counts = mirror.mirror_products()
+        self.stdout.write(self.style.SUCCESS(
+            f"{pending} products pending: mirrored {counts['mirrored']} images, "
+            f"{counts['failed']} failed"
+        ))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products import catalog
+
+
+class Command(BaseCommand):
+    help = 'Re-render every entry of the denormalized customer catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = catalog.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {count} catalog entries in {time.monotonic() - started:.1f}s'
+        ))
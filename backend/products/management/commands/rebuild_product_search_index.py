@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from products import fuzzy, search
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text (FTS5) and fuzzy (trigram) search indexes'
+
+    def handle(self, *args, **options):
+        if search.is_available():
+            search.rebuild()
+        else:
+            self.stdout.write('Full-text search index is not supported by this database')
+        fuzzy.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {Product.objects.count()} products'
+        ))
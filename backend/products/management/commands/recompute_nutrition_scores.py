@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products import nutrition
+
+
+class Command(BaseCommand):
+    help = 'Recompute the nutrition score and grade of every product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=nutrition.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        updated = nutrition.recompute(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {updated} nutrition scores in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,116 @@
+"""
+Background worker that refreshes products whose Open Food Facts data is stale.
+
+Each pass walks the products whose ``last_synced`` is older than the
+threshold in small batches. Batches are paced to stay under
+``--rate`` barcodes per second so neither the upstream API nor the SQLite
+writer sees a burst. The payload cache is bypassed (cached validators are
+still sent, so unchanged products cost a 304): with a threshold below
+``OPEN_FOOD_FACTS_CACHE_TTL`` it would otherwise serve the very payloads
+that made the products stale. Without ``--once`` the worker sleeps
+``--interval`` seconds between passes and runs until interrupted.
+"""
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from products.models import Product
+from products.openfoodfacts import sync_barcodes
+
+
+class Command(BaseCommand):
+    help = 'Periodically re-sync products whose Open Food Facts data is stale'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age-hours', type=float,
+            default=settings.OPEN_FOOD_FACTS_RESYNC_MAX_AGE_HOURS,
+            help='Re-sync products last synced longer ago than this'
+        )
+        parser.add_argument('--batch-size', type=int, default=25)
+        parser.add_argument(
+            '--rate', type=float, default=settings.OPEN_FOOD_FACTS_RESYNC_RATE,
+            help='Maximum barcodes fetched per second'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=300,
+            help='Seconds to sleep between passes'
+        )
+        parser.add_argument(
+            '--include-unsynced', action='store_true',
+            help='Also sync products with a barcode that were never synced'
+        )
+        parser.add_argument('--once', action='store_true', help='Run a single pass and exit')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report which products would be refreshed'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                self.run_pass(options)
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped')
+
+    def stale_products(self, options):
+        cutoff = timezone.now() - timedelta(hours=options['max_age_hours'])
+        stale = Q(last_synced__lt=cutoff)
+        if options['include_unsynced']:
+            stale |= Q(last_synced__isnull=True)
+        return Product.objects.filter(stale).exclude(barcode__isnull=True).exclude(barcode='')
+
+    def run_pass(self, options):
+        queryset = self.stale_products(options)
+        total = queryset.count()
+        self.stdout.write(f'{total} stale products')
+
+        if options['dry_run']:
+            for barcode in queryset.order_by('last_synced').values_list('barcode', flat=True)[:20]:
+                self.stdout.write(f'  would refresh {barcode}')
+            return Counter()
+
+        batch_size = options['batch_size']
+        rate = options['rate']
+        totals = Counter()
+        processed = 0
+        last_id = 0
+        started = time.monotonic()
+
+        # Walk by id so failed or not-found barcodes don't block the pass
+        while True:
+            batch = list(
+                queryset.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'barcode')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+
+            batch_started = time.monotonic()
+            outcomes = sync_barcodes([barcode for _, barcode in batch], use_cache=False)
+            totals.update(outcome['status'] for outcome in outcomes)
+            processed += len(batch)
+
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{processed}/{total} processed '
+                f'({", ".join(f"{k}={v}" for k, v in sorted(totals.items()))}) '
+                f'{processed / max(elapsed, 1e-6):.1f} barcodes/sec'
+            )
+
+            if rate > 0:
+                pause = len(batch) / rate - (time.monotonic() - batch_started)
+                if pause > 0:
+                    time.sleep(pause)
+
+        return totals
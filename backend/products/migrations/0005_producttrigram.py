@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_trigram_index(apps, schema_editor):
+    from products.fuzzy import product_trigrams
+    Product = apps.get_model('products', 'Product')
+    ProductTrigram = apps.get_model('products', 'ProductTrigram')
+    rows = []
+    for product_id, name, brand in Product.objects.values_list('id', 'name', 'brand').iterator():
+        rows.extend(
+            ProductTrigram(product_id=product_id, trigram=gram)
+            for gram in product_trigrams(name, brand)
+        )
+        if len(rows) >= 5000:
+            ProductTrigram.objects.bulk_create(rows)
+            rows = []
+    ProductTrigram.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['trigram', 'product'], name='products_pr_trigram_b7c657_idx')],
+                'unique_together': {('product', 'trigram')},
+            },
+        ),
+        migrations.RunPython(build_trigram_index, migrations.RunPython.noop),
+    ]
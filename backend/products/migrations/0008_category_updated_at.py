@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:15
+
+from django.db import migrations, models
+
+
+def install_search_index(apps, schema_editor):
+    from products import search
+    search.install(schema_editor.connection)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from products import search
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_created_at_index'),
+    ]
+
+    operations = [
+        # The FTS triggers reference products_category, and SQLite refuses to
+        # rename the rebuilt table while they point at it, so drop them first.
+        migrations.RunPython(uninstall_search_index, install_search_index),
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
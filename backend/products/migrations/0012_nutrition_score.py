@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:38
+
+from django.db import migrations, models
+
+
+def install_search_index(apps, schema_editor):
+    from products import search
+    search.install(schema_editor.connection)
+
+
+def uninstall_search_index(apps, schema_editor):
+    from products import search
+    search.uninstall(schema_editor.connection)
+
+
+def score_products(apps, schema_editor):
+    from products import nutrition
+    import numpy as np
+    Product = apps.get_model('products', 'Product')
+    rows = list(Product.objects.values_list('id', *nutrition.FIELDS))
+    if not rows:
+        return
+    data = np.array([row[1:] for row in rows], dtype=float)
+    scores, grades = nutrition.score(dict(zip(nutrition.FIELDS, data.T)))
+    products = [
+        Product(id=row[0], nutrition_score=score, nutrition_grade=grade or '')
+        for row, score, grade in zip(rows, scores.tolist(), grades.tolist())
+        if score is not None
+    ]
+    Product.objects.bulk_update(products, ['nutrition_score', 'nutrition_grade'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_stock_ledger'),
+    ]
+
+    operations = [
+        # SQLite rebuilds the product table here; see 0008
+        migrations.RunPython(uninstall_search_index, install_search_index),
+        migrations.AddField(
+            model_name='product',
+            name='nutrition_grade',
+            field=models.CharField(blank=True, editable=False, max_length=1),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='nutrition_score',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['nutrition_score'], name='products_pr_nutriti_3c5b7e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['nutrition_grade'], name='products_pr_nutriti_36402c_idx'),
+        ),
+        migrations.RunPython(install_search_index, uninstall_search_index),
+        migrations.RunPython(score_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def record_current_prices(apps, schema_editor):
+    """Open the history with each product's current price; earlier prices are unknown."""
+    Product = apps.get_model('products', 'Product')
+    PriceChange = apps.get_model('products', 'PriceChange')
+    now = django.utils.timezone.now()
+    changes = [
+        PriceChange(product_id=product_id, price=price, effective_from=now)
+        for product_id, price in Product.objects.values_list('id', 'price').iterator()
+    ]
+    PriceChange.objects.bulk_create(changes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_nutrition_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('effective_from', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='products.product')),
+            ],
+            options={
+                'ordering': ['-effective_from', '-id'],
+                'indexes': [models.Index(fields=['product', 'effective_from'], name='products_pr_product_02ec84_idx'), models.Index(fields=['effective_from'], name='products_pr_effecti_2d690e_idx')],
+            },
+        ),
+        migrations.RunPython(record_current_prices, migrations.RunPython.noop),
+    ]
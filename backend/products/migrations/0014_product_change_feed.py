@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def record_existing_products(apps, schema_editor):
+    """Start the feed with every existing product, in id order."""
+    Product = apps.get_model('products', 'Product')
+    ProductChange = apps.get_model('products', 'ProductChange')
+    now = django.utils.timezone.now()
+    changes = [
+        ProductChange(product_id=product_id, changed_at=now)
+        for product_id in Product.objects.order_by('id').values_list('id', flat=True).iterator()
+    ]
+    ProductChange.objects.bulk_create(changes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_price_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField(unique=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(record_existing_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def build_catalog(apps, schema_editor):
+    from products import catalog
+    Product = apps.get_model('products', 'Product')
+    CatalogEntry = apps.get_model('products', 'CatalogEntry')
+    now = django.utils.timezone.now()
+    entries = [
+        CatalogEntry(**catalog.render(row, now))
+        for row in Product.objects.values(*catalog.FIELDS).iterator()
+    ]
+    CatalogEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_product_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogEntry',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='catalog_entry', serialize=False, to='products.product')),
+                ('name', models.CharField(max_length=255)),
+                ('brand', models.CharField(blank=True, max_length=100)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('in_stock', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('payload', models.TextField()),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='products.category')),
+            ],
+            options={
+                'ordering': ['name', 'product'],
+                'indexes': [models.Index(fields=['is_active', 'name'], name='products_ca_is_acti_9ddd7a_idx'), models.Index(fields=['is_active', 'price'], name='products_ca_is_acti_46887e_idx'), models.Index(fields=['is_active', 'created_at'], name='products_ca_is_acti_35c802_idx'), models.Index(fields=['is_active', 'category', 'name'], name='products_ca_is_acti_609d4b_idx'), models.Index(fields=['updated_at'], name='products_ca_updated_68a520_idx')],
+            },
+        ),
+        migrations.RunPython(build_catalog, migrations.RunPython.noop),
+    ]
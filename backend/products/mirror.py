@@ -0,0 +1,227 @@
+"""
+Mirror Open Food Facts product images into our own storage.
+
+Synced products point ``picture_url`` at the Open Food Facts CDN. The
+mirroring stage downloads each upstream URL once, stores it under
+``mirror/<aa>/<sha256>.<ext>`` (``aa``: the first two hex digits) in the
+configured storage (local media or S3) and rewrites ``picture_url`` on
+every product using that URL. The stored URL is the storage's own
+(relative for local media); API responses make it absolute for the
+request, and ``stored_url`` maps such a URL sent back by a client to the
+stored form again. Identical images reached through different URLs share one file, and since a file
+name is derived from its content the URLs never change and are served
+with ``Cache-Control: immutable``.
+
+Only URLs on ``OPEN_FOOD_FACTS_IMAGE_HOSTS`` are mirrored, so a picture URL
+typed by an admin or imported from CSV never makes the server fetch an
+arbitrary (possibly internal) address.
+
+Downloads run on a small thread pool after the sync commits; URLs that are
+already mirrored are substituted before products are written, so a
+re-sync never points a product back at the CDN.
+"""
+import hashlib
+import logging
+import mimetypes
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import openfoodfacts
+from .models import MirroredImage, Product
+from .signals import products_bulk_changed
+
+logger = logging.getLogger(__name__)
+
+MIRROR_PREFIX = 'mirror/'
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_executor = None
+
+
+class MirrorError(Exception):
+    pass
+
+
+def get_storage():
+    """Storage for mirrored files, with long-lived cache headers on S3."""
+    if settings.DEFAULT_FILE_STORAGE == 'storages.backends.s3boto3.S3Boto3Storage':
+        from storages.backends.s3boto3 import S3Boto3Storage
+        return S3Boto3Storage(object_parameters={
+            **settings.AWS_S3_OBJECT_PARAMETERS,
+            'CacheControl': CACHE_CONTROL,
+        })
+    return default_storage
+
+
+def is_mirrorable(url):
+    """Whether ``url`` is an http(s) URL on an allowed image host."""
+    parts = urlsplit(url)
+    return parts.scheme in ('http', 'https') and parts.hostname in settings.OPEN_FOOD_FACTS_IMAGE_HOSTS
+
+
+def download(url, session=None):
+    """Return ``(content, content_type)`` for an upstream image."""
+    if not is_mirrorable(url):
+        raise MirrorError('Not an allowed image host')
+    session = session or openfoodfacts.get_session()
+    max_bytes = settings.OPEN_FOOD_FACTS_MIRROR_MAX_BYTES
+    try:
+        with session.get(url, timeout=settings.OPEN_FOOD_FACTS_TIMEOUT, stream=True) as response:
+            if not is_mirrorable(response.url):
+                raise MirrorError('Redirected off the allowed image hosts')
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+            if not content_type.startswith('image/'):
+                raise MirrorError(f'Not an image ({content_type or "no content type"})')
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise MirrorError(f'Image larger than {max_bytes} bytes')
+                chunks.append(chunk)
+    except requests.RequestException as exc:
+        raise MirrorError(str(exc)) from exc
+    return b''.join(chunks), content_type
+
+
+def mirror_url(url, session=None):
+    """Return the ``MirroredImage`` for ``url``, downloading it if needed."""
+    image = MirroredImage.objects.filter(source_url=url).first()
+    if image is not None:
+        return image
+
+    content, content_type = download(url, session)
+    digest = hashlib.sha256(content).hexdigest()
+    duplicate = MirroredImage.objects.filter(sha256=digest).first()
+    if duplicate is not None:
+        name = duplicate.name
+    else:
+        extension = mimetypes.guess_extension(content_type) or ''
+        name = f'{MIRROR_PREFIX}{digest[:2]}/{digest}{extension}'
+        storage = get_storage()
+        if not storage.exists(name):
+            name = storage.save(name, ContentFile(content))
+
+    image, _ = MirroredImage.objects.get_or_create(source_url=url, defaults={
+        'sha256': digest,
+        'name': name,
+        'content_type': content_type,
+        'size': len(content),
+    })
+    return image
+
+
+def mirrored_url(image):
+    return get_storage().url(image.name)
+
+
+def stored_url(url, request):
+    """
+    Undo ``request.build_absolute_uri`` for a URL of a locally stored mirror
+    image, so a product read from the API can be written back unchanged.
+    """
+    root = get_storage().url(MIRROR_PREFIX)
+    if request is None or not root.startswith('/'):
+        return url
+    origin = request.build_absolute_uri('/')[:-1]
+    if url.startswith(f'{origin}{root}'):
+        return url[len(origin):]
+    return url
+
+
+def substitute_known(rows):
+    """
+    Point ``picture_url`` in product rows (dicts of field values) at
+    already-mirrored copies. One query for the whole batch.
+    """
+    sources = {row.get('picture_url') for row in rows if row.get('picture_url')}
+    if not sources:
+        return rows
+    known = {
+        image.source_url: mirrored_url(image)
+        for image in MirroredImage.objects.filter(source_url__in=sources)
+    }
+    for row in rows:
+        if row.get('picture_url') in known:
+            row['picture_url'] = known[row['picture_url']]
+    return rows
+
+
+def pending(products=None):
+    """
+    Products (with no uploaded picture) still pointing at an upstream URL on
+    one of the ``OPEN_FOOD_FACTS_IMAGE_HOSTS``.
+    """
+    products = Product.objects.all() if products is None else products
+    upstream = Q(pk__in=[])
+    for host in settings.OPEN_FOOD_FACTS_IMAGE_HOSTS:
+        for scheme in ('http', 'https'):
+            # With or without an explicit port
+            upstream |= Q(picture_url__startswith=f'{scheme}://{host}/')
+            upstream |= Q(picture_url__startswith=f'{scheme}://{host}:')
+    return (
+        products.filter(Q(picture__isnull=True) | Q(picture=''))
+        .filter(upstream)
+        .exclude(picture_url__startswith=get_storage().url(MIRROR_PREFIX))
+    )
+
+
+def mirror_products(products=None, session=None):
+    """
+    Mirror the upstream pictures of ``products`` (a queryset, default all).
+
+    Every distinct URL is downloaded at most once and all products using it
+    are repointed with one UPDATE. Returns ``{'mirrored': n, 'failed': n}``
+    counted per URL.
+    """
+    counts = {'mirrored': 0, 'failed': 0}
+    urls = pending(products).order_by().values_list('picture_url', flat=True).distinct()
+    for url in list(urls):
+        try:
+            image = mirror_url(url, session)
+        except MirrorError as exc:
+            logger.warning('Could not mirror %s: %s', url, exc)
+            counts['failed'] += 1
+            continue
+
+        with transaction.atomic():
+            targets = Product.objects.filter(picture_url=url)
+            product_ids = list(targets.values_list('id', flat=True))
+            targets.update(picture_url=mirrored_url(image), updated_at=timezone.now())
+            products_bulk_changed.send(sender=Product, product_ids=product_ids, fields=['picture_url'])
+        counts['mirrored'] += 1
+    return counts
+
+
+def _run(products):
+    try:
+        mirror_products(products)
+    except Exception:
+        logger.exception('Image mirroring failed')
+    finally:
+        connection.close()
+
+
+def schedule(products):
+    """Mirror ``products`` in the background once the current transaction commits."""
+    global _executor
+    if not settings.OPEN_FOOD_FACTS_MIRROR_IMAGES:
+        return
+    if not settings.OPEN_FOOD_FACTS_MIRROR_ASYNC:
+        transaction.on_commit(lambda: mirror_products(products))
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.OPEN_FOOD_FACTS_MIRROR_WORKERS,
+            thread_name_prefix='image-mirror',
+        )
+    transaction.on_commit(lambda: _executor.submit(_run, products))
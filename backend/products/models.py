@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
@@ -10,6 +11,7 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['name']
@@ -43,6 +45,8 @@ class Product(models.Model):
     # Visual
     picture = models.ImageField(upload_to='products/', blank=True, null=True)
     picture_url = models.URLField(max_length=500, blank=True)
+    # Resized WebP renditions of ``picture`` (variant name -> storage path)
+    picture_variants = models.JSONField(default=dict, blank=True)
     
     # Stock Management
     quantity_in_stock = models.IntegerField(
@@ -59,6 +63,10 @@ class Product(models.Model):
     proteins = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     salt = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     fiber = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    # Nutri-Score style points (lower is healthier) and A-E grade, kept up to
+    # date by ``products.nutrition``; empty when the nutrition data is incomplete
+    nutrition_score = models.IntegerField(null=True, blank=True, editable=False)
+    nutrition_grade = models.CharField(max_length=1, blank=True, editable=False)
     
     # Additional Fields
     description = models.TextField(blank=True)
@@ -79,6 +87,11 @@ class Product(models.Model):
             models.Index(fields=['name']),
             models.Index(fields=['barcode']),
             models.Index(fields=['category']),
+            models.Index(fields=['last_synced']),
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['created_at']),
+            models.Index(fields=['nutrition_score']),
+            models.Index(fields=['nutrition_grade']),
         ]
     
     def __str__(self):
@@ -95,3 +108,198 @@ class Product(models.Model):
         elif self.quantity_in_stock < 10:
             return "Low Stock"
         return "In Stock"
+
+
+class OpenFoodFactsCache(models.Model):
+    """
+    Cached Open Food Facts payload for a barcode.
+    Negative lookups (product not found upstream) are cached too.
+    """
+    barcode = models.CharField(max_length=50, unique=True)
+    found = models.BooleanField(default=True)
+    payload = models.JSONField(null=True, blank=True)
+    
+    # Validators for conditional revalidation
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    
+    fetched_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        verbose_name = 'Open Food Facts cache entry'
+        verbose_name_plural = 'Open Food Facts cache entries'
+    
+    def __str__(self):
+        return self.barcode
+    
+    def is_fresh(self, now):
+        return self.expires_at > now
+
+
+class MirroredImage(models.Model):
+    """
+    Upstream (Open Food Facts) image copied into our own storage.
+    Files are named after their SHA-256, so identical images downloaded
+    from different URLs share one stored file.
+    """
+    source_url = models.CharField(max_length=500, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ProductTrigram(models.Model):
+    """
+    Trigram index over product name and brand, used for typo-tolerant search.
+    Maintained by ``products.fuzzy``.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='trigrams'
+    )
+    trigram = models.CharField(max_length=3)
+    
+    class Meta:
+        unique_together = [['product', 'trigram']]
+        indexes = [
+            models.Index(fields=['trigram', 'product']),
+        ]
+    
+    def __str__(self):
+        return self.trigram
+
+
+class StockMovement(models.Model):
+    """
+    Append-only record of a change to a product's on-hand quantity.
+    ``Product.quantity_in_stock`` is the running total of these rows.
+    """
+    SALE = 'sale'
+    RECEIPT = 'receipt'
+    ADJUSTMENT = 'adjustment'
+    REFUND = 'refund'
+    KIND_CHOICES = [
+        (SALE, 'Sale'),
+        (RECEIPT, 'Receipt'),
+        (ADJUSTMENT, 'Adjustment'),
+        (REFUND, 'Refund'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Signed change in units (negative for sales)
+    quantity = models.IntegerField()
+    reference = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['product', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.kind} {self.quantity:+d}"
+
+
+class StockSnapshot(models.Model):
+    """
+    On-hand quantity of a product at a point in time, written by the
+    ``compact_stock_ledger`` job so past levels don't need a full replay.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    quantity = models.IntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-taken_at']
+        indexes = [
+            models.Index(fields=['product', 'taken_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.quantity} @ {self.taken_at:%Y-%m-%d %H:%M}"
+
+
+class PriceChange(models.Model):
+    """
+    A product's price from ``effective_from`` until the next change.
+    Recorded automatically whenever ``Product.price`` is written.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    effective_from = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-effective_from', '-id']
+        indexes = [
+            models.Index(fields=['product', 'effective_from']),
+            models.Index(fields=['effective_from']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.price} from {self.effective_from:%Y-%m-%d %H:%M}"
+
+
+class ProductChange(models.Model):
+    """
+    Latest change of each product for the catalog change feed.
+
+    A product's row is replaced on every write, so ``id`` (AUTOINCREMENT,
+    never reused) is a monotonic change sequence and the table holds one
+    row per product plus a tombstone (``deleted``) per deleted product.
+    """
+    product_id = models.BigIntegerField(unique=True)
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.id} {'deleted' if self.deleted else 'changed'} {self.product_id}"
+
+
+class CatalogEntry(models.Model):
+    """
+    Read model of the customer catalog: one row per product with the
+    list payload pre-rendered as JSON and the columns catalog reads filter
+    and sort on. Maintained by ``products.catalog``.
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name='catalog_entry'
+    )
+    name = models.CharField(max_length=255)
+    brand = models.CharField(max_length=100, blank=True)
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    in_stock = models.BooleanField(default=False)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    # ``ProductListSerializer`` shape, serialized
+    payload = models.TextField()
+
+    class Meta:
+        ordering = ['name', 'product']
+        indexes = [
+            models.Index(fields=['is_active', 'name']),
+            models.Index(fields=['is_active', 'price']),
+            models.Index(fields=['is_active', 'created_at']),
+            models.Index(fields=['is_active', 'category', 'name']),
+            models.Index(fields=['updated_at']),
+        ]
+
+    def __str__(self):
+        return self.name
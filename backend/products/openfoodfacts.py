@@ -0,0 +1,305 @@
+"""
+Open Food Facts integration helpers.
+
+Upstream lookups go through one shared ``requests.Session`` so connections
+(and their TLS handshakes) are reused across requests, and batches are
+fetched concurrently over a bounded thread pool. The mapping from upstream
+payloads to ``Product`` fields lives here so the single-barcode endpoint,
+the batch endpoint and the offline tools all agree on it.
+
+Upstream images are copied into our storage by ``products.mirror``.
+
+Payloads are cached per barcode in ``OpenFoodFactsCache``. Fresh entries
+(including negative "not found" entries) are served without a network
+call; stale entries are revalidated with ``If-None-Match`` /
+``If-Modified-Since`` so an unchanged product costs a 304.
+"""
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.utils import timezone
+
+from . import mirror
+from .bulk import upsert_products_by_barcode
+from .models import OpenFoodFactsCache, Product
+
+FOUND = 'found'
+NOT_FOUND = 'not_found'
+FAILED = 'failed'
+NOT_MODIFIED = 'not_modified'
+
+# Product field -> Open Food Facts ``nutriments`` key
+NUTRIMENT_FIELDS = {
+    'energy_kcal': 'energy-kcal_100g',
+    'fat': 'fat_100g',
+    'saturated_fat': 'saturated-fat_100g',
+    'carbohydrates': 'carbohydrates_100g',
+    'sugars': 'sugars_100g',
+    'proteins': 'proteins_100g',
+    'salt': 'salt_100g',
+    'fiber': 'fiber_100g',
+}
+
+# Upper bound for values stored in the nutrition DecimalField(8, 2) columns
+NUTRIMENT_MAX = Decimal('1000000')
+
+# Open Food Facts does not provide price/stock, use safe defaults for new products
+SYNC_CREATE_DEFAULTS = {
+    'price': Decimal('0.01'),
+    'quantity_in_stock': 0,
+}
+
+# Columns rewritten when a cache entry is refreshed
+CACHE_FIELDS = ['found', 'payload', 'etag', 'last_modified', 'fetched_at', 'expires_at']
+
+FetchResult = namedtuple(
+    'FetchResult',
+    ['barcode', 'status', 'product', 'error', 'etag', 'last_modified'],
+    defaults=[None, None, '', ''],
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide keep-alive session used for upstream calls."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    # API host + image host (for mirroring)
+                    pool_connections=2,
+                    pool_maxsize=settings.OPEN_FOOD_FACTS_MAX_WORKERS,
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+class CacheStats:
+    """Per-process counters for the upstream payload cache."""
+
+    FIELDS = ['hits', 'negative_hits', 'misses', 'revalidated', 'refreshed', 'errors']
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, field, amount=1):
+        with self._lock:
+            self._counts[field] += amount
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts['hits'] + counts['negative_hits'] + counts['misses']
+        served = counts['hits'] + counts['negative_hits'] + counts['revalidated']
+        counts['hit_ratio'] = round(served / lookups, 4) if lookups else None
+        return counts
+
+
+cache_stats = CacheStats()
+
+
+def _nutriment(value):
+    """Coerce a nutriment value to fit the ``DecimalField(8, 2)`` columns."""
+    if value in (None, ''):
+        return None
+    try:
+        value = Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        return None
+    if not value.is_finite() or abs(value) >= NUTRIMENT_MAX:
+        return None
+    return value
+
+
+def map_product(product_data):
+    """Map an upstream ``product`` payload onto Product field values."""
+    nutriments = product_data.get('nutriments') or {}
+    values = {
+        'name': (product_data.get('product_name') or 'Unknown')[:255],
+        'brand': (product_data.get('brands') or '')[:100],
+        'picture_url': (product_data.get('image_url') or '')[:500],
+        'description': product_data.get('ingredients_text') or '',
+        # Empty ids would collide on the unique constraint
+        'openfoodfacts_id': str(product_data.get('id') or '')[:100] or None,
+        'last_synced': timezone.now(),
+    }
+    for field, key in NUTRIMENT_FIELDS.items():
+        values[field] = _nutriment(nutriments.get(key))
+    return values
+
+
+def fetch_product(barcode, session=None, cached=None):
+    """
+    Fetch a single product payload from Open Food Facts.
+
+    When a ``cached`` entry is given its validators are sent along, and an
+    unchanged upstream product comes back as ``NOT_MODIFIED``.
+    """
+    session = session or get_session()
+    url = f"{settings.OPEN_FOOD_FACTS_API_URL}/product/{barcode}"
+    headers = {}
+    if cached is not None:
+        if cached.etag:
+            headers['If-None-Match'] = cached.etag
+        if cached.last_modified:
+            headers['If-Modified-Since'] = cached.last_modified
+    try:
+        response = session.get(url, headers=headers, timeout=settings.OPEN_FOOD_FACTS_TIMEOUT)
+    except requests.RequestException as e:
+        return FetchResult(barcode, FAILED, error=f'API request failed: {str(e)}')
+
+    etag = response.headers.get('ETag', '')
+    last_modified = response.headers.get('Last-Modified', '')
+
+    if response.status_code == 304 and cached is not None:
+        return FetchResult(barcode, NOT_MODIFIED, etag=etag, last_modified=last_modified)
+
+    if response.status_code != 200:
+        return FetchResult(barcode, FAILED, error='Failed to fetch from Open Food Facts')
+
+    try:
+        data = response.json()
+    except ValueError:
+        return FetchResult(barcode, FAILED, error='Invalid response from Open Food Facts')
+
+    if data.get('status') != 1:
+        return FetchResult(
+            barcode, NOT_FOUND, error='Product not found in Open Food Facts',
+            etag=etag, last_modified=last_modified,
+        )
+    return FetchResult(
+        barcode, FOUND, data.get('product', {}),
+        etag=etag, last_modified=last_modified,
+    )
+
+
+def _cached_result(entry):
+    if entry.found:
+        return FetchResult(entry.barcode, FOUND, entry.payload)
+    return FetchResult(entry.barcode, NOT_FOUND, error='Product not found in Open Food Facts')
+
+
+def _store(entry, barcode, result, now):
+    """Apply a network result to a cache entry (new or existing)."""
+    if entry is None:
+        entry = OpenFoodFactsCache(barcode=barcode)
+    if result.status != NOT_MODIFIED:
+        entry.found = result.status == FOUND
+        entry.payload = result.product if entry.found else None
+    ttl = (
+        settings.OPEN_FOOD_FACTS_CACHE_TTL if entry.found
+        else settings.OPEN_FOOD_FACTS_NEGATIVE_CACHE_TTL
+    )
+    entry.etag = result.etag or entry.etag
+    entry.last_modified = result.last_modified or entry.last_modified
+    entry.fetched_at = now
+    entry.expires_at = now + timedelta(seconds=ttl)
+    return entry
+
+
+def fetch_products(barcodes, max_workers=None, use_cache=True):
+    """
+    Fetch many barcodes, going to the network only for cache misses and
+    stale entries. Network calls run concurrently.
+
+    Returns a dict barcode -> FetchResult (never ``NOT_MODIFIED``).
+    """
+    barcodes = list(dict.fromkeys(barcodes))
+    if not barcodes:
+        return {}
+
+    now = timezone.now()
+    entries = OpenFoodFactsCache.objects.in_bulk(barcodes, field_name='barcode')
+    results = {}
+    to_fetch = []
+    for barcode in barcodes:
+        entry = entries.get(barcode)
+        if use_cache and entry is not None and entry.is_fresh(now):
+            cache_stats.incr('hits' if entry.found else 'negative_hits')
+            results[barcode] = _cached_result(entry)
+        else:
+            cache_stats.incr('misses')
+            to_fetch.append(barcode)
+
+    if to_fetch:
+        session = get_session()
+
+        def fetch(barcode):
+            return fetch_product(barcode, session, entries.get(barcode))
+
+        if len(to_fetch) == 1:
+            fetched = [fetch(to_fetch[0])]
+        else:
+            workers = min(max_workers or settings.OPEN_FOOD_FACTS_MAX_WORKERS, len(to_fetch))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                fetched = list(executor.map(fetch, to_fetch))
+
+        to_create = []
+        to_update = []
+        for result in fetched:
+            entry = entries.get(result.barcode)
+            if result.status == FAILED:
+                cache_stats.incr('errors')
+                results[result.barcode] = result
+                continue
+            cache_stats.incr('revalidated' if result.status == NOT_MODIFIED else 'refreshed')
+            stored = _store(entry, result.barcode, result, now)
+            (to_update if entry is not None else to_create).append(stored)
+            results[result.barcode] = _cached_result(stored)
+
+        # A concurrent lookup of the same uncached barcode may have stored it
+        # meanwhile; the newer result wins either way
+        OpenFoodFactsCache.objects.bulk_create(
+            to_create,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['barcode'],
+            update_fields=CACHE_FIELDS,
+        )
+        OpenFoodFactsCache.objects.bulk_update(to_update, CACHE_FIELDS, batch_size=500)
+
+    return {barcode: results[barcode] for barcode in barcodes}
+
+
+def sync_barcodes(barcodes, max_workers=None, use_cache=True):
+    """
+    Fetch barcodes from Open Food Facts and upsert the matching products.
+
+    Returns one outcome dict per distinct barcode, in input order, with a
+    ``status`` of created, updated, not_found or failed.
+    """
+    fetched = fetch_products(barcodes, max_workers=max_workers, use_cache=use_cache)
+    rows = {
+        barcode: map_product(result.product)
+        for barcode, result in fetched.items()
+        if result.status == FOUND
+    }
+    mirror.substitute_known(list(rows.values()))
+    written = upsert_products_by_barcode(rows, create_defaults=SYNC_CREATE_DEFAULTS)
+    if rows:
+        mirror.schedule(Product.objects.filter(barcode__in=list(rows)))
+
+    outcomes = []
+    for barcode, result in fetched.items():
+        if result.status == FOUND:
+            outcomes.append({'barcode': barcode, 'status': written[barcode]})
+        else:
+            outcomes.append({'barcode': barcode, 'status': result.status, 'error': result.error})
+    return outcomes
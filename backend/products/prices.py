@@ -0,0 +1,80 @@
+"""
+Product price history.
+
+Every write of ``Product.price`` that changes it appends a ``PriceChange``
+row (see ``products.signals``), so a product's price at time T is the
+latest change with ``effective_from <= T``. The ``(product,
+effective_from)`` index turns that into one index seek per product, and
+``prices_at`` answers it for thousands of products with one query per
+chunk. ``changes_between`` serves range queries from the
+``effective_from`` index.
+"""
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import PriceChange, Product
+
+# Products per query (keeps the IN list under database parameter limits)
+CHUNK_SIZE = 2000
+
+
+def _chunks(product_ids):
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), CHUNK_SIZE):
+        yield product_ids[start:start + CHUNK_SIZE]
+
+
+def _price_at(at=None):
+    changes = PriceChange.objects.filter(product=OuterRef('pk'))
+    if at is not None:
+        changes = changes.filter(effective_from__lte=at)
+    return Subquery(changes.order_by('-effective_from', '-id').values('price')[:1])
+
+
+def record(product_ids, at=None):
+    """
+    Append a ``PriceChange`` for each of ``product_ids`` whose current price
+    differs from its latest recorded one. Returns the number recorded.
+    """
+    at = at or timezone.now()
+    recorded = 0
+    for chunk in _chunks(product_ids):
+        changed = (
+            Product.objects.filter(id__in=chunk)
+            .annotate(recorded_price=_price_at())
+            .filter(Q(recorded_price__isnull=True) | ~Q(recorded_price=F('price')))
+            .values_list('id', 'price')
+        )
+        changes = PriceChange.objects.bulk_create([
+            PriceChange(product_id=product_id, price=price, effective_from=at)
+            for product_id, price in changed
+        ])
+        recorded += len(changes)
+    return recorded
+
+
+def prices_at(product_ids, at):
+    """
+    Return ``{product id: price in effect at ``at``}``; ``None`` when the
+    product had no recorded price yet.
+    """
+    prices = {}
+    for chunk in _chunks(product_ids):
+        prices.update(
+            Product.objects.filter(id__in=chunk)
+            .annotate(price_at=_price_at(at))
+            .values_list('id', 'price_at')
+        )
+    return prices
+
+
+def changes_between(start=None, end=None, product_ids=None):
+    """Price changes effective in ``[start, end)``, newest first."""
+    changes = PriceChange.objects.all()
+    if start is not None:
+        changes = changes.filter(effective_from__gte=start)
+    if end is not None:
+        changes = changes.filter(effective_from__lt=end)
+    if product_ids is not None:
+        changes = changes.filter(product_id__in=list(product_ids))
+    return changes
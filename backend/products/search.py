@@ -0,0 +1,176 @@
+"""
+SQLite FTS5 full-text index over the product catalog.
+
+``products_product_fts`` holds one row per product (rowid = product id) with
+the name, brand, barcode, description and category name. Triggers on the
+product and category tables keep it in sync for every write path, including
+``bulk_create``/``bulk_update`` and queryset updates that bypass signals.
+
+SQLite drops a table's triggers whenever Django rebuilds that table during
+a migration, so ``install`` is idempotent and also runs on ``post_migrate``;
+when it has to recreate the triggers it repopulates the index as well.
+
+On other database backends everything here is a no-op and product search
+falls back to DRF's ``SearchFilter``.
+"""
+import logging
+import re
+
+from django.db import OperationalError, connection
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'products_product_fts'
+
+# bm25 column weights: name, brand, barcode, description, category
+RANK_WEIGHTS = '10.0, 5.0, 8.0, 1.0, 3.0'
+
+CATEGORY_NAME_SQL = "COALESCE((SELECT name FROM products_category WHERE id = new.category_id), '')"
+
+TRIGGERS = {
+    'products_product_fts_ai': f"""
+        CREATE TRIGGER products_product_fts_ai AFTER INSERT ON products_product BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, brand, barcode, description, category)
+            VALUES (
+                new.id, new.name, new.brand, COALESCE(new.barcode, ''),
+                new.description, {CATEGORY_NAME_SQL}
+            );
+        END
+    """,
+    'products_product_fts_ad': f"""
+        CREATE TRIGGER products_product_fts_ad AFTER DELETE ON products_product BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END
+    """,
+    'products_product_fts_au': f"""
+        CREATE TRIGGER products_product_fts_au
+        AFTER UPDATE OF name, brand, barcode, description, category_id ON products_product BEGIN
+            UPDATE {FTS_TABLE} SET
+                name = new.name,
+                brand = new.brand,
+                barcode = COALESCE(new.barcode, ''),
+                description = new.description,
+                category = {CATEGORY_NAME_SQL}
+            WHERE rowid = old.id;
+        END
+    """,
+    'products_category_fts_au': f"""
+        CREATE TRIGGER products_category_fts_au
+        AFTER UPDATE OF name ON products_category BEGIN
+            UPDATE {FTS_TABLE} SET category = new.name
+            WHERE rowid IN (SELECT id FROM products_product WHERE category_id = new.id);
+        END
+    """,
+}
+
+POPULATE_SQL = f"""
+    INSERT INTO {FTS_TABLE}(rowid, name, brand, barcode, description, category)
+    SELECT p.id, p.name, p.brand, COALESCE(p.barcode, ''), p.description, COALESCE(c.name, '')
+    FROM products_product p
+    LEFT JOIN products_category c ON c.id = p.category_id
+"""
+
+
+_fts5_supported = None
+
+
+def is_available(conn=None):
+    """Whether the database supports the FTS5 index (SQLite built with FTS5)."""
+    global _fts5_supported
+    conn = conn or connection
+    if conn.vendor != 'sqlite':
+        return False
+    if _fts5_supported is None:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)')
+                cursor.execute('DROP TABLE temp._fts5_probe')
+            _fts5_supported = True
+        except OperationalError:
+            logger.warning('SQLite was built without FTS5; product search uses LIKE queries')
+            _fts5_supported = False
+    return _fts5_supported
+
+
+def install(conn=None):
+    """Create the FTS table and triggers if missing, repopulating when needed."""
+    conn = conn or connection
+    if not is_available(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN (%s)"
+            % ', '.join(['%s'] * len(TRIGGERS)),
+            list(TRIGGERS),
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if existing == set(TRIGGERS):
+            return
+
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "name, brand, barcode, description, category, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', %s)",
+            [f'bm25({RANK_WEIGHTS})'],
+        )
+        for name, sql in TRIGGERS.items():
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(sql)
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(POPULATE_SQL)
+
+
+def uninstall(conn=None):
+    conn = conn or connection
+    if conn.vendor != 'sqlite':
+        return
+    with conn.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def rebuild(conn=None):
+    """Drop and rebuild the whole index from the product table."""
+    conn = conn or connection
+    uninstall(conn)
+    install(conn)
+
+
+def build_match_query(terms):
+    """
+    Turn search terms into an FTS5 MATCH expression.
+
+    Every token must match (implicit AND) and the last token of each term
+    is matched as a prefix, so partially typed words still find results.
+    """
+    phrases = []
+    for term in terms:
+        tokens = re.findall(r'\w+', term, flags=re.UNICODE)
+        if tokens:
+            phrases.append('"%s"*' % ' '.join(tokens))
+    return ' '.join(phrases)
+
+
+def filter_queryset(queryset, terms):
+    """
+    Restrict a queryset to full-text matches, ordered by relevance.
+
+    Works on ``Product`` and on models keyed by product id
+    (``CatalogEntry``). The FTS table drives the join, so cost depends on
+    the number of matches rather than on the size of the catalog.
+    """
+    match = build_match_query(terms)
+    if not match:
+        return queryset.none()
+    opts = queryset.model._meta
+    product_id = f'{opts.db_table}.{opts.pk.column}'
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {product_id}', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+        select={'search_rank': f'{FTS_TABLE}.rank'},
+    ).order_by('search_rank', '-pk')
@@ -1,6 +1,10 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
-from .models import Category, Product
+from core.serializers import SparseFieldsetSerializerMixin
+from . import images, mirror, stock
+from .models import Category, PriceChange, Product, StockMovement
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -17,11 +21,12 @@ class CategorySerializer(serializers.ModelSerializer):
         return obj.products.count()
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for Product model"""
     category_name = serializers.CharField(source='category.name', read_only=True)
     stock_status = serializers.SerializerMethodField()
     is_in_stock = serializers.SerializerMethodField()
+    picture_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = Product
@@ -29,10 +34,10 @@ class ProductSerializer(serializers.ModelSerializer):
             'id', 'name', 'brand', 'price', 'category', 'category_name',
             'picture', 'picture_url', 'quantity_in_stock',
             'energy_kcal', 'fat', 'saturated_fat', 'carbohydrates',
-            'sugars', 'proteins', 'salt', 'fiber',
+            'sugars', 'proteins', 'salt', 'fiber', 'nutrition_score', 'nutrition_grade',
             'description', 'barcode', 'openfoodfacts_id',
             'last_synced', 'is_active', 'created_at', 'updated_at',
-            'stock_status', 'is_in_stock'
+            'stock_status', 'is_in_stock', 'picture_variants'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'last_synced']
 
@@ -43,6 +48,15 @@ class ProductSerializer(serializers.ModelSerializer):
     @extend_schema_field(serializers.BooleanField())
     def get_is_in_stock(self, obj):
         return obj.is_in_stock
+
+    @extend_schema_field(serializers.DictField(child=serializers.URLField()))
+    def get_picture_variants(self, obj):
+        request = self.context.get('request')
+        urls = {}
+        for name in obj.picture_variants or {}:
+            url = images.variant_url(obj, name)
+            urls[name] = request.build_absolute_uri(url) if request else url
+        return urls
     
     class Meta:
         model = Product
@@ -50,19 +64,26 @@ class ProductSerializer(serializers.ModelSerializer):
             'id', 'name', 'brand', 'price', 'category', 'category_name',
             'picture', 'picture_url', 'quantity_in_stock',
             'energy_kcal', 'fat', 'saturated_fat', 'carbohydrates',
-            'sugars', 'proteins', 'salt', 'fiber',
+            'sugars', 'proteins', 'salt', 'fiber', 'nutrition_score', 'nutrition_grade',
             'description', 'barcode', 'openfoodfacts_id',
             'last_synced', 'is_active', 'created_at', 'updated_at',
-            'stock_status', 'is_in_stock'
+            'stock_status', 'is_in_stock', 'picture_variants'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'last_synced']
+        sparse_field_dependencies = {
+            'picture_url': ['picture', 'picture_url'],
+            'stock_status': ['quantity_in_stock'],
+            'is_in_stock': ['quantity_in_stock'],
+            'picture_variants': ['picture', 'picture_variants'],
+        }
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        if instance.picture:
+        if 'picture_url' in data:
             request = self.context.get('request')
-            url = instance.picture.url
-            data['picture_url'] = request.build_absolute_uri(url) if request else url
+            # Uploads and mirrored images are stored with relative media URLs
+            url = instance.picture.url if instance.picture else data['picture_url']
+            data['picture_url'] = request.build_absolute_uri(url) if request and url else url
         return data
 
 
@@ -78,24 +99,70 @@ class ProductCreateUpdateSerializer(serializers.ModelSerializer):
             'description', 'barcode', 'is_active'
         ]
 
+    def validate_picture_url(self, value):
+        # Mirrored images are rendered absolute but stored relative
+        return mirror.stored_url(value, self.context.get('request'))
+
     def create(self, validated_data):
-        instance = super().create(validated_data)
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            if instance.quantity_in_stock:
+                # Opening stock is the product's first ledger entry
+                StockMovement.objects.create(
+                    product=instance, kind=StockMovement.RECEIPT,
+                    quantity=instance.quantity_in_stock, created_at=instance.created_at,
+                )
         if instance.picture and not instance.picture_url:
             instance.picture_url = instance.picture.url
             instance.save(update_fields=['picture_url'])
+        if instance.picture:
+            images.schedule(instance.pk)
         return instance
 
     def update(self, instance, validated_data):
-        instance = super().update(instance, validated_data)
+        quantity = validated_data.pop('quantity_in_stock', None)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if quantity is not None:
+                # Stock only changes through the ledger
+                stock.apply_adjustments([{'product': instance.pk, 'quantity': quantity}])
+                instance.refresh_from_db(fields=['quantity_in_stock', 'updated_at'])
         if instance.picture:
             # Keep DB url in sync with stored image
             if instance.picture_url != instance.picture.url:
                 instance.picture_url = instance.picture.url
                 instance.save(update_fields=['picture_url'])
+        if 'picture' in validated_data:
+            images.schedule(instance.pk)
         return instance
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductImportRowSerializer(ProductCreateUpdateSerializer):
+    """
+    Validates one CSV import row with the ``ProductCreateUpdateSerializer``
+    rules, minus the per-row queries: the barcode is the upsert key rather
+    than a unique check, and categories (by name or id) are resolved from
+    the ``categories`` map in the serializer context.
+    """
+    barcode = serializers.CharField(max_length=50)
+    category = serializers.CharField(required=False, allow_blank=True)
+
+    class Meta(ProductCreateUpdateSerializer.Meta):
+        fields = [
+            field for field in ProductCreateUpdateSerializer.Meta.fields
+            if field != 'picture'
+        ]
+
+    def validate_category(self, value):
+        if not value:
+            return None
+        category_id = self.context['categories'].get(value.strip().lower())
+        if category_id is None:
+            raise serializers.ValidationError(f'Unknown category "{value}".')
+        return category_id
+
+
+class ProductListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Lightweight serializer for product lists"""
     category_name = serializers.CharField(source='category.name', read_only=True)
     stock_status = serializers.SerializerMethodField()
@@ -106,6 +173,10 @@ class ProductListSerializer(serializers.ModelSerializer):
             'id', 'name', 'brand', 'price', 'category_name',
             'picture_url', 'quantity_in_stock', 'stock_status', 'is_active'
         ]
+        sparse_field_dependencies = {
+            'picture_url': ['picture', 'picture_url', 'picture_variants'],
+            'stock_status': ['quantity_in_stock'],
+        }
 
     @extend_schema_field(serializers.CharField())
     def get_stock_status(self, obj):
@@ -113,8 +184,102 @@ class ProductListSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        if instance.picture:
+        if 'picture_url' in data:
             request = self.context.get('request')
-            url = instance.picture.url
-            data['picture_url'] = request.build_absolute_uri(url) if request else url
+            url = data['picture_url']
+            if instance.picture:
+                # Grids get the card-sized rendition once it has been generated
+                url = images.variant_url(instance) or instance.picture.url
+            data['picture_url'] = request.build_absolute_uri(url) if request and url else url
         return data
+
+
+class StockAdjustmentSerializer(serializers.Serializer):
+    """One stock change: either a relative ``delta`` or an absolute ``quantity``"""
+    product = serializers.IntegerField()
+    delta = serializers.IntegerField(required=False)
+    quantity = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, attrs):
+        if ('delta' in attrs) == ('quantity' in attrs):
+            raise serializers.ValidationError('Provide exactly one of "delta" or "quantity".')
+        return attrs
+
+
+class BulkStockAdjustmentSerializer(serializers.Serializer):
+    """Serializer for bulk stock adjustments"""
+    adjustments = StockAdjustmentSerializer(many=True, allow_empty=False)
+    # Sales are recorded by checkout only
+    kind = serializers.ChoiceField(
+        choices=[choice for choice in StockMovement.KIND_CHOICES if choice[0] != StockMovement.SALE],
+        default=StockMovement.ADJUSTMENT,
+    )
+    reference = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+
+    def validate_adjustments(self, value):
+        limit = settings.STOCK_ADJUSTMENT_BATCH_LIMIT
+        if len(value) > limit:
+            raise serializers.ValidationError(f'At most {limit} adjustments per request.')
+        return value
+
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    """Serializer for stock ledger entries"""
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'product', 'kind', 'quantity', 'reference', 'created_at']
+        read_only_fields = fields
+
+
+class ProductIdListField(serializers.CharField):
+    """Comma-separated product IDs, e.g. ``?ids=1,2,3``"""
+    def __init__(self, max_ids, **kwargs):
+        self.max_ids = max_ids
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        try:
+            ids = [int(part) for part in value.split(',') if part.strip()]
+        except ValueError:
+            raise serializers.ValidationError('Expected comma-separated product IDs.')
+        if not ids:
+            raise serializers.ValidationError('At least one product ID is required.')
+        if len(ids) > self.max_ids:
+            raise serializers.ValidationError(f'At most {self.max_ids} products per request.')
+        return ids
+
+
+class StockLevelsQuerySerializer(serializers.Serializer):
+    """Query parameters of the point-in-time stock levels endpoint"""
+    at = serializers.DateTimeField(required=False)
+    ids = ProductIdListField(max_ids=settings.STOCK_ADJUSTMENT_BATCH_LIMIT)
+
+
+class PricesQuerySerializer(serializers.Serializer):
+    """Query parameters of the point-in-time prices endpoint"""
+    at = serializers.DateTimeField(required=False)
+    ids = ProductIdListField(max_ids=settings.PRICE_LOOKUP_BATCH_LIMIT)
+
+
+class PriceChangesQuerySerializer(serializers.Serializer):
+    """Query parameters of the price change range endpoint"""
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    ids = ProductIdListField(max_ids=settings.PRICE_LOOKUP_BATCH_LIMIT, required=False)
+
+
+class PriceChangeSerializer(serializers.ModelSerializer):
+    """Serializer for price history entries"""
+    class Meta:
+        model = PriceChange
+        fields = ['id', 'product', 'price', 'effective_from']
+        read_only_fields = fields
+
+
+class ProductChangesQuerySerializer(serializers.Serializer):
+    """Query parameters of the catalog change feed"""
+    since = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(
+        min_value=1, max_value=settings.PRODUCT_CHANGES_MAX_PAGE_SIZE, required=False
+    )
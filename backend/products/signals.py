@@ -0,0 +1,146 @@
+"""
+Product signals.
+
+``products_bulk_changed`` is sent by write paths that bypass ``post_save``
+(``bulk_create``/``bulk_update``/``QuerySet.update``) with the affected
+``product_ids`` and the ``fields`` that were written, so derived data can
+be refreshed the same way as for single saves.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from . import catalog, changes, fuzzy, prices
+from .barcode_index import barcode_index
+from .models import Category, Product
+
+products_bulk_changed = Signal()
+
+TRIGRAM_FIELDS = {'name', 'brand'}
+PRICE_FIELDS = {'price'}
+NUTRITION_FIELDS = {'energy_kcal', 'sugars', 'saturated_fat', 'salt', 'fiber', 'proteins'}
+
+
+def _touches(fields, watched):
+    return fields is None or bool(watched & set(fields))
+
+
+@receiver(post_save, sender=Product)
+def update_trigram_index(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or not _touches(update_fields, TRIGRAM_FIELDS):
+        return
+    fuzzy.index_products([instance.pk])
+
+
+@receiver(products_bulk_changed)
+def update_trigram_index_bulk(sender, product_ids, fields=None, **kwargs):
+    if _touches(fields, TRIGRAM_FIELDS):
+        fuzzy.index_products(product_ids)
+
+
+@receiver(post_save, sender=Product)
+def record_price_change(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or not _touches(update_fields, PRICE_FIELDS):
+        return
+    prices.record([instance.pk])
+
+
+@receiver(products_bulk_changed)
+def record_price_changes_bulk(sender, product_ids, fields=None, **kwargs):
+    if _touches(fields, PRICE_FIELDS):
+        prices.record(product_ids)
+
+
+@receiver(post_save, sender=Product)
+def update_nutrition_score(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or not _touches(update_fields, NUTRITION_FIELDS):
+        return
+    # Imported here: ``nutrition`` sends ``products_bulk_changed``
+    from . import nutrition
+    nutrition.recompute([instance.pk])
+    instance.refresh_from_db(fields=['nutrition_score', 'nutrition_grade', 'updated_at'])
+
+
+@receiver(products_bulk_changed)
+def update_nutrition_score_bulk(sender, product_ids, fields=None, **kwargs):
+    if _touches(fields, NUTRITION_FIELDS):
+        from . import nutrition
+        nutrition.recompute(product_ids)
+
+
+@receiver(post_save, sender=Product)
+def update_barcode_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        product_ids = [instance.pk]
+        transaction.on_commit(lambda: barcode_index.refresh(product_ids))
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_barcode_index(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(lambda: barcode_index.discard(product_id))
+
+
+@receiver(products_bulk_changed)
+def update_barcode_index_bulk(sender, product_ids, **kwargs):
+    transaction.on_commit(lambda: barcode_index.refresh(product_ids))
+
+
+@receiver(post_save, sender=Product)
+def record_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        changes.record([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def record_deletion(sender, instance, **kwargs):
+    changes.record([instance.pk], deleted=True)
+
+
+@receiver(products_bulk_changed)
+def record_changes_bulk(sender, product_ids, **kwargs):
+    changes.record(product_ids)
+
+
+@receiver(post_save, sender=Product)
+def refresh_catalog_entry(sender, instance, raw=False, **kwargs):
+    if not raw:
+        catalog.refresh([instance.pk])
+
+
+@receiver(products_bulk_changed)
+def refresh_catalog_entries(sender, product_ids, **kwargs):
+    catalog.refresh(product_ids)
+
+
+@receiver(post_save, sender=Category)
+def touch_category_products(sender, instance, created, raw=False, **kwargs):
+    """
+    Product payloads embed the category name, so bump ``updated_at`` on the
+    category's products to let per-process caches and ETags pick up a rename.
+    """
+    if created or raw:
+        return
+    _touch_products(instance)
+
+
+@receiver(pre_delete, sender=Category)
+def collect_products_of_deleted_category(sender, instance, **kwargs):
+    instance._deleted_product_ids = list(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def touch_products_of_deleted_category(sender, instance, **kwargs):
+    # ``SET_NULL`` clears the FK with a plain UPDATE that leaves updated_at
+    # alone; it runs between pre_delete and post_delete, so derived data
+    # refreshed from here sees the products without their category
+    _touch_products(instance, getattr(instance, '_deleted_product_ids', []))
+
+
+def _touch_products(instance, product_ids=None):
+    if product_ids is None:
+        product_ids = list(instance.products.values_list('id', flat=True))
+    if product_ids:
+        Product.objects.filter(id__in=product_ids).update(updated_at=timezone.now())
+        products_bulk_changed.send(sender=Product, product_ids=product_ids, fields=['updated_at'])
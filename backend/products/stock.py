@@ -0,0 +1,270 @@
+"""
+Stock level changes, recorded in an append-only ledger.
+
+Every change to on-hand quantity is a ``StockMovement`` row. The same
+deltas are applied to the materialized ``Product.quantity_in_stock`` with
+``UPDATE ... SET quantity_in_stock = quantity_in_stock + CASE id WHEN ...
+END`` statements guarded by a ``quantity_in_stock >= -delta`` condition,
+so concurrent sales never overwrite each other and can't take a level below
+zero. Either every adjustment of a call applies or none does.
+
+The ledger does not take writes off the product row: the guarded UPDATE is
+kept on purpose, since it is the oversell check, and its row lock is held
+until the caller's transaction commits, so sales of the same product still
+queue on that row (plus one movement insert per sale). What it removes is
+the read-modify-write. To keep the lock short, movements are inserted
+before the UPDATE and callers apply stock as the last write of their
+transaction.
+
+``StockSnapshot`` rows written by ``compact`` (the ``compact_stock_ledger``
+command) let ``levels_at`` answer "stock on date X" from the latest
+snapshot plus the movements after it.
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.utils import timezone
+
+from .models import Product, StockMovement, StockSnapshot
+from .signals import products_bulk_changed
+
+# Products per UPDATE statement (keeps the CASE and parameter count bounded)
+CHUNK_SIZE = 500
+
+
+class StockError(Exception):
+    """Raised when adjustments can't be applied; ``errors`` maps product id -> message."""
+
+    def __init__(self, errors):
+        super().__init__('Stock adjustment rejected')
+        self.errors = errors
+
+
+def merge(adjustments):
+    """
+    Fold ``[{'product': id, 'delta': n} | {'product': id, 'quantity': n}]``
+    into ``{id: (absolute or None, delta)}``, applying entries in order.
+    """
+    merged = {}
+    for adjustment in adjustments:
+        absolute, delta = merged.get(adjustment['product'], (None, 0))
+        if adjustment.get('quantity') is not None:
+            absolute, delta = adjustment['quantity'], 0
+        else:
+            delta += adjustment['delta']
+        merged[adjustment['product']] = (absolute, delta)
+    return merged
+
+
+def _to_deltas(merged):
+    """
+    Turn absolute targets into deltas against the current (locked) levels,
+    so every change is recorded as a movement.
+    """
+    absolute_ids = [product_id for product_id, (absolute, _) in merged.items() if absolute is not None]
+    current = {}
+    if absolute_ids:
+        current = dict(
+            Product.objects.select_for_update()
+            .filter(id__in=absolute_ids)
+            .values_list('id', 'quantity_in_stock')
+        )
+
+    deltas = {}
+    errors = {}
+    for product_id, (absolute, delta) in merged.items():
+        if absolute is None:
+            deltas[product_id] = delta
+        elif product_id not in current:
+            errors[product_id] = 'Product not found.'
+        elif absolute + delta < 0:
+            errors[product_id] = f'Stock cannot be set below zero ({absolute + delta}).'
+        else:
+            deltas[product_id] = absolute + delta - current[product_id]
+    return deltas, errors
+
+
+def _update_chunk(deltas, now):
+    # Built in one go: OR-ing Qs one at a time copies the tree every step
+    allowed = Q(
+        *[
+            Q(id=product_id, quantity_in_stock__gte=-delta) if delta < 0 else Q(id=product_id)
+            for product_id, delta in deltas.items()
+        ],
+        _connector=Q.OR,
+    )
+    change = Case(
+        *[When(id=product_id, then=Value(delta)) for product_id, delta in deltas.items()],
+        output_field=IntegerField(),
+    )
+    return Product.objects.filter(allowed).update(
+        quantity_in_stock=F('quantity_in_stock') + change,
+        updated_at=now,
+    )
+
+
+def _explain(deltas, now):
+    rows = list(Product.objects.filter(id__in=list(deltas)).values_list(
+        'id', 'quantity_in_stock', 'updated_at'
+    ))
+    found = {product_id for product_id, _, _ in rows}
+    errors = {product_id: 'Product not found.' for product_id in deltas if product_id not in found}
+    for product_id, level, updated_at in rows:
+        # Rows stamped with ``now`` passed the guard and were updated
+        if updated_at != now and level + deltas[product_id] < 0:
+            errors[product_id] = (
+                f'Insufficient stock: {level} on hand, '
+                f'adjustment would leave {level + deltas[product_id]}.'
+            )
+    return errors
+
+
+def _apply(deltas, movements, now):
+    """
+    Insert ``movements``, apply ``{product id: delta}`` with guarded updates
+    and return the new levels; raises ``StockError`` if any update misses
+    (the caller's transaction then rolls the movements back).
+    """
+    # Before the row locks are taken, so they are held for less
+    StockMovement.objects.bulk_create(movements, batch_size=CHUNK_SIZE)
+    product_ids = list(deltas)
+    for start in range(0, len(product_ids), CHUNK_SIZE):
+        chunk = {product_id: deltas[product_id] for product_id in product_ids[start:start + CHUNK_SIZE]}
+        if _update_chunk(chunk, now) != len(chunk):
+            raise StockError(_explain(chunk, now))
+
+    levels = dict(
+        Product.objects.filter(id__in=product_ids).values_list('id', 'quantity_in_stock')
+    )
+    products_bulk_changed.send(
+        sender=Product, product_ids=product_ids, fields=['quantity_in_stock']
+    )
+    return levels
+
+
+def apply_adjustments(adjustments, kind=StockMovement.ADJUSTMENT, reference=''):
+    """
+    Apply stock adjustments atomically, record them as ``kind`` movements
+    and return ``{product id: new level}``.
+
+    Raises ``StockError`` (and changes nothing) if a product is missing or
+    any level would go negative.
+    """
+    merged = merge(adjustments)
+    if not merged:
+        return {}
+    now = timezone.now()
+
+    with transaction.atomic():
+        deltas, errors = _to_deltas(merged)
+        if errors:
+            raise StockError(errors)
+        return _apply(deltas, [
+            StockMovement(
+                product_id=product_id, kind=kind, quantity=delta,
+                reference=reference, created_at=now,
+            )
+            for product_id, delta in deltas.items() if delta
+        ], now)
+
+
+def apply_movements(movements, kind=StockMovement.ADJUSTMENT):
+    """
+    Apply ``[(product id, delta, reference)]`` atomically like
+    ``apply_adjustments``, recording one movement per product and reference:
+    the deltas of many references (e.g. the invoices of a POS sync) share
+    one guarded UPDATE per chunk of products.
+    """
+    by_reference = {}
+    for product_id, delta, reference in movements:
+        key = (product_id, reference)
+        by_reference[key] = by_reference.get(key, 0) + delta
+    if not by_reference:
+        return {}
+    deltas = {}
+    for (product_id, _), delta in by_reference.items():
+        deltas[product_id] = deltas.get(product_id, 0) + delta
+    now = timezone.now()
+
+    with transaction.atomic():
+        return _apply(deltas, [
+            StockMovement(
+                product_id=product_id, kind=kind, quantity=delta,
+                reference=reference, created_at=now,
+            )
+            for (product_id, reference), delta in by_reference.items() if delta
+        ], now)
+
+
+def _sum_movements(movements):
+    return Subquery(
+        movements.order_by().values('product').annotate(total=Sum('quantity')).values('total'),
+        output_field=IntegerField(),
+    )
+
+
+def _ledger_state(products, at):
+    """
+    Annotate ``products`` with their latest snapshot at or before ``at``
+    (``snapshot_quantity``, ``snapshot_at``) and the sum of movements after
+    it up to ``at`` (``moved``).
+    """
+    latest = StockSnapshot.objects.filter(
+        product=OuterRef('pk'), taken_at__lte=at
+    ).order_by('-taken_at', '-id')
+    movements = StockMovement.objects.filter(product=OuterRef('pk'), created_at__lte=at)
+    return products.annotate(
+        snapshot_quantity=Subquery(latest.values('quantity')[:1]),
+        snapshot_at=Subquery(latest.values('taken_at')[:1]),
+        last_moved_at=Subquery(movements.order_by('-created_at').values('created_at')[:1]),
+    ).annotate(
+        moved=Case(
+            When(snapshot_at__isnull=True, then=_sum_movements(movements)),
+            default=_sum_movements(movements.filter(created_at__gt=OuterRef('snapshot_at'))),
+            output_field=IntegerField(),
+        ),
+    )
+
+
+def levels_at(product_ids, at):
+    """
+    Return ``{product id: on-hand quantity at ``at``}`` in one query.
+
+    Products created after ``at`` map to ``None``.
+    """
+    rows = _ledger_state(Product.objects.filter(id__in=list(product_ids)), at).values_list(
+        'id', 'created_at', 'snapshot_quantity', 'moved'
+    )
+    levels = {}
+    for product_id, created_at, snapshot_quantity, moved in rows:
+        if snapshot_quantity is None and moved is None and created_at > at:
+            levels[product_id] = None
+        else:
+            levels[product_id] = (snapshot_quantity or 0) + (moved or 0)
+    return levels
+
+
+def compact(at, prune_before=None):
+    """
+    Snapshot, as of ``at``, every product with movements since its last
+    snapshot, and optionally delete movements older than ``prune_before``
+    (capped at ``at`` so pruned movements are always covered by a snapshot).
+
+    Returns ``(snapshots written, movements deleted)``.
+    """
+    with transaction.atomic():
+        pending = _ledger_state(Product.objects.all(), at).filter(
+            Q(snapshot_at__isnull=True, last_moved_at__isnull=False)
+            | Q(last_moved_at__gt=F('snapshot_at'))
+        ).values_list('id', 'snapshot_quantity', 'moved')
+        snapshots = [
+            StockSnapshot(product_id=product_id, quantity=(quantity or 0) + (moved or 0), taken_at=at)
+            for product_id, quantity, moved in pending.iterator(chunk_size=2000)
+        ]
+        StockSnapshot.objects.bulk_create(snapshots, batch_size=CHUNK_SIZE)
+
+        deleted = 0
+        if prune_before is not None:
+            deleted, _ = StockMovement.objects.filter(
+                created_at__lt=min(prune_before, at)
+            ).delete()
+    return len(snapshots), deleted
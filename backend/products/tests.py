@@ -1,5 +1,19 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+
 import pytest
-from products.models import Product, Category
+from django.core.management import call_command
+from django.utils import timezone
+from products import fuzzy, mirror, openfoodfacts, stock
+from products.bulk import upsert_products_by_barcode
+from products.models import (
+    Product, Category, MirroredImage, OpenFoodFactsCache, PriceChange, ProductTrigram, StockMovement,
+    StockSnapshot,
+)
+from products.serializers import ProductListSerializer
+from products.views import serve_mirrored_image
 
 
 @pytest.mark.django_db
@@ -42,3 +56,1097 @@ class TestProductAPI:
         response = staff_client.post('/api/products/', data)
         assert response.status_code == 201
         assert response.data['name'] == 'Pepsi'
+
+
+@pytest.mark.django_db
+class TestOpenFoodFactsSync:
+    def test_sync_single_barcode(self, staff_client, openfoodfacts_stub):
+        openfoodfacts_stub.add(
+            '3017620422003', 'Nutella', brands='Ferrero',
+            nutriments={'sugars_100g': 56.3}
+        )
+        response = staff_client.post(
+            '/api/products/sync_openfoodfacts/', {'barcode': '3017620422003'}
+        )
+        assert response.status_code == 201
+        assert response.data['product']['name'] == 'Nutella'
+        assert response.data['product']['sugars'] == '56.30'
+
+    def test_resync_keeps_price_and_stock_of_existing_product(self, staff_client, openfoodfacts_stub, category):
+        product = Product.objects.create(
+            name='Coca Cola', price=Decimal('2.50'), category=category, barcode='5449000000996'
+        )
+        stock.apply_adjustments([{'product': product.id, 'delta': 5}], kind=StockMovement.RECEIPT)
+        openfoodfacts_stub.add(product.barcode, 'Coca Cola Classic')
+
+        response = staff_client.post('/api/products/sync_openfoodfacts/', {'barcode': product.barcode})
+
+        assert response.status_code == 200
+        assert response.data['created'] is False
+        product.refresh_from_db()
+        assert (product.name, product.price, product.quantity_in_stock) == ('Coca Cola Classic', Decimal('2.50'), 5)
+        assert stock.levels_at([product.id], timezone.now())[product.id] == 5
+        assert list(product.price_history.values_list('price', flat=True)) == [Decimal('2.50')]
+
+    def test_batch_sync_reports_per_barcode_outcomes(
+        self, staff_client, openfoodfacts_stub, product
+    ):
+        openfoodfacts_stub.add(product.barcode, 'Coca Cola Classic')
+        openfoodfacts_stub.add('3017620422003', 'Nutella', brands='Ferrero')
+        openfoodfacts_stub.failing.add('111')
+
+        response = staff_client.post(
+            '/api/products/sync_openfoodfacts_batch/',
+            {'barcodes': [product.barcode, '3017620422003', '000', '111']},
+            format='json'
+        )
+
+        assert response.status_code == 200
+        statuses = {r['barcode']: r['status'] for r in response.data['results']}
+        assert statuses == {
+            product.barcode: 'updated',
+            '3017620422003': 'created',
+            '000': 'not_found',
+            '111': 'failed',
+        }
+        assert response.data['summary']['created'] == 1
+
+        product.refresh_from_db()
+        assert product.name == 'Coca Cola Classic'
+        # Existing price and stock are kept on update
+        assert product.quantity_in_stock == 100
+        assert product.last_synced is not None
+        assert Product.objects.get(barcode='3017620422003').brand == 'Ferrero'
+
+    def test_batch_sync_accepts_file_upload(self, staff_client, openfoodfacts_stub):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        openfoodfacts_stub.add('1', 'One')
+        openfoodfacts_stub.add('2', 'Two')
+        upload = SimpleUploadedFile('barcodes.txt', b'1\n2\n1\n')
+
+        response = staff_client.post(
+            '/api/products/sync_openfoodfacts_batch/', {'file': upload}
+        )
+
+        assert response.status_code == 200
+        assert response.data['summary']['created'] == 2
+        assert Product.objects.filter(barcode__in=['1', '2']).count() == 2
+
+    def test_batch_sync_requires_barcodes(self, staff_client):
+        response = staff_client.post(
+            '/api/products/sync_openfoodfacts_batch/', {}, format='json'
+        )
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestOpenFoodFactsCache:
+    def test_fresh_entries_skip_the_network(self, openfoodfacts_stub):
+        openfoodfacts_stub.add('1', 'One')
+        openfoodfacts.cache_stats.reset()
+
+        openfoodfacts.fetch_products(['1', '404'])
+        results = openfoodfacts.fetch_products(['1', '404'])
+
+        assert results['1'].status == openfoodfacts.FOUND
+        assert results['1'].product['product_name'] == 'One'
+        assert results['404'].status == openfoodfacts.NOT_FOUND
+        assert len(openfoodfacts_stub.requests) == 2
+        stats = openfoodfacts.cache_stats.snapshot()
+        assert stats['hits'] == 1
+        assert stats['negative_hits'] == 1
+        assert stats['misses'] == 2
+
+    def test_stale_entries_are_revalidated(self, openfoodfacts_stub, settings):
+        settings.OPEN_FOOD_FACTS_CACHE_TTL = 0
+        openfoodfacts_stub.add('1', 'One')
+        openfoodfacts.cache_stats.reset()
+
+        openfoodfacts.fetch_products(['1'])
+        result = openfoodfacts.fetch_products(['1'])['1']
+
+        assert result.product['product_name'] == 'One'
+        _, headers = openfoodfacts_stub.requests[-1]
+        assert headers['If-None-Match'] == OpenFoodFactsCache.objects.get(barcode='1').etag
+        assert openfoodfacts.cache_stats.snapshot()['revalidated'] == 1
+
+    def test_concurrent_miss_of_the_same_barcode(self, staff_client, openfoodfacts_stub, monkeypatch):
+        openfoodfacts_stub.add('3017620422003', 'Nutella')
+        fetch_product = openfoodfacts.fetch_product
+
+        def fetch_racing_another_till(barcode, *args, **kwargs):
+            # The other till stores the entry after our cache lookup missed
+            OpenFoodFactsCache.objects.create(
+                barcode=barcode, found=False, fetched_at=timezone.now(), expires_at=timezone.now()
+            )
+            return fetch_product(barcode, *args, **kwargs)
+
+        monkeypatch.setattr(openfoodfacts, 'fetch_product', fetch_racing_another_till)
+        response = staff_client.post(
+            '/api/products/sync_openfoodfacts/', {'barcode': '3017620422003'}, format='json'
+        )
+
+        assert response.status_code == 201
+        entry = OpenFoodFactsCache.objects.get(barcode='3017620422003')
+        assert entry.found and entry.payload['product_name'] == 'Nutella'
+
+    def test_cache_stats_endpoint_is_staff_only(self, authenticated_client):
+        response = authenticated_client.get('/api/products/openfoodfacts_cache/')
+        assert response.status_code == 403
+
+    def test_cache_stats_endpoint(self, staff_client):
+        response = staff_client.get('/api/products/openfoodfacts_cache/')
+        assert response.status_code == 200
+        assert 'hit_ratio' in response.data['counters']
+
+
+@pytest.mark.django_db
+class TestOpenFoodFactsDumpImport:
+    def test_import_jsonl_dump_with_filters(self, tmp_path, product):
+        dump = tmp_path / 'products.jsonl'
+        rows = [
+            {'code': product.barcode, 'product_name': 'Coca Cola Zero',
+             'countries_tags': ['en:france'], 'nutriments': {'sugars_100g': 0}},
+            {'code': '3017620422003', 'product_name': 'Nutella',
+             'countries_tags': ['en:france'], 'nutriments': {'sugars_100g': '56.3'}},
+            {'code': '999', 'product_name': 'Elsewhere', 'countries_tags': ['en:spain']},
+        ]
+        dump.write_text('\n'.join(json.dumps(row) for row in rows) + '\nnot json\n')
+
+        out = StringIO()
+        call_command(
+            'import_openfoodfacts_dump', str(dump),
+            '--country', 'en:france', '--batch-size', '1', stdout=out
+        )
+
+        product.refresh_from_db()
+        assert product.name == 'Coca Cola Zero'
+        assert product.quantity_in_stock == 100
+        assert Product.objects.get(barcode='3017620422003').sugars == Decimal('56.30')
+        assert not Product.objects.filter(barcode='999').exists()
+        assert 'rows/sec=' in out.getvalue()
+
+    def test_import_csv_dump_resumes_from_offset(self, tmp_path):
+        header = 'code\tproduct_name\tbrands\tsugars_100g\n'
+        first = '111\tFirst\tAcme\t1.5\n'
+        second = '222\tSecond\tAcme\t\n'
+        dump = tmp_path / 'products.csv'
+        dump.write_text(header + first + second)
+
+        call_command(
+            'import_openfoodfacts_dump', str(dump),
+            '--offset', str(len(header) + len(first)), stdout=StringIO()
+        )
+
+        assert not Product.objects.filter(barcode='111').exists()
+        imported = Product.objects.get(barcode='222')
+        assert imported.brand == 'Acme'
+        assert imported.sugars is None
+
+
+@pytest.mark.django_db
+class TestResyncStaleProducts:
+    def _make_stale(self, product, days):
+        Product.objects.filter(pk=product.pk).update(
+            last_synced=timezone.now() - timedelta(days=days)
+        )
+
+    def test_refreshes_only_stale_products(self, openfoodfacts_stub, product, category):
+        fresh = Product.objects.create(
+            name='Fresh', price=1, barcode='222', last_synced=timezone.now()
+        )
+        self._make_stale(product, 30)
+        openfoodfacts_stub.add(product.barcode, 'Coca Cola Refreshed')
+        openfoodfacts_stub.add('222', 'Fresh Refreshed')
+
+        out = StringIO()
+        call_command('resync_stale_products', '--once', '--rate', '0', stdout=out)
+
+        product.refresh_from_db()
+        fresh.refresh_from_db()
+        assert product.name == 'Coca Cola Refreshed'
+        assert product.last_synced > timezone.now() - timedelta(minutes=1)
+        assert fresh.name == 'Fresh'
+        assert '1/1 processed (updated=1)' in out.getvalue()
+
+    def test_max_age_below_cache_ttl_refetches(self, openfoodfacts_stub, product, settings):
+        settings.OPEN_FOOD_FACTS_CACHE_TTL = 86400
+        openfoodfacts_stub.add(product.barcode, 'Coca Cola')
+        openfoodfacts.sync_barcodes([product.barcode])
+        Product.objects.filter(pk=product.pk).update(last_synced=timezone.now() - timedelta(hours=2))
+        openfoodfacts_stub.add(product.barcode, 'Coca Cola Refreshed')
+        requests_made = len(openfoodfacts_stub.requests)
+
+        call_command('resync_stale_products', '--once', '--rate', '0', '--max-age-hours', '1', stdout=StringIO())
+
+        assert len(openfoodfacts_stub.requests) == requests_made + 1
+        product.refresh_from_db()
+        assert product.name == 'Coca Cola Refreshed'
+        assert product.last_synced > timezone.now() - timedelta(minutes=1)
+
+    def test_dry_run_does_not_fetch(self, openfoodfacts_stub, product):
+        self._make_stale(product, 30)
+
+        out = StringIO()
+        call_command('resync_stale_products', '--once', '--dry-run', stdout=out)
+
+        assert openfoodfacts_stub.requests == []
+        assert f'would refresh {product.barcode}' in out.getvalue()
+
+
+@pytest.mark.django_db
+class TestProductSearch:
+    def _names(self, client, term, **params):
+        response = client.get('/api/products/', {'search': term, **params})
+        assert response.status_code == 200
+        return [row['name'] for row in response.data['results']]
+
+    def test_prefix_match_ranked_by_relevance(self, authenticated_client, category):
+        Product.objects.create(name='Orange juice', brand='Tropicana', price=3)
+        Product.objects.create(
+            name='Sparkling water', brand='Perrier', price=1,
+            description='Water with a hint of orange'
+        )
+
+        assert self._names(authenticated_client, 'oran') == [
+            'Orange juice', 'Sparkling water'
+        ]
+        assert self._names(authenticated_client, 'oran trop') == ['Orange juice']
+        assert self._names(authenticated_client, 'oran', ordering='price') == [
+            'Sparkling water', 'Orange juice'
+        ]
+
+    def test_index_follows_writes(self, authenticated_client, product, category):
+        assert self._names(authenticated_client, 'bever') == ['Coca Cola']
+
+        category.name = 'Soft drinks'
+        category.save()
+        assert self._names(authenticated_client, 'bever') == []
+        assert self._names(authenticated_client, 'soft') == ['Coca Cola']
+
+        product.name = 'Fanta'
+        Product.objects.bulk_update([product], ['name'])
+        assert self._names(authenticated_client, 'fanta') == ['Fanta']
+
+        product.delete()
+        assert self._names(authenticated_client, 'fanta') == []
+
+    def test_search_by_barcode(self, authenticated_client, product):
+        assert self._names(authenticated_client, product.barcode[:6]) == ['Coca Cola']
+
+
+@pytest.mark.django_db
+class TestFuzzyProductSearch:
+    def test_misspellings_are_ranked_by_similarity(self, authenticated_client, product):
+        Product.objects.create(name='Nutella', brand='Ferrero', price=4)
+        Product.objects.create(name='Cola Zero', brand='Pepsi', price=2)
+
+        response = authenticated_client.get('/api/products/', {'fuzzy': 'cocacola'})
+        names = [row['name'] for row in response.data['results']]
+        assert names[0] == 'Coca Cola'
+        assert 'Nutella' not in names
+
+        response = authenticated_client.get('/api/products/', {'fuzzy': 'nutela'})
+        assert [row['name'] for row in response.data['results']] == ['Nutella']
+
+    def test_index_follows_renames_and_bulk_writes(self, product):
+        product.name = 'Fanta Orange'
+        product.brand = 'Fanta'
+        product.save()
+        assert fuzzy.rank('fanta')[0][0] == product.pk
+
+        upsert_products_by_barcode({'123': {'name': 'Sprite Lemon', 'brand': ''}},
+                                   create_defaults={'price': 1})
+        sprite = Product.objects.get(barcode='123')
+        assert fuzzy.rank('sprit')[0][0] == sprite.pk
+        assert ProductTrigram.objects.filter(product=product, trigram='coc').count() == 0
+
+
+@pytest.mark.django_db
+class TestBarcodeLookup:
+    def test_lookup_matches_list_serializer(self, authenticated_client, product):
+        response = authenticated_client.get(f'/api/products/barcode/{product.barcode}/')
+
+        assert response.status_code == 200
+        expected = dict(ProductListSerializer(product).data)
+        expected['barcode'] = product.barcode
+        assert response.data == expected
+
+        response = authenticated_client.get(f'/api/products/barcode/{product.barcode}/')
+        assert response['X-Barcode-Index'] == 'hit'
+
+    def test_index_follows_writes(
+        self, authenticated_client, product, django_capture_on_commit_callbacks
+    ):
+        url = f'/api/products/barcode/{product.barcode}/'
+        authenticated_client.get(url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.price = Decimal('3.10')
+            product.quantity_in_stock = 4
+            product.save()
+        response = authenticated_client.get(url)
+        assert response['X-Barcode-Index'] == 'hit'
+        assert response.data['price'] == '3.10'
+        assert response.data['stock_status'] == 'Low Stock'
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.barcode = '42'
+            product.save()
+        assert authenticated_client.get(url).status_code == 404
+        assert authenticated_client.get('/api/products/barcode/42/').status_code == 200
+
+    def test_miss_falls_back_to_database(self, authenticated_client, product, settings):
+        settings.BARCODE_INDEX_REFRESH_SECONDS = 3600
+        authenticated_client.get(f'/api/products/barcode/{product.barcode}/')
+        # Written without signals, as another worker process would
+        Product.objects.bulk_create([Product(name='Water', price=1, barcode='77')])
+
+        response = authenticated_client.get('/api/products/barcode/77/')
+        assert response.status_code == 200
+        assert response['X-Barcode-Index'] == 'miss'
+        assert response.data['name'] == 'Water'
+
+    def test_poll_picks_up_other_process_writes(self, authenticated_client, product, settings):
+        settings.BARCODE_INDEX_REFRESH_SECONDS = 0
+        url = f'/api/products/barcode/{product.barcode}/'
+        authenticated_client.get(url)
+
+        Product.objects.filter(pk=product.pk).update(
+            quantity_in_stock=0, updated_at=timezone.now()
+        )
+
+        assert authenticated_client.get(url).data['stock_status'] == 'Out of Stock'
+
+    def test_poll_drops_products_deleted_by_other_processes(self, authenticated_client, product, settings):
+        settings.BARCODE_INDEX_REFRESH_SECONDS = 0
+        url = f'/api/products/barcode/{product.barcode}/'
+        authenticated_client.get(url)
+
+        # Without running on_commit callbacks, so this process' index isn't told
+        product.delete()
+
+        assert authenticated_client.get(url).status_code == 404
+
+
+@pytest.mark.django_db
+class TestCursorPagination:
+    def _walk(self, client, url, params):
+        seen = []
+        response = client.get(url, params)
+        while True:
+            assert response.status_code == 200
+            assert 'count' not in response.data
+            seen.extend(row['name'] for row in response.data['results'])
+            if not response.data['next']:
+                return seen, response
+            response = client.get(response.data['next'])
+
+    def test_walks_every_product_once_in_order(self, authenticated_client):
+        now = timezone.now()
+        products = Product.objects.bulk_create([
+            Product(name=f'P{i:02d}', price=i + 1) for i in range(8)
+        ])
+        # Ties on created_at are broken by id
+        Product.objects.filter(id__in=[p.id for p in products]).update(created_at=now)
+
+        names, last = self._walk(
+            authenticated_client, '/api/products/', {'pagination': 'cursor', 'page_size': 3}
+        )
+        assert names == [f'P{i:02d}' for i in reversed(range(8))]
+
+        previous = authenticated_client.get(last.data['previous'])
+        assert [row['name'] for row in previous.data['results']] == ['P04', 'P03', 'P02']
+
+        names, _ = self._walk(
+            authenticated_client, '/api/products/',
+            {'pagination': 'cursor', 'ordering': 'price', 'page_size': 3}
+        )
+        assert names == [f'P{i:02d}' for i in range(8)]
+
+    def test_invalid_cursor(self, authenticated_client):
+        response = authenticated_client.get('/api/products/', {'cursor': 'garbage'})
+        assert response.status_code == 404
+
+    def test_page_number_mode_is_default(self, authenticated_client, product):
+        response = authenticated_client.get('/api/products/')
+        assert response.data['count'] == 1
+
+
+@pytest.mark.django_db
+class TestSparseFieldsets:
+    def test_list_returns_only_requested_fields(self, authenticated_client, product):
+        response = authenticated_client.get('/api/products/', {'fields': 'id,name,category_name'})
+        assert response.status_code == 200
+        assert response.data['results'] == [
+            {'id': product.id, 'name': product.name, 'category_name': product.category.name}
+        ]
+
+    def test_queryset_loads_only_needed_columns(self, authenticated_client, product, django_assert_num_queries):
+        # validators + count + one page query with the category joined in
+        with django_assert_num_queries(3) as context:
+            authenticated_client.get('/api/products/', {'fields': 'name,stock_status'})
+        sql = context.captured_queries[-1]['sql']
+        assert '"quantity_in_stock"' in sql
+        assert '"description"' not in sql
+
+    def test_retrieve_with_method_field(self, authenticated_client, product):
+        response = authenticated_client.get(
+            f'/api/products/{product.id}/', {'fields': 'is_in_stock,picture_url'}
+        )
+        assert response.data == {'is_in_stock': True, 'picture_url': product.picture_url}
+
+    def test_unknown_field_is_rejected(self, authenticated_client, product):
+        response = authenticated_client.get('/api/products/', {'fields': 'name,secret'})
+        assert response.status_code == 400
+        assert 'secret' in str(response.data['fields'])
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    def test_product_list_not_modified(self, authenticated_client, product, django_assert_num_queries):
+        response = authenticated_client.get('/api/products/')
+        etag = response['ETag']
+        assert response['Last-Modified']
+
+        with django_assert_num_queries(1):
+            response = authenticated_client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+
+        # Another page or field selection has its own validator
+        response = authenticated_client.get(
+            '/api/products/', {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag
+        )
+        assert response.status_code == 200
+
+    def test_product_changes_invalidate_etag(self, authenticated_client, product, category):
+        etag = authenticated_client.get('/api/products/')['ETag']
+
+        product.price = Decimal('3.00')
+        product.save()
+        response = authenticated_client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        etag = response['ETag']
+
+        category.delete()
+        response = authenticated_client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data['results'][0].get('category_name') is None
+
+    def test_product_detail_if_modified_since(self, authenticated_client, product):
+        url = f'/api/products/{product.id}/'
+        last_modified = authenticated_client.get(url)['Last-Modified']
+        response = authenticated_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+
+    def test_category_list_tracks_product_counts(self, authenticated_client, category, product):
+        etag = authenticated_client.get('/api/categories/')['ETag']
+        assert authenticated_client.get(
+            '/api/categories/', HTTP_IF_NONE_MATCH=etag
+        ).status_code == 304
+
+        product.delete()
+        response = authenticated_client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.data['results'][0]['product_count'] == 0
+
+
+@pytest.mark.django_db
+class TestProductImageVariants:
+    @pytest.fixture(autouse=True)
+    def media(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        settings.PRODUCT_IMAGE_ASYNC = False
+
+    def _upload(self, size=(2000, 1000)):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'JPEG')
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_upload_generates_variants(self, staff_client, django_capture_on_commit_callbacks):
+        from PIL import Image
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = staff_client.post('/api/products/', {
+                'name': 'Juice', 'price': '1.50', 'picture': self._upload(),
+            }, format='multipart')
+        assert response.status_code == 201
+
+        product = Product.objects.get(name='Juice')
+        assert set(product.picture_variants) == {'thumbnail', 'card', 'full'}
+        storage = product.picture.storage
+        with storage.open(product.picture_variants['card']) as handle:
+            card = Image.open(handle)
+            assert (card.format, card.size) == ('WEBP', (480, 240))
+
+        listed = staff_client.get('/api/products/').data['results'][0]
+        assert listed['picture_url'].endswith(product.picture_variants['card'])
+        detail = staff_client.get(f'/api/products/{product.id}/').data
+        assert detail['picture_variants']['thumbnail'].endswith('-thumbnail.webp')
+
+    def test_backfill_command(self, product):
+        product.picture.save('old.png', self._upload(size=(100, 100)))
+        assert product.picture_variants == {}
+
+        out = StringIO()
+        call_command('generate_product_image_variants', stdout=out)
+        product.refresh_from_db()
+        assert set(product.picture_variants) == {'thumbnail', 'card', 'full'}
+        assert 'Generated variants for 1 products' in out.getvalue()
+
+        # Already processed products are skipped unless --force
+        out = StringIO()
+        call_command('generate_product_image_variants', stdout=out)
+        assert 'for 0 products' in out.getvalue()
+
+
+@pytest.mark.django_db
+class TestImageMirroring:
+    @pytest.fixture(autouse=True)
+    def media(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        settings.OPEN_FOOD_FACTS_MIRROR_ASYNC = False
+
+    def test_sync_mirrors_and_dedups_images(
+        self, staff_client, openfoodfacts_stub, django_capture_on_commit_callbacks, tmp_path
+    ):
+        front = openfoodfacts_stub.add_image('/images/a/front.png', b'\x89PNG same bytes')
+        alias = openfoodfacts_stub.add_image('/images/b/front.png', b'\x89PNG same bytes')
+        openfoodfacts_stub.add('3017620422003', 'Nutella', image_url=front)
+        openfoodfacts_stub.add('3017620422004', 'Nutella Go', image_url=alias)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = staff_client.post(
+                '/api/products/sync_openfoodfacts_batch/',
+                {'barcodes': ['3017620422003', '3017620422004']}, format='json'
+            )
+        assert response.status_code == 200
+
+        urls = set(Product.objects.values_list('picture_url', flat=True))
+        assert len(urls) == 1
+        url = urls.pop()
+        assert url.startswith('/media/mirror/') and url.endswith('.png')
+        assert MirroredImage.objects.count() == 2
+        assert len(list((tmp_path / 'mirror').rglob('*.png'))) == 1
+
+        # A re-sync keeps the mirrored URL and downloads nothing
+        requests_made = len(openfoodfacts_stub.requests)
+        with django_capture_on_commit_callbacks(execute=True):
+            staff_client.post(
+                '/api/products/sync_openfoodfacts/',
+                {'barcode': '3017620422003'}, format='json'
+            )
+        assert Product.objects.get(barcode='3017620422003').picture_url == url
+        assert len(openfoodfacts_stub.requests) == requests_made
+
+        # Rendered absolute, and accepted back as such
+        product = Product.objects.get(barcode='3017620422003')
+        rendered = staff_client.get(f'/api/products/{product.id}/', HTTP_HOST='localhost').data['picture_url']
+        assert rendered == f'http://localhost{url}'
+        response = staff_client.patch(
+            f'/api/products/{product.id}/', {'picture_url': rendered}, format='json', HTTP_HOST='localhost'
+        )
+        assert response.status_code == 200
+        product.refresh_from_db()
+        assert product.picture_url == url
+
+    def test_dump_import_mirrors_images(
+        self, tmp_path, openfoodfacts_stub, django_capture_on_commit_callbacks
+    ):
+        image = openfoodfacts_stub.add_image('/images/d.png', b'\x89PNG d')
+        dump = tmp_path / 'products.jsonl'
+        dump.write_text(json.dumps({'code': '111', 'product_name': 'First', 'image_url': image}))
+        with django_capture_on_commit_callbacks(execute=True):
+            call_command('import_openfoodfacts_dump', str(dump), stdout=StringIO())
+        url = Product.objects.get(barcode='111').picture_url
+        assert url.startswith('/media/mirror/')
+
+        # A later dump pointing at the same image reuses the mirrored copy
+        requests_made = len(openfoodfacts_stub.requests)
+        dump.write_text(json.dumps({'code': '222', 'product_name': 'Second', 'image_url': image}))
+        with django_capture_on_commit_callbacks(execute=True):
+            call_command('import_openfoodfacts_dump', str(dump), stdout=StringIO())
+        assert Product.objects.get(barcode='222').picture_url == url
+        assert len(openfoodfacts_stub.requests) == requests_made
+
+    def test_command_mirrors_existing_products(self, openfoodfacts_stub, product, rf):
+        product.picture_url = openfoodfacts_stub.add_image('/images/c.png', b'\x89PNG c')
+        product.save()
+        openfoodfacts_stub.failing.add('missing.png')
+        Product.objects.create(
+            name='Broken', price=1, picture_url=f'{openfoodfacts_stub.url}/images/missing.png'
+        )
+
+        out = StringIO()
+        call_command('mirror_product_images', stdout=out)
+        assert 'mirrored 1 images, 1 failed' in out.getvalue()
+
+        product.refresh_from_db()
+        path = product.picture_url.split('/media/mirror/', 1)[1]
+        response = serve_mirrored_image(rf.get(product.picture_url), path)
+        assert response['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+    def test_only_allowed_hosts_are_fetched(self, openfoodfacts_stub, product):
+        # Same stub server, reached through a host that isn't allowed
+        url = openfoodfacts_stub.add_image('/images/e.png', b'\x89PNG e').replace('127.0.0.1', 'localhost')
+        product.picture_url = url
+        product.save()
+
+        out = StringIO()
+        call_command('mirror_product_images', stdout=out)
+        assert 'mirrored 0 images, 0 failed' in out.getvalue()
+        with pytest.raises(mirror.MirrorError):
+            mirror.mirror_url(url)
+        assert openfoodfacts_stub.requests == []
+        product.refresh_from_db()
+        assert product.picture_url == url
+
+
+@pytest.mark.django_db
+class TestProductCsvImport:
+    def _upload(self, text):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return SimpleUploadedFile('prices.csv', text.encode(), content_type='text/csv')
+
+    def test_import_creates_updates_and_reports_errors(self, staff_client, product, category):
+        csv_text = (
+            'barcode,name,price,category,quantity_in_stock,sugars\n'
+            f'{product.barcode},Coca Cola 33cl,2.80,,,\n'
+            '1000000000001,Orange Juice,1.99,beverages,12,8.5\n'
+            '1000000000002,No Price,,,,\n'
+            '1000000000003,Bad Category,1.00,Snacks,,\n'
+        )
+        response = staff_client.post(
+            '/api/products/import/', {'file': self._upload(csv_text)}, format='multipart'
+        )
+        assert response.status_code == 200
+        assert {key: response.data[key] for key in ('rows', 'created', 'updated', 'failed')} == {
+            'rows': 4, 'created': 1, 'updated': 1, 'failed': 2,
+        }
+        assert [(error['line'], list(error['errors'])) for error in response.data['errors']] == [
+            (4, ['price']), (5, ['category']),
+        ]
+
+        product.refresh_from_db()
+        assert (product.name, product.price, product.quantity_in_stock) == (
+            'Coca Cola 33cl', Decimal('2.80'), 100
+        )
+        juice = Product.objects.get(barcode='1000000000001')
+        assert (juice.category, juice.sugars, juice.quantity_in_stock) == (
+            category, Decimal('8.50'), 12
+        )
+
+    def test_import_writes_in_batches(self, staff_client, settings, django_assert_max_num_queries):
+        settings.PRODUCT_IMPORT_BATCH_SIZE = 1000
+        lines = ['barcode,name,brand,price'] + [
+            f'2{i:012d},Item {i},Brand {i % 7},{i % 50 + 1}.25' for i in range(2500)
+        ]
+        # Multi-row INSERTs (SQLite caps the rows per statement), never per row
+        with django_assert_max_num_queries(250):
+            response = staff_client.post(
+                '/api/products/import/', {'file': self._upload('\n'.join(lines))},
+                format='multipart'
+            )
+        assert response.data['created'] == 2500
+        assert Product.objects.count() == 2500
+
+    def test_import_requires_barcode_column(self, staff_client):
+        response = staff_client.post(
+            '/api/products/import/', {'file': self._upload('name,price\nX,1\n')},
+            format='multipart'
+        )
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestBulkStockAdjustment:
+    def test_applies_relative_and_absolute_adjustments(
+        self, staff_client, product, django_assert_max_num_queries
+    ):
+        other = Product.objects.create(name='Fanta', price=2, quantity_in_stock=5)
+        third = Product.objects.create(name='Sprite', price=2, quantity_in_stock=7)
+
+        # locking SELECT for absolute targets, one UPDATE, one ledger INSERT,
+        # one SELECT for the resulting levels, the change feed DELETE/INSERT
+        # and the catalog entry SELECT/upsert
+        with django_assert_max_num_queries(10):
+            response = staff_client.post('/api/products/bulk_stock/', {'adjustments': [
+                {'product': product.id, 'delta': 24},
+                {'product': other.id, 'delta': -5},
+                {'product': third.id, 'quantity': 40},
+                {'product': third.id, 'delta': -1},
+            ]}, format='json')
+
+        assert response.status_code == 200
+        assert response.data['levels'] == {product.id: 124, other.id: 0, third.id: 39}
+        product.refresh_from_db()
+        assert product.quantity_in_stock == 124
+
+    def test_rejects_negative_levels_atomically(self, staff_client, product):
+        other = Product.objects.create(name='Fanta', price=2, quantity_in_stock=5)
+        response = staff_client.post('/api/products/bulk_stock/', {'adjustments': [
+            {'product': product.id, 'delta': -10},
+            {'product': other.id, 'delta': -6},
+            {'product': 999999, 'delta': 1},
+        ]}, format='json')
+
+        assert response.status_code == 400
+        assert set(response.data['products']) == {other.id, 999999}
+        product.refresh_from_db()
+        assert product.quantity_in_stock == 100
+
+    def test_entry_needs_delta_or_quantity(self, staff_client, product):
+        response = staff_client.post('/api/products/bulk_stock/', {'adjustments': [
+            {'product': product.id, 'delta': 1, 'quantity': 3},
+        ]}, format='json')
+        assert response.status_code == 400
+
+    def test_update_stock_sets_absolute_level(self, staff_client, product):
+        response = staff_client.post(
+            f'/api/products/{product.id}/update_stock/', {'quantity': 7}, format='json'
+        )
+        assert response.data['quantity_in_stock'] == 7
+
+
+@pytest.mark.django_db
+class TestStockLedger:
+    def _move(self, product, delta, at, kind=StockMovement.ADJUSTMENT):
+        stock.apply_adjustments([{'product': product.id, 'delta': delta}], kind=kind)
+        latest = StockMovement.objects.filter(product=product).latest('id')
+        StockMovement.objects.filter(id=latest.id).update(created_at=at)
+
+    def test_adjustments_are_recorded_as_movements(self, staff_client, product):
+        response = staff_client.post('/api/products/bulk_stock/', {
+            'adjustments': [{'product': product.id, 'delta': 24}],
+            'kind': 'receipt',
+            'reference': 'PO-1042',
+        }, format='json')
+        assert response.status_code == 200
+        staff_client.post(f'/api/products/{product.id}/update_stock/', {'quantity': 100}, format='json')
+
+        movements = staff_client.get(f'/api/products/{product.id}/stock_movements/').data['results']
+        assert [(m['kind'], m['quantity'], m['reference']) for m in movements] == [
+            ('adjustment', -24, ''),
+            ('receipt', 24, 'PO-1042'),
+        ]
+
+    def test_sales_cannot_be_posted_as_adjustments(self, staff_client, product):
+        response = staff_client.post('/api/products/bulk_stock/', {
+            'adjustments': [{'product': product.id, 'delta': -1}], 'kind': 'sale',
+        }, format='json')
+        assert response.status_code == 400
+        assert not StockMovement.objects.exists()
+
+    def test_levels_at_point_in_time_and_compaction(self, staff_client):
+        now = timezone.now()
+        product = Product.objects.create(name='Fanta', price=2)
+        Product.objects.filter(id=product.id).update(created_at=now - timedelta(days=3))
+        self._move(product, 10, now - timedelta(days=2), StockMovement.RECEIPT)
+        self._move(product, -3, now - timedelta(days=1), StockMovement.SALE)
+        self._move(product, 5, now - timedelta(hours=1), StockMovement.RECEIPT)
+
+        assert stock.levels_at([product.id], now - timedelta(days=2, hours=12)) == {product.id: 0}
+        assert stock.levels_at([product.id], now - timedelta(hours=2)) == {product.id: 7}
+        assert stock.levels_at([product.id], now - timedelta(days=4)) == {product.id: None}
+
+        call_command('compact_stock_ledger', '--lag-seconds', 7200, '--prune-days', 0, stdout=StringIO())
+        snapshot = StockSnapshot.objects.get(product=product)
+        assert snapshot.quantity == 7
+        # Only the movement after the snapshot survives pruning
+        assert list(product.stock_movements.values_list('quantity', flat=True)) == [5]
+
+        response = staff_client.get('/api/products/stock_levels/', {
+            'ids': str(product.id), 'at': (now - timedelta(minutes=30)).isoformat(),
+        })
+        assert response.data['levels'] == {product.id: 12}
+        assert stock.levels_at([product.id], now - timedelta(minutes=90)) == {product.id: 7}
+
+        # Nothing moved since the snapshot: a second run writes nothing
+        call_command('compact_stock_ledger', '--lag-seconds', 7200, stdout=StringIO())
+        assert StockSnapshot.objects.filter(product=product).count() == 1
+
+    def test_stock_endpoints_are_staff_only(self, authenticated_client, product):
+        assert authenticated_client.get(
+            '/api/products/stock_levels/', {'ids': str(product.id)}
+        ).status_code == 403
+
+
+@pytest.mark.django_db
+class TestCatalogExport:
+    def _content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_streams_filtered_rows_in_one_query(
+        self, authenticated_client, product, category, settings, django_assert_num_queries
+    ):
+        import csv
+        settings.PRODUCT_EXPORT_CHUNK_SIZE = 2
+        for number in range(4):
+            Product.objects.create(name=f'Juice {number}', price=1, category=category)
+
+        response = authenticated_client.get('/api/products/export/', {'ordering': 'name'})
+        assert response.status_code == 200
+        assert response.streaming
+        assert response['Content-Disposition'].endswith('.csv"')
+        # The rows are read when the body is consumed
+        with django_assert_num_queries(1):
+            rows = list(csv.DictReader(StringIO(self._content(response))))
+
+        assert [row['name'] for row in rows] == [
+            'Coca Cola', 'Juice 0', 'Juice 1', 'Juice 2', 'Juice 3',
+        ]
+        assert rows[0]['barcode'] == product.barcode
+        assert rows[0]['category'] == 'Beverages'
+        assert rows[0]['price'] == '2.50'
+        assert rows[1]['barcode'] == ''
+
+    def test_ndjson_export_applies_search(self, authenticated_client, product, category):
+        Product.objects.create(name='Orange Juice', price=1, category=category)
+
+        response = authenticated_client.get(
+            '/api/products/export/', {'export_format': 'ndjson', 'search': 'coca'}
+        )
+        lines = self._content(response).splitlines()
+        assert response['Content-Type'] == 'application/x-ndjson'
+        assert [json.loads(line)['name'] for line in lines] == ['Coca Cola']
+        assert json.loads(lines[0])['quantity_in_stock'] == 100
+
+    def test_rejects_unknown_format(self, authenticated_client):
+        response = authenticated_client.get('/api/products/export/', {'export_format': 'xml'})
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestNutritionScore:
+    def test_vectorized_score_matches_reference_points(self):
+        from products import nutrition
+        scores, grades = nutrition.score({
+            # cola-like drink, plain yoghurt, chocolate spread, incomplete
+            'energy_kcal': [42, 61, 539, 100],
+            'sugars': [10.6, 4.7, 56.3, 1],
+            'saturated_fat': [0, 2.1, 10.6, 1],
+            'salt': [0, 0.13, 0.107, None],
+            'fiber': [0, 0, 0, 0],
+            'proteins': [0, 3.5, 6.3, 0],
+        })
+        assert scores.tolist() == [2, 1, 26, None]
+        assert grades.tolist() == ['B', 'B', 'E', None]
+
+    def test_score_follows_nutrition_changes(self, staff_client, product):
+        response = staff_client.patch(f'/api/products/{product.id}/', {
+            'energy_kcal': '42', 'sugars': '10.6', 'saturated_fat': '0', 'salt': '0',
+        }, format='json')
+        assert response.status_code == 200
+        product.refresh_from_db()
+        assert (product.nutrition_score, product.nutrition_grade) == (2, 'B')
+
+        upsert_products_by_barcode({product.barcode: {'sugars': Decimal('50')}})
+        product.refresh_from_db()
+        assert (product.nutrition_score, product.nutrition_grade) == (10, 'C')
+
+    def test_recompute_command_only_writes_changes(self, category):
+        Product.objects.bulk_create([
+            Product(name=f'P{number}', price=1, energy_kcal=number * 100, sugars=5,
+                    saturated_fat=1, salt=Decimal('0.5'))
+            for number in range(5)
+        ])
+        out = StringIO()
+        call_command('recompute_nutrition_scores', stdout=out)
+        assert 'Updated 5 nutrition scores' in out.getvalue()
+        call_command('recompute_nutrition_scores', stdout=out)
+        assert 'Updated 0 nutrition scores' in out.getvalue()
+
+    def test_nutrient_range_filters(self, authenticated_client, category):
+        Product.objects.create(name='Lean', price=1, sugars=2, proteins=20)
+        Product.objects.create(name='Sweet', price=1, sugars=30, proteins=1)
+        Product.objects.create(name='Unknown', price=1)
+
+        response = authenticated_client.get('/api/products/', {'sugars__lte': '5', 'proteins__gte': '10'})
+        assert [row['name'] for row in response.data['results']] == ['Lean']
+
+        response = authenticated_client.get('/api/products/', {'sugars__gt': '5'})
+        assert [row['name'] for row in response.data['results']] == ['Sweet']
+
+        response = authenticated_client.get('/api/products/', {'sugars__lte': 'lots'})
+        assert response.status_code == 400
+        assert 'sugars__lte' in response.data
+
+
+@pytest.mark.django_db
+class TestPriceHistory:
+    def _backdate(self, product, at):
+        latest = product.price_history.latest('id')
+        PriceChange.objects.filter(id=latest.id).update(effective_from=at)
+
+    def test_price_writes_are_recorded(self, staff_client, product):
+        now = timezone.now()
+        self._backdate(product, now - timedelta(days=10))
+        staff_client.patch(f'/api/products/{product.id}/', {'price': '2.80'}, format='json')
+        self._backdate(product, now - timedelta(days=5))
+        # Unchanged prices and unrelated writes add nothing
+        staff_client.patch(f'/api/products/{product.id}/', {'price': '2.80', 'name': 'Coke'}, format='json')
+        stock.apply_adjustments([{'product': product.id, 'delta': -1}])
+        upsert_products_by_barcode({product.barcode: {'price': Decimal('3.10')}})
+
+        history = staff_client.get(f'/api/products/{product.id}/price_history/').data['results']
+        assert [row['price'] for row in history] == ['3.10', '2.80', '2.50']
+
+        response = staff_client.get('/api/products/prices/', {
+            'ids': str(product.id), 'at': (now - timedelta(days=7)).isoformat(),
+        })
+        assert response.data['prices'] == {product.id: Decimal('2.50')}
+
+    def test_bulk_point_in_time_lookup(self, category, django_assert_num_queries):
+        from products import prices
+        now = timezone.now()
+        products = Product.objects.bulk_create([
+            Product(name=f'P{number}', price=Decimal('1.00') + number) for number in range(50)
+        ])
+        ids = [product.id for product in products]
+        prices.record(ids, at=now - timedelta(days=2))
+        Product.objects.filter(id__in=ids[:10]).update(price=Decimal('9.99'))
+        prices.record(ids, at=now - timedelta(days=1))
+
+        with django_assert_num_queries(1):
+            before = prices.prices_at(ids, now - timedelta(days=1, hours=12))
+        after = prices.prices_at(ids, now)
+        assert before[ids[0]] == Decimal('1.00')
+        assert after[ids[0]] == Decimal('9.99')
+        assert after[ids[20]] == Decimal('21.00')
+        assert prices.prices_at(ids[:1], now - timedelta(days=3)) == {ids[0]: None}
+        assert prices.changes_between(now - timedelta(days=1, hours=1)).count() == 10
+
+    def test_price_changes_range_and_validation(self, staff_client, product):
+        response = staff_client.get('/api/products/price_changes/', {'ids': 'x'})
+        assert response.status_code == 400
+        assert 'ids' in response.data
+
+        response = staff_client.get('/api/products/price_changes/', {
+            'since': (timezone.now() - timedelta(hours=1)).isoformat(),
+        })
+        assert [row['product'] for row in response.data['results']] == [product.id]
+
+
+@pytest.mark.django_db
+class TestChangeFeed:
+    def test_feed_returns_changes_and_tombstones_since_watermark(
+        self, authenticated_client, product, category, django_assert_num_queries
+    ):
+        from products import changes
+        response = authenticated_client.get('/api/products/changes/')
+        assert [row['id'] for row in response.data['products']] == [product.id]
+        watermark = response.data['watermark']
+
+        # Nothing new: one indexed lookup
+        with django_assert_num_queries(1):
+            assert changes.feed(watermark) == ([], [], watermark, False)
+
+        juice = Product.objects.create(name='Juice', price=1, category=category)
+        stock.apply_adjustments([{'product': product.id, 'delta': -1}])
+        product.refresh_from_db()
+        product.is_active = False
+        product.save(update_fields=['is_active', 'updated_at'])
+        juice.price = 2
+        juice.save()
+        doomed = Product.objects.create(name='Gone', price=1)
+        doomed_id = doomed.id
+        doomed.delete()
+
+        response = authenticated_client.get('/api/products/changes/', {'since': watermark})
+        products = {row['id']: row for row in response.data['products']}
+        assert set(products) == {product.id, juice.id}
+        assert (products[product.id]['quantity_in_stock'], products[product.id]['is_active']) == (99, False)
+        assert products[juice.id]['price'] == '2.00'
+        assert response.data['deleted'] == [doomed_id]
+        assert response.data['watermark'] > watermark
+
+    def test_feed_pages_with_has_more(self, authenticated_client, category):
+        for number in range(5):
+            Product.objects.create(name=f'P{number}', price=1)
+
+        seen = []
+        since = 0
+        while True:
+            response = authenticated_client.get('/api/products/changes/', {'since': since, 'limit': 2})
+            seen += [row['name'] for row in response.data['products']]
+            since = response.data['watermark']
+            if not response.data['has_more']:
+                break
+        assert sorted(seen) == [f'P{number}' for number in range(5)]
+
+
+@pytest.mark.django_db
+class TestCatalogReadModel:
+    def test_catalog_matches_product_list_and_follows_changes(self, authenticated_client, product, category):
+        Product.objects.create(name='Hidden', price=1, is_active=False)
+        listed = authenticated_client.get('/api/products/', {'search': 'coca'}).data['results']
+
+        response = authenticated_client.get('/api/catalog/')
+        assert response.status_code == 200
+        assert response.json()['results'] == json.loads(json.dumps(listed))
+        assert response.json()['count'] == 1
+
+        # Category rename and stock changes re-render the entry
+        category.name = 'Soft Drinks'
+        category.save()
+        stock.apply_adjustments([{'product': product.id, 'quantity': 0}])
+        entry = authenticated_client.get(f'/api/catalog/{product.id}/').json()
+        assert (entry['category_name'], entry['stock_status']) == ('Soft Drinks', 'Out of Stock')
+
+        product.delete()
+        assert authenticated_client.get('/api/catalog/').json()['results'] == []
+
+    def test_deleting_category_clears_it_from_catalog(self, authenticated_client, product, category):
+        category.delete()
+        entry = authenticated_client.get(f'/api/catalog/{product.id}/').json()
+        assert entry['category_name'] is None
+
+    def test_catalog_picture_urls_are_absolute(self, authenticated_client, product):
+        product.picture = 'products/coca.png'
+        product.save()
+        listed = authenticated_client.get('/api/products/').data['results'][0]['picture_url']
+        assert listed.startswith('http://testserver/media/')
+
+        assert authenticated_client.get('/api/catalog/').json()['results'][0]['picture_url'] == listed
+        assert authenticated_client.get(f'/api/catalog/{product.id}/').json()['picture_url'] == listed
+
+    def test_catalog_read_is_one_indexed_scan(
+        self, authenticated_client, category, django_assert_num_queries
+    ):
+        for number in range(30):
+            Product.objects.create(name=f'Product {number:02d}', price=number + 1, category=category)
+
+        # validator aggregate, COUNT and the page
+        with django_assert_num_queries(3):
+            response = authenticated_client.get('/api/catalog/', {'ordering': '-price', 'page_size': 5})
+        body = response.json()
+        assert [row['name'] for row in body['results']] == [f'Product {n:02d}' for n in range(29, 24, -1)]
+        assert body['count'] == 30 and body['next']
+
+        with django_assert_num_queries(2):
+            response = authenticated_client.get('/api/catalog/', {'pagination': 'cursor', 'ordering': 'name', 'page_size': 10})
+        assert 'count' not in response.json()
+        second = authenticated_client.get(response.json()['next']).json()
+        assert second['results'][0]['name'] == 'Product 10'
+
+        etag = response['ETag']
+        response = authenticated_client.get(
+            '/api/catalog/', {'pagination': 'cursor', 'ordering': 'name', 'page_size': 10}, HTTP_IF_NONE_MATCH=etag
+        )
+        assert response.status_code == 304
+
+    def test_catalog_filters(self, authenticated_client, product, category):
+        Product.objects.create(name='Orange Juice', price=1, category=category, quantity_in_stock=0)
+        Product.objects.create(name='Crisps', price=1)
+
+        names = lambda params: [  # noqa: E731
+            row['name'] for row in authenticated_client.get('/api/catalog/', params).json()['results']
+        ]
+        assert names({'category': category.id}) == ['Coca Cola', 'Orange Juice']
+        assert names({'category': category.id, 'in_stock': 'true'}) == ['Coca Cola']
+        assert names({'search': 'orange'}) == ['Orange Juice']
@@ -1,39 +1,71 @@
+import json
+import os
+from collections import OrderedDict
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, SAFE_METHODS
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from django.utils import timezone
-import requests
+from rest_framework.filters import OrderingFilter
 from django.conf import settings
-from decimal import Decimal
-from .models import Category, Product
+from django.db.models import Count, Max, Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.static import serve
+from . import changes, csv_import, export, mirror, openfoodfacts, prices, stock
+from .barcode_index import barcode_index
+from .bulk import CREATED, upsert_products_by_barcode
+from core.pagination import OptionalCursorPagination
+from core.views import ConditionalGetMixin, SparseFieldsetMixin
+from .filters import CatalogFilter, ProductFuzzySearchFilter, ProductNutrientFilter, ProductSearchFilter
+from .models import CatalogEntry, Category, Product, OpenFoodFactsCache
 from .serializers import (
+    BulkStockAdjustmentSerializer,
     CategorySerializer,
     ProductSerializer,
     ProductCreateUpdateSerializer,
-    ProductListSerializer
+    PriceChangeSerializer,
+    PriceChangesQuerySerializer,
+    PricesQuerySerializer,
+    ProductChangesQuerySerializer,
+    ProductListSerializer,
+    StockLevelsQuerySerializer,
+    StockMovementSerializer,
 )
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Category CRUD operations.
     
     List all categories, retrieve individual category details,
     create new categories, update existing ones, and delete categories.
+    List and detail responses carry ETag/Last-Modified validators.
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
 
+    def get_validator_state(self, queryset):
+        # product_count is part of the payload, so products count as well
+        state = queryset.order_by().aggregate(
+            latest=Max('updated_at'),
+            count=Count('id', distinct=True),
+            products_latest=Max('products__updated_at'),
+            products=Count('products__id'),
+        )
+        if state['products_latest'] and state['products_latest'] > state['latest']:
+            state['latest'] = state['products_latest']
+        return state
+
     def get_permissions(self):
         if self.request.method in SAFE_METHODS:
             return [IsAuthenticated()]
         return [IsAdminUser()]
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Product CRUD operations.
     
@@ -48,15 +80,28 @@ class ProductViewSet(viewsets.ModelViewSet):
     - Stock quantity management
     - Nutritional information tracking
     - Advanced filtering and sorting capabilities
+    - Sparse fieldsets with ?fields=id,name,...
+    - Nutrient range filters (?sugars__lte=5, ?proteins__gte=10) and
+      nutrition score/grade filtering and ordering
+    - ETag/Last-Modified validators on list and detail (304 Not Modified)
     """
     queryset = Product.objects.all()
     permission_classes = [IsAuthenticated]
+    filter_backends = [
+        ProductSearchFilter, ProductFuzzySearchFilter, ProductNutrientFilter, OrderingFilter,
+    ]
+    pagination_class = OptionalCursorPagination
     search_fields = ['name', 'brand', 'barcode', 'category__name']
     filterset_fields = ['category', 'is_active']
-    ordering_fields = ['name', 'price', 'quantity_in_stock', 'created_at']
+    ordering_fields = ['name', 'price', 'quantity_in_stock', 'nutrition_score', 'created_at']
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
     def get_permissions(self):
+        if self.action in (
+            'openfoodfacts_cache', 'stock_levels', 'stock_movements',
+            'prices_at', 'price_changes', 'price_history',
+        ):
+            return [IsAdminUser()]
         if self.request.method in SAFE_METHODS:
             return [IsAuthenticated()]
         return [IsAdminUser()]
@@ -96,52 +141,30 @@ class ProductViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            # Query Open Food Facts API
-            url = f"{settings.OPEN_FOOD_FACTS_API_URL}/product/{barcode}"
-            response = requests.get(url)
-            
-            if response.status_code != 200:
+            result = openfoodfacts.fetch_products([barcode])[barcode]
+
+            if result.status == openfoodfacts.FAILED:
                 return Response(
-                    {'error': 'Failed to fetch from Open Food Facts'},
+                    {'error': result.error},
                     status=status.HTTP_502_BAD_GATEWAY
                 )
-            
-            data = response.json()
-            
-            if data.get('status') != 1:
+
+            if result.status == openfoodfacts.NOT_FOUND:
                 return Response(
-                    {'error': 'Product not found in Open Food Facts'},
+                    {'error': result.error},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            
-            product_data = data.get('product', {})
-            
-            # Extract nutritional information
-            nutriments = product_data.get('nutriments', {})
-            
-            # Check if product exists
-            product, created = Product.objects.update_or_create(
-                barcode=barcode,
-                defaults={
-                    'name': product_data.get('product_name', 'Unknown'),
-                    'brand': product_data.get('brands', ''),
-                    'picture_url': product_data.get('image_url', ''),
-                    'description': product_data.get('ingredients_text', ''),
-                    'openfoodfacts_id': product_data.get('id', ''),
-                    # Open Food Facts does not provide price/stock, use safe defaults
-                    'price': Decimal('0.01'),
-                    'quantity_in_stock': 0,
-                    'energy_kcal': nutriments.get('energy-kcal_100g'),
-                    'fat': nutriments.get('fat_100g'),
-                    'saturated_fat': nutriments.get('saturated-fat_100g'),
-                    'carbohydrates': nutriments.get('carbohydrates_100g'),
-                    'sugars': nutriments.get('sugars_100g'),
-                    'proteins': nutriments.get('proteins_100g'),
-                    'salt': nutriments.get('salt_100g'),
-                    'fiber': nutriments.get('fiber_100g'),
-                    'last_synced': timezone.now(),
-                }
-            )
+
+            # Placeholder price and stock only for new products; existing
+            # ones keep theirs (stock changes go through the ledger)
+            values = openfoodfacts.map_product(result.product)
+            mirror.substitute_known([values])
+            outcome = upsert_products_by_barcode(
+                {barcode: values}, create_defaults=openfoodfacts.SYNC_CREATE_DEFAULTS
+            )[barcode]
+            created = outcome == CREATED
+            product = Product.objects.get(barcode=barcode)
+            mirror.schedule(Product.objects.filter(pk=product.pk))
             
             serializer = ProductSerializer(product)
             return Response({
@@ -149,17 +172,326 @@ class ProductViewSet(viewsets.ModelViewSet):
                 'product': serializer.data
             }, status=status.HTTP_200_OK if not created else status.HTTP_201_CREATED)
             
-        except requests.RequestException as e:
-            return Response(
-                {'error': f'API request failed: {str(e)}'},
-                status=status.HTTP_502_BAD_GATEWAY
-            )
         except Exception as e:
             return Response(
                 {'error': f'An error occurred: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+    @action(detail=False, methods=['post'])
+    def sync_openfoodfacts_batch(self, request):
+        """
+        Sync many barcodes with Open Food Facts in one request.
+
+        **Request Body:**
+        ```json
+        {
+            "barcodes": ["3017620422003", "5449000000996"]
+        }
+        ```
+        or a multipart upload with a `file` field holding one barcode per line.
+
+        Barcodes are fetched concurrently over pooled keep-alive connections
+        and written with bulk inserts/updates.
+
+        **Returns:**
+        - summary: count of barcodes per outcome
+        - results: per-barcode status (created, updated, not_found, failed)
+        """
+        upload = request.FILES.get('file')
+        if upload is not None:
+            content = upload.read().decode('utf-8-sig', errors='ignore')
+            barcodes = content.replace(',', ' ').split()
+        else:
+            barcodes = request.data.get('barcodes')
+            if not isinstance(barcodes, list):
+                return Response(
+                    {'error': 'A list of barcodes or a file is required'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            barcodes = [str(barcode).strip() for barcode in barcodes if str(barcode).strip()]
+
+        if not barcodes:
+            return Response(
+                {'error': 'A list of barcodes or a file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        limit = settings.OPEN_FOOD_FACTS_BATCH_LIMIT
+        if len(barcodes) > limit:
+            return Response(
+                {'error': f'At most {limit} barcodes can be synced per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = openfoodfacts.sync_barcodes(barcodes)
+        summary = {
+            outcome: 0
+            for outcome in ['created', 'updated', 'not_found', 'failed']
+        }
+        for result in results:
+            summary[result['status']] += 1
+
+        return Response({'summary': summary, 'results': results})
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_csv(self, request):
+        """
+        Create or update products from a CSV upload, matched by barcode.
+
+        **Request Body:** multipart upload with a `file` field. The header
+        row names product fields (`barcode`, `name` and `price` required;
+        `brand`, `category` as name or id, `quantity_in_stock`,
+        `description`, `is_active`, `picture_url` and nutriment columns are
+        optional). Empty cells leave existing values untouched.
+
+        Rows are validated and written in chunks, each chunk in its own
+        transaction; invalid rows are skipped.
+
+        **Returns:**
+        - rows, created, updated, failed: counts
+        - errors: `{line, barcode, errors}` for each rejected row
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'A CSV file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            report = csv_import.import_products(upload.file)
+        except csv_import.ImportFileError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export_catalog(self, request):
+        """
+        Stream every product matching the list filters as one file.
+
+        **Parameters:**
+        - export_format: `csv` (default) or `ndjson`
+        - search, fuzzy, nutrient ranges, ordering: same as the product list
+
+        Rows are read from the database in chunks and streamed as they are
+        rendered, in a single query and without pagination. CSV columns
+        match the import format.
+
+        **Returns:** `products-<date>.csv` or `products-<date>.ndjson` attachment
+        """
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in export.FORMATS:
+            return Response(
+                {'error': f'export_format must be one of: {", ".join(export.FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            export.stream(queryset, export_format),
+            content_type=export.FORMATS[export_format],
+        )
+        filename = f'products-{timezone.localdate():%Y%m%d}.{export_format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        # Let proxies pass chunks through instead of buffering the whole file
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='changes')
+    def change_feed(self, request):
+        """
+        Delta sync: products changed or deleted since a watermark.
+
+        **Parameters:**
+        - since: `watermark` from the previous response (omit or 0 for a full sync)
+        - limit: changes per response (default 500)
+
+        Each changed product appears once, in its current list shape
+        (deactivated products come with `is_active: false`). Keep calling with
+        the new watermark while `has_more` is true. A poll with no changes
+        is a single indexed lookup.
+
+        **Returns:**
+        - watermark: pass as `since` next time
+        - has_more: more changes are waiting
+        - products: created or updated products
+        - deleted: IDs of deleted products
+        """
+        query = ProductChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        changed, deleted, watermark, has_more = changes.feed(
+            query.validated_data['since'], query.validated_data.get('limit')
+        )
+        products = Product.objects.filter(id__in=changed).select_related('category') if changed else []
+        return Response({
+            'watermark': watermark,
+            'has_more': has_more,
+            'products': ProductListSerializer(products, many=True, context={'request': request}).data,
+            'deleted': deleted,
+        })
+
+    @action(detail=False, methods=['get'], url_path=r'barcode/(?P<barcode>[^/]+)')
+    def barcode(self, request, barcode=None):
+        """
+        Look up a product by barcode (POS scanning fast path).
+
+        Served from a per-process in-memory index; unknown barcodes fall
+        back to the database.
+
+        **Parameters:**
+        - barcode: Product barcode
+
+        **Returns:** Product in the same shape as the product list, plus `barcode`
+        """
+        entry, hit = barcode_index.lookup(barcode)
+        if entry is None:
+            return Response(
+                {'error': 'Product not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if entry['picture_url'].startswith('/'):
+            entry = {**entry, 'picture_url': request.build_absolute_uri(entry['picture_url'])}
+        return Response(entry, headers={'X-Barcode-Index': 'hit' if hit else 'miss'})
+
+    @action(detail=False, methods=['get'])
+    def openfoodfacts_cache(self, request):
+        """
+        Open Food Facts cache statistics (staff only).
+
+        **Returns:**
+        - counters: hits, negative_hits, misses, revalidated (304), refreshed,
+          errors and hit_ratio for this worker process since startup
+        - entries: cached barcodes, split into fresh/stale and found/not found
+        """
+        now = timezone.now()
+        entries = OpenFoodFactsCache.objects.aggregate(
+            total=Count('id'),
+            fresh=Count('id', filter=Q(expires_at__gt=now)),
+            not_found=Count('id', filter=Q(found=False)),
+        )
+        return Response({
+            'counters': openfoodfacts.cache_stats.snapshot(),
+            'entries': entries,
+        })
     
+    @action(detail=False, methods=['post'])
+    def bulk_stock(self, request):
+        """
+        Adjust the stock of many products in one transaction.
+
+        **Request Body:**
+        ```json
+        {
+            "adjustments": [
+                {"product": 1, "delta": 24},
+                {"product": 2, "delta": -3},
+                {"product": 3, "quantity": 40}
+            ],
+            "kind": "receipt",
+            "reference": "PO-1042"
+        }
+        ```
+        `delta` is added to the current level, `quantity` sets it. Entries are
+        applied with database-side arithmetic; if any product is missing or
+        would go negative, nothing is changed. Each change is recorded in the
+        stock ledger as a `kind` movement (receipt, adjustment or refund;
+        default adjustment).
+
+        **Returns:** `levels` mapping each product ID to its new stock level
+        """
+        serializer = BulkStockAdjustmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            levels = stock.apply_adjustments(
+                serializer.validated_data['adjustments'],
+                kind=serializer.validated_data['kind'],
+                reference=serializer.validated_data['reference'],
+            )
+        except stock.StockError as exc:
+            return Response(
+                {'error': 'Stock adjustment rejected', 'products': exc.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'levels': levels})
+
+    @action(detail=False, methods=['get'])
+    def stock_levels(self, request):
+        """
+        Stock levels at a point in time (staff only).
+
+        **Parameters:**
+        - at: ISO 8601 datetime (default: now)
+        - ids: comma-separated product IDs (required)
+
+        **Returns:** `at` and `levels` mapping each product ID to its on-hand
+        quantity at that time (null if the product did not exist yet)
+        """
+        query = StockLevelsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        at = query.validated_data.get('at') or timezone.now()
+        ids = query.validated_data['ids']
+        return Response({'at': at, 'levels': stock.levels_at(ids, at)})
+
+    @action(detail=True, methods=['get'])
+    def stock_movements(self, request, pk=None):
+        """
+        Stock ledger of a product, newest first (staff only).
+
+        **Returns:** Paginated movements (kind, signed quantity, reference, created_at)
+        """
+        product = self.get_object()
+        page = self.paginate_queryset(product.stock_movements.all())
+        serializer = StockMovementSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='prices')
+    def prices_at(self, request):
+        """
+        Prices in effect at a point in time (staff only).
+
+        **Parameters:**
+        - at: ISO 8601 datetime (default: now)
+        - ids: comma-separated product IDs (required)
+
+        **Returns:** `at` and `prices` mapping each product ID to its price at
+        that time (null before the first recorded price)
+        """
+        query = PricesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        at = query.validated_data.get('at') or timezone.now()
+        return Response({'at': at, 'prices': prices.prices_at(query.validated_data['ids'], at)})
+
+    @action(detail=False, methods=['get'])
+    def price_changes(self, request):
+        """
+        Price changes across products, newest first (staff only).
+
+        **Parameters:**
+        - since, until: ISO 8601 datetimes bounding `effective_from` (until exclusive)
+        - ids: comma-separated product IDs (default: all products)
+
+        **Returns:** Paginated price changes (product, price, effective_from)
+        """
+        query = PriceChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        changes = prices.changes_between(
+            query.validated_data.get('since'),
+            query.validated_data.get('until'),
+            query.validated_data.get('ids'),
+        )
+        page = self.paginate_queryset(changes)
+        return self.get_paginated_response(PriceChangeSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def price_history(self, request, pk=None):
+        """
+        Price history of a product, newest first (staff only).
+
+        **Returns:** Paginated price changes (price, effective_from)
+        """
+        product = self.get_object()
+        page = self.paginate_queryset(product.price_history.all())
+        return self.get_paginated_response(PriceChangeSerializer(page, many=True).data)
+
     @action(detail=True, methods=['post'])
     def update_stock(self, request, pk=None):
         """
@@ -199,8 +531,71 @@ class ProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        product.quantity_in_stock = quantity
-        product.save()
+        # Written with an UPDATE so concurrent changes to other fields survive,
+        # and recorded in the stock ledger
+        stock.apply_adjustments([{'product': product.pk, 'quantity': quantity}])
+        product.refresh_from_db()
         
         serializer = ProductSerializer(product)
         return Response(serializer.data)
+
+
+class CatalogViewSet(ConditionalGetMixin, viewsets.GenericViewSet):
+    """
+    Customer catalog served from the pre-rendered ``CatalogEntry`` read model.
+
+    Active products only, in the same shape as the product list. Entries are
+    rendered when a product, its category or its stock changes, so a read is
+    an indexed scan whose stored JSON payloads are joined into the response
+    as-is.
+
+    **Filters:** `?category=<id>`, `?in_stock=true`, `?search=`
+    **Ordering:** `?ordering=name|price|created_at` (prefix `-` to reverse)
+    **Pagination:** `?page=` / `?page_size=` or `?pagination=cursor`
+    """
+    queryset = CatalogEntry.objects.filter(is_active=True)
+    permission_classes = [IsAuthenticated]
+    filter_backends = [CatalogFilter, OrderingFilter]
+    ordering_fields = ['name', 'price', 'created_at']
+    ordering = ['name', 'product']
+    pagination_class = OptionalCursorPagination
+
+    def get_queryset(self):
+        # Sort keys are loaded for cursor links; everything else is in the payload
+        return super().get_queryset().only('payload', 'name', 'price', 'created_at')
+
+    def list(self, request, *args, **kwargs):
+        return self.handle_conditional_get(request, self.render_page, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.handle_conditional_get(request, self.render_entry, *args, **kwargs)
+
+    def render_page(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        envelope = OrderedDict()
+        if not self.paginator.cursor_mode:
+            envelope['count'] = self.paginator.page.paginator.count
+        envelope['next'] = self.paginator.get_next_link()
+        envelope['previous'] = self.paginator.get_previous_link()
+        results = self.absolutize_urls(request, ','.join(entry.payload for entry in page))
+        body = f'{json.dumps(envelope)[:-1]},"results":[{results}]}}'
+        return HttpResponse(body, content_type='application/json')
+
+    def render_entry(self, request, *args, **kwargs):
+        payload = self.absolutize_urls(request, self.get_object().payload)
+        return HttpResponse(payload, content_type='application/json')
+
+    @staticmethod
+    def absolutize_urls(request, payloads):
+        # Payloads store media URLs as rendered by storage; make local ones
+        # absolute like the product list does (string values are JSON-escaped,
+        # so only the real key can match)
+        origin = request.build_absolute_uri('/')[:-1]
+        return payloads.replace('"picture_url":"/', f'"picture_url":"{origin}/')
+
+
+def serve_mirrored_image(request, path):
+    """Serve mirrored images from local media (DEBUG only) as immutable."""
+    response = serve(request, path, document_root=os.path.join(settings.MEDIA_ROOT, mirror.MIRROR_PREFIX))
+    response['Cache-Control'] = mirror.CACHE_CONTROL
+    return response
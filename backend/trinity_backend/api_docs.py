@@ -34,12 +34,28 @@ def api_index(request):
                 "list": "GET /api/products/",
                 "create": "POST /api/products/",
                 "retrieve": "GET /api/products/{id}/",
+                "barcode_lookup": "GET /api/products/barcode/{barcode}/",
                 "update": "PUT /api/products/{id}/",
                 "partial_update": "PATCH /api/products/{id}/",
                 "delete": "DELETE /api/products/{id}/",
                 "sync_with_barcode": "POST /api/products/sync_openfoodfacts/",
+                "sync_batch": "POST /api/products/sync_openfoodfacts_batch/",
+                "openfoodfacts_cache_stats": "GET /api/products/openfoodfacts_cache/",
+                "import_csv": "POST /api/products/import/",
+                "changes": "GET /api/products/changes/?since=&limit=",
+                "export": "GET /api/products/export/?export_format=csv|ndjson",
+                "bulk_stock": "POST /api/products/bulk_stock/",
+                "stock_levels": "GET /api/products/stock_levels/?ids=&at=",
+                "stock_movements": "GET /api/products/{id}/stock_movements/",
+                "prices_at": "GET /api/products/prices/?ids=&at=",
+                "price_changes": "GET /api/products/price_changes/?since=&until=&ids=",
+                "price_history": "GET /api/products/{id}/price_history/",
                 "update_stock": "POST /api/products/{id}/update_stock/"
             },
+            "catalog": {
+                "list": "GET /api/catalog/?search=&category=&in_stock=&ordering=",
+                "retrieve": "GET /api/catalog/{id}/"
+            },
             "categories": {
                 "list": "GET /api/categories/",
                 "create": "POST /api/categories/",
@@ -57,10 +73,12 @@ def api_index(request):
             },
             "invoices": {
                 "list": "GET /api/invoices/",
-                "create": "POST /api/invoices/",
+                "create": "POST /api/invoices/ (optional Idempotency-Key header)",
                 "retrieve": "GET /api/invoices/{id}/",
                 "update": "PUT /api/invoices/{id}/",
-                "delete": "DELETE /api/invoices/{id}/"
+                "delete": "DELETE /api/invoices/{id}/",
+                "reserve_numbers": "POST /api/invoices/reserve_numbers/",
+                "bulk_ingest": "POST /api/invoices/bulk/"
             },
             "invoice_items": {
                 "list": "GET /api/invoice-items/",
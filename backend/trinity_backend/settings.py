@@ -251,3 +251,71 @@ OPEN_FOOD_FACTS_API_URL = config(
     'OPEN_FOOD_FACTS_API_URL',
     default='https://world.openfoodfacts.org/api/v2'
 )
+OPEN_FOOD_FACTS_TIMEOUT = config('OPEN_FOOD_FACTS_TIMEOUT', default=10, cast=int)
+OPEN_FOOD_FACTS_MAX_WORKERS = config('OPEN_FOOD_FACTS_MAX_WORKERS', default=8, cast=int)
+OPEN_FOOD_FACTS_BATCH_LIMIT = config('OPEN_FOOD_FACTS_BATCH_LIMIT', default=5000, cast=int)
+
+# Open Food Facts payload cache (seconds)
+OPEN_FOOD_FACTS_CACHE_TTL = config('OPEN_FOOD_FACTS_CACHE_TTL', default=86400, cast=int)
+OPEN_FOOD_FACTS_NEGATIVE_CACHE_TTL = config('OPEN_FOOD_FACTS_NEGATIVE_CACHE_TTL', default=3600, cast=int)
+
+# Background re-sync of stale products (resync_stale_products command)
+OPEN_FOOD_FACTS_RESYNC_MAX_AGE_HOURS = config('OPEN_FOOD_FACTS_RESYNC_MAX_AGE_HOURS', default=168, cast=float)
+OPEN_FOOD_FACTS_RESYNC_RATE = config('OPEN_FOOD_FACTS_RESYNC_RATE', default=2, cast=float)
+
+# Fuzzy (trigram) product search
+PRODUCT_FUZZY_MIN_SIMILARITY = config('PRODUCT_FUZZY_MIN_SIMILARITY', default=0.3, cast=float)
+PRODUCT_FUZZY_CANDIDATES = config('PRODUCT_FUZZY_CANDIDATES', default=200, cast=int)
+
+# In-memory barcode index (POS scanning)
+BARCODE_INDEX_WARM_ON_STARTUP = config('BARCODE_INDEX_WARM_ON_STARTUP', default=True, cast=bool)
+BARCODE_INDEX_REFRESH_SECONDS = config('BARCODE_INDEX_REFRESH_SECONDS', default=1.0, cast=float)
+BARCODE_INDEX_OVERLAP_SECONDS = config('BARCODE_INDEX_OVERLAP_SECONDS', default=5.0, cast=float)
+
+# Product image variants (thumbnail/card/full WebP renditions of uploads)
+PRODUCT_IMAGE_ASYNC = config('PRODUCT_IMAGE_ASYNC', default=True, cast=bool)
+PRODUCT_IMAGE_WORKERS = config('PRODUCT_IMAGE_WORKERS', default=2, cast=int)
+PRODUCT_IMAGE_WEBP_QUALITY = config('PRODUCT_IMAGE_WEBP_QUALITY', default=80, cast=int)
+
+# Mirror Open Food Facts images into our storage (content-addressed)
+OPEN_FOOD_FACTS_MIRROR_IMAGES = config('OPEN_FOOD_FACTS_MIRROR_IMAGES', default=True, cast=bool)
+OPEN_FOOD_FACTS_MIRROR_ASYNC = config('OPEN_FOOD_FACTS_MIRROR_ASYNC', default=True, cast=bool)
+OPEN_FOOD_FACTS_MIRROR_WORKERS = config('OPEN_FOOD_FACTS_MIRROR_WORKERS', default=2, cast=int)
+OPEN_FOOD_FACTS_MIRROR_MAX_BYTES = config('OPEN_FOOD_FACTS_MIRROR_MAX_BYTES', default=5 * 1024 * 1024, cast=int)
+# Only picture URLs on these hosts are downloaded; anything else is left as is
+OPEN_FOOD_FACTS_IMAGE_HOSTS = config(
+    'OPEN_FOOD_FACTS_IMAGE_HOSTS',
+    default='images.openfoodfacts.org,static.openfoodfacts.org',
+    cast=lambda v: [s.strip() for s in v.split(',') if s.strip()]
+)
+
+# Bulk CSV product import (rows validated and written per chunk)
+PRODUCT_IMPORT_BATCH_SIZE = config('PRODUCT_IMPORT_BATCH_SIZE', default=1000, cast=int)
+
+# Bulk stock adjustments (entries per request)
+STOCK_ADJUSTMENT_BATCH_LIMIT = config('STOCK_ADJUSTMENT_BATCH_LIMIT', default=5000, cast=int)
+
+# Streaming catalog export (rows fetched and rendered per chunk)
+PRODUCT_EXPORT_CHUNK_SIZE = config('PRODUCT_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Price history lookups (products per request)
+PRICE_LOOKUP_BATCH_LIMIT = config('PRICE_LOOKUP_BATCH_LIMIT', default=5000, cast=int)
+
+# Catalog change feed (?since= delta sync)
+PRODUCT_CHANGES_PAGE_SIZE = config('PRODUCT_CHANGES_PAGE_SIZE', default=500, cast=int)
+PRODUCT_CHANGES_MAX_PAGE_SIZE = config('PRODUCT_CHANGES_MAX_PAGE_SIZE', default=5000, cast=int)
+# Hold the watermark back this long where writers run concurrently (PostgreSQL)
+PRODUCT_CHANGES_SETTLE_SECONDS = config('PRODUCT_CHANGES_SETTLE_SECONDS', default=0, cast=float)
+
+# Invoice numbers (per-day counter; >1 caches blocks of numbers per worker)
+INVOICE_NUMBER_BLOCK_SIZE = config('INVOICE_NUMBER_BLOCK_SIZE', default=1, cast=int)
+# Largest block an offline POS terminal can reserve at once
+INVOICE_NUMBER_RESERVATION_LIMIT = config('INVOICE_NUMBER_RESERVATION_LIMIT', default=1000, cast=int)
+
+# Idempotency-Key on invoice creation (how long a stored response is replayed)
+IDEMPOTENCY_KEY_TTL_SECONDS = config('IDEMPOTENCY_KEY_TTL_SECONDS', default=24 * 60 * 60, cast=int)
+
+# Bulk invoice ingestion (offline POS sync)
+INVOICE_INGEST_BATCH_LIMIT = config('INVOICE_INGEST_BATCH_LIMIT', default=1000, cast=int)
+# Invoices applied per transaction
+INVOICE_INGEST_GROUP_SIZE = config('INVOICE_INGEST_GROUP_SIZE', default=250, cast=int)
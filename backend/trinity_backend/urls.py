@@ -15,7 +15,7 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
@@ -23,7 +23,8 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 
 from users.views import CustomerViewSet, RegisterView, CurrentUserView
-from products.views import CategoryViewSet, ProductViewSet
+from products.mirror import MIRROR_PREFIX
+from products.views import CatalogViewSet, CategoryViewSet, ProductViewSet, serve_mirrored_image
 from invoices.views import InvoiceViewSet, InvoiceItemViewSet
 from reports.views import (
     ReportsView,
@@ -38,6 +39,7 @@ router = DefaultRouter()
 router.register(r'users', CustomerViewSet, basename='customer')
 router.register(r'products', ProductViewSet, basename='product')
 router.register(r'categories', CategoryViewSet, basename='category')
+router.register(r'catalog', CatalogViewSet, basename='catalog')
 router.register(r'invoices', InvoiceViewSet, basename='invoice')
 router.register(r'invoice-items', InvoiceItemViewSet, basename='invoice-item')
 
@@ -69,4 +71,10 @@ urlpatterns = [
 
 # Serve media files in development
 if settings.DEBUG:
+    urlpatterns += [
+        re_path(
+            rf"^{settings.MEDIA_URL.lstrip('/')}{MIRROR_PREFIX}(?P<path>.*)$",
+            serve_mirrored_image,
+        ),
+    ]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "trinity_backend.settings")
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.BARCODE_INDEX_WARM_ON_STARTUP:
+    from products.barcode_index import barcode_index
+    barcode_index.warm_in_background()
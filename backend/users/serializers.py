@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
+from core.serializers import SparseFieldsetSerializerMixin
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
@@ -15,7 +16,7 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for Customer model"""
     full_name = serializers.SerializerMethodField()
     full_address = serializers.SerializerMethodField()
@@ -30,6 +31,10 @@ class CustomerSerializer(serializers.ModelSerializer):
             'full_name', 'full_address'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        sparse_field_dependencies = {
+            'full_name': ['first_name', 'last_name'],
+            'full_address': ['address', 'zip_code', 'city', 'country'],
+        }
 
     @extend_schema_field(serializers.CharField())
     def get_full_name(self, obj):
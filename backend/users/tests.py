@@ -1,4 +1,6 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from users.models import Customer
 
 
@@ -62,3 +64,20 @@ class TestCustomerAPI:
     def test_unauthorized_access(self, api_client):
         response = api_client.get('/api/users/')
         assert response.status_code == 401
+
+
+@pytest.mark.django_db
+class TestCustomerSparseFieldsets:
+    def test_queryset_loads_only_needed_columns(self, staff_client, customer):
+        with CaptureQueriesContext(connection) as queries:
+            response = staff_client.get('/api/users/', {'fields': 'id,full_name'})
+        assert response.data['results'] == [{'id': customer.id, 'full_name': customer.full_name}]
+        sql = queries.captured_queries[-1]['sql']
+        assert '"last_name"' in sql
+        assert '"phone_number"' not in sql
+        assert '"address"' not in sql
+
+    def test_customer_sees_only_their_profile(self, authenticated_client, customer):
+        Customer.objects.create(first_name='Jane', last_name='Roe', email='jane@example.com')
+        response = authenticated_client.get('/api/users/', {'fields': 'email'})
+        assert response.data['results'] == [{'email': customer.email}]
@@ -5,6 +5,7 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.views import APIView
 from django.contrib.auth.models import User
 from django.db.models import Sum, Count, Avg
+from core.views import SparseFieldsetMixin
 from .models import Customer
 from .serializers import (
     CustomerSerializer,
@@ -15,7 +16,7 @@ from .serializers import (
 )
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Customer/User CRUD operations.
     
@@ -28,14 +29,16 @@ class CustomerViewSet(viewsets.ModelViewSet):
     - Track total spending and average order value
     - Get last purchase date and statistics
     - Search and filter customers
+    - Sparse fieldsets with ?fields=id,name,...
     """
     queryset = Customer.objects.all()
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
+        queryset = super().get_queryset()
         if self.request.user.is_staff:
-            return Customer.objects.all()
-        return Customer.objects.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
 
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
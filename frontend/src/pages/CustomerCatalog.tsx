@@ -40,7 +40,7 @@ const CustomerCatalog = () => {
   const [cardCvc, setCardCvc] = useState('')
   const [purchaseError, setPurchaseError] = useState('')
   const [purchaseSuccess, setPurchaseSuccess] = useState('')
-  const { data, isLoading, error } = useQuery('customer-products', productService.getAll, {
+  const { data, isLoading, error } = useQuery('customer-products', productService.getCatalog, {
     retry: 1,
   })
 
@@ -1,5 +1,5 @@
 import api from './api'
-import { Customer, Product, Invoice, Category, KPIData, CurrentUserResponse } from '../types'
+import { Customer, Product, ProductChangeFeed, Invoice, Category, KPIData, CurrentUserResponse } from '../types'
 
 // Authentication
 export const authService = {
@@ -106,6 +106,21 @@ export const productService = {
     await api.delete(`/products/${id}/`)
   },
   
+  getCatalog: async () => {
+    const response = await api.get<Product[]>('/catalog/')
+    return response.data
+  },
+  
+  getChanges: async (since = 0) => {
+    const response = await api.get<ProductChangeFeed>('/products/changes/', { params: { since } })
+    return response.data
+  },
+  
+  getByBarcode: async (barcode: string) => {
+    const response = await api.get<Product>(`/products/barcode/${encodeURIComponent(barcode)}/`)
+    return response.data
+  },
+  
   syncOpenFoodFacts: async (barcode: string) => {
     const response = await api.post('/products/sync_openfoodfacts/', { barcode })
     return response.data
@@ -34,6 +34,7 @@ export interface Product {
   category_name: string
   picture_url: string
   picture?: string
+  picture_variants?: Record<string, string>
   quantity_in_stock: number
   stock_status: string
   is_in_stock: boolean
@@ -44,9 +45,18 @@ export interface Product {
   fat?: number
   carbohydrates?: number
   proteins?: number
+  nutrition_score?: number | null
+  nutrition_grade?: '' | 'A' | 'B' | 'C' | 'D' | 'E'
   created_at: string
 }
 
+export interface ProductChangeFeed {
+  watermark: number
+  has_more: boolean
+  products: Product[]
+  deleted: number[]
+}
+
 export interface Invoice {
   id: number
   invoice_number: string
@@ -58,6 +68,8 @@ export interface Invoice {
   tax_rate: number
   tax_amount: number
   total_amount: number
+  item_count: number
+  unit_count: number
   total_items: number
   created_at: string
   items: InvoiceItem[]